@@ -0,0 +1,100 @@
+import re
+import subprocess
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.util import read_transpiler_sql, root_dir
+
+
+
+# The transpiler at another git revision, evaluated by the local backend.
+# Its tables may take an older layout of records, TEXT ids and four
+# position columns, so records of the current parser are converted to the
+# layout each transpiler declares before they are evaluated.
+
+def git_transpiler_sql(revision):
+    # same as read_transpiler_sql, but at the given revision
+    def git(*args):
+        return subprocess.run(['git', '-C', root_dir(), *args], capture_output=True, text=True, check=True).stdout
+    paths = sorted(p for p in git('ls-tree', '--name-only', revision, 'transpiler/').split() if p.endswith('.sql'))
+    return '\n'.join(git('show', f'{revision}:{p}') for p in paths)
+
+def tables_column_types(sql):
+    tables = {}
+    for stmt in local_backend.SqlParser(sql).statements():
+        match stmt:
+            case ('table', name, columns):
+                tables[name] = dict(columns)
+    return tables
+
+def load_transpiler(revision=None):
+    # (program, column types of tables), the working tree when revision is None
+    sql = read_transpiler_sql() if revision is None else git_transpiler_sql(revision)
+    return (local_backend.parse_program(sql), tables_column_types(sql))
+
+def text_id(ids, rule_id, value):
+    # of the same length as the parser made TEXT ids
+    if ids == 'dense':
+        digits = []
+        for _ in range(6):
+            (value, digit) = divmod(value, 36)
+            digits.append('0123456789abcdefghijklmnopqrstuvwxyz'[digit])
+        return 'xx' + ''.join(reversed(digits))
+    if value == rule_id:
+        return f'xx{rule_id:016x}_0001'
+    return f'xx{rule_id:016x}_{value + 1:04d}'
+
+def convert_records(records, tables, ids='content'):
+    result = {}
+    for (table_name, rows) in records.items():
+        column_types = tables[table_name]
+        text_columns = [c for (c, t) in column_types.items() if c.endswith('_id') and t == 'TEXT']
+        unpack_pos = 'pos' not in column_types
+        if not text_columns and not unpack_pos:
+            result[table_name] = rows
+            continue
+        result[table_name] = []
+        for row in rows:
+            rule_id = row.get('rule_id')
+            row = dict(row)
+            for c in text_columns:
+                if isinstance(row.get(c), int):
+                    row[c] = text_id(ids, rule_id, row[c])
+            if unpack_pos and 'pos' in row:
+                (row['start_line'], row['start_column'], row['end_line'], row['end_column']) = (
+                    parser.decode_position(row.pop('pos')))
+            result[table_name].append(row)
+    return result
+
+def normalized_statements(sql_lines):
+    # Aliases of tables carry ids of AST nodes, they are renumbered in the
+    # order of appearance in each statement, and WHERE conditions are sorted,
+    # so output of transpilers with different ids can be compared.
+    statements = []
+    lines = []
+    for line in [*sql_lines, ';']:
+        if line.strip() != ';':
+            lines.append(line)
+            continue
+        aliases = {}
+        def rename(m):
+            return '"' + aliases.setdefault(m.group(1), f'a{len(aliases)}') + ':'
+        lines = [re.sub(r'"([^":]+):', rename, l) for l in lines]
+        # an equality of columns already equal by JOIN ON conditions is redundant
+        joined = {}
+        def root(column):
+            while joined.get(column, column) != column:
+                column = joined[column]
+            return column
+        for l in lines:
+            if m := re.match(r'^\s*ON (\S+) = (\S+)$', l):
+                joined[root(m.group(1))] = root(m.group(2))
+        conds = []
+        for l in lines:
+            if m := re.match(r'^\s*(WHERE|AND) (.*)$', l):
+                if not ((eq := re.match(r'^(\S+) = (\S+)$', m.group(2))) and root(eq.group(1)) == root(eq.group(2))):
+                    conds.append(m.group(2))
+        conds.sort()
+        statements.append('\n'.join([l for l in lines if not re.match(r'^\s*(WHERE|AND) ', l)] + conds))
+        lines = []
+    return [s for s in statements if s.strip()]
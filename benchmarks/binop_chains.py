@@ -0,0 +1,44 @@
+import sys
+import time
+
+import grasp.parser as parser
+
+
+
+OPS = ['and', '=', 'or', '~', '>', 'and', '<=', 'or']
+
+def chain_program(n_terms):
+    terms = []
+    for i in range(n_terms):
+        terms.append(f'v{i}')
+        if i < n_terms - 1:
+            terms.append(OPS[i % len(OPS)])
+    return f"r(v0:) <-\n\tt(v0:)\n\t{' '.join(terms)}\n"
+
+def top_level_op(records):
+    body_expr_id = records['body_expr'][0]['expr_id']
+    for row in records.get('binop_expr', []):
+        if row['expr_id'] == body_expr_id:
+            return row['op']
+    return None
+
+def main(sizes):
+    print(f'{"terms":>6} {"earley":>12} {"lalr":>12} {"top op":>7}')
+    for n_terms in sizes:
+        text = chain_program(n_terms)
+        timings = {}
+        results = {}
+        for mode in ['earley', 'lalr']:
+            parser.get_parser(mode)
+            t0 = time.perf_counter()
+            results[mode] = parser.parse(text, 'chain.grasp', mode=mode)
+            timings[mode] = time.perf_counter() - t0
+        if results['earley'] != results['lalr']:
+            raise Exception(f"Parsers disagree on {n_terms}-term chain")
+        print(f'{n_terms:>6} {timings["earley"]*1000:10.1f}ms {timings["lalr"]*1000:10.1f}ms {top_level_op(results["lalr"]) or "-":>7}')
+
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [1, 2, 5, 10, 25, 50, 100, 200]
+    main(sizes)
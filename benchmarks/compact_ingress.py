@@ -0,0 +1,116 @@
+import time
+import asyncio
+import argparse
+
+import aiohttp
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.cli import add_fields_to_records, fetch_full_pipeline_sql
+from grasp.util import table_chunks, start_transaction, commit_transaction, insert_records, insert_record_deltas, wait_till_input_tokens_processed, INGRESS_CHUNK_ROWS, INGRESS_CHUNK_BYTES
+from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
+from baseline_transpiler import load_transpiler, convert_records
+from program_generator import generate_program
+from transpile_tables import FELDERA_URL, PIPELINE_NAME
+
+
+
+# Content ids and JSON objects, as before, against dense ids and CSV.
+# Records are also converted to the table layout of a baseline transpiler,
+# see baseline_transpiler, and both are evaluated by the local backend,
+# to compare request bytes and join throughput of the transpiler.
+# With --feldera also transpiles every current variant with running Feldera.
+VARIANTS = [('content', 'json'), ('content', 'csv'), ('dense', 'json'), ('dense', 'csv')]
+
+arg_parser = argparse.ArgumentParser(description='Request bytes and transpile time of id kinds and ingress formats')
+arg_parser.add_argument(
+    '--baseline', type=str, required=True,
+    help='Git revision of the baseline transpiler, e.g. the branch merged into')
+arg_parser.add_argument('--feldera', action='store_true', help='Also transpile with running Feldera')
+arg_parser.add_argument('sizes', nargs='*', type=int, default=[100, 1000], help='Numbers of rules')
+
+def parse_records(text, ids, pipeline_id):
+    idgen = parser.dense_ids() if ids == 'dense' else None
+    records = parser.parse(text, 'generated.grasp', idgen=idgen, mode='lalr')
+    return add_fields_to_records(records, {'pipeline_id': pipeline_id})
+
+def evaluate_locally(program, records):
+    t0 = time.perf_counter()
+    db = local_backend.evaluate_views(program, records, ['full_pipeline_sql'])
+    elapsed = time.perf_counter() - t0
+    [row] = local_backend.view_rows(db, 'full_pipeline_sql')
+    return (elapsed, row['sql_lines'])
+
+def compare_locally(args, transpilers):
+    print(f'{"rules":>6} {"ids":>8} {"sql":>8} {"records":>8} {"json":>10} {"evaluate":>9} {"records/s":>10}')
+    for n_rules in args.sizes:
+        text = generate_program(n_rules, json_depth=2, aggregation_density=0.5, negation_density=0.2)
+        for ids in ['content', 'dense']:
+            records = parse_records(text, ids, 'bench-compact')
+            n_records = sum(map(len, records.values()))
+            for (name, (program, tables)) in transpilers:
+                sql_records = convert_records(records, tables, ids)
+                (n_bytes, _n_chunks) = encode(sql_records, 'json')
+                (elapsed, _sql_lines) = evaluate_locally(program, sql_records)
+                print(f'{n_rules:>6} {ids:>8} {name:>8} {n_records:>8} {n_bytes/2**10:8.1f}KB '
+                      f'{elapsed:8.2f}s {n_records/elapsed:>10.0f}', flush=True)
+
+def encode(records, ingress_format):
+    # (bytes, chunks), the same chunks insert_records would post
+    n_bytes = 0
+    n_chunks = 0
+    for (table_name, rows) in records.items():
+        for (_params, _content_type, body, _n_rows) in table_chunks(
+                table_name, rows, 'raw', ingress_format, INGRESS_CHUNK_ROWS, INGRESS_CHUNK_BYTES):
+            n_bytes += len(body)
+            n_chunks += 1
+    return (n_bytes, n_chunks)
+
+async def transpile(session, records, ingress_format, pipeline_id):
+    t0 = time.perf_counter()
+    try:
+        await start_transaction(session, PIPELINE_NAME)
+        tokens = await insert_records(session, PIPELINE_NAME, records, ingress_format=ingress_format)
+    finally:
+        await commit_transaction(session, PIPELINE_NAME)
+    await wait_till_input_tokens_processed(session, PIPELINE_NAME, tokens)
+    await fetch_full_pipeline_sql(session, PIPELINE_NAME, pipeline_id)
+    elapsed = time.perf_counter() - t0
+    tokens = await insert_record_deltas(session, PIPELINE_NAME, {}, records)
+    await wait_till_input_tokens_processed(session, PIPELINE_NAME, tokens)
+    return elapsed
+
+async def main(args):
+    compare_locally(args, [(args.baseline, load_transpiler(args.baseline)), ('current', load_transpiler())])
+    print()
+    session = None
+    if args.feldera:
+        session = aiohttp.ClientSession(FELDERA_URL, timeout=aiohttp.ClientTimeout(sock_read=0,total=0))
+        await ensure_transpiler_pipeline_is_ready(session, PIPELINE_NAME)
+    try:
+        print(f'{"rules":>6} {"ids":>8} {"format":>6} {"records":>8} {"bytes":>10} {"chunks":>6} '
+              f'{"parse":>8} {"encode":>8}' + (f' {"transpile":>10} {"records/s":>10}' if session else ''))
+        for n_rules in args.sizes:
+            text = generate_program(n_rules, json_depth=2, aggregation_density=0.5, negation_density=0.2)
+            for (ids, ingress_format) in VARIANTS:
+                pipeline_id = f'bench-compact-{time.time()}'
+                t0 = time.perf_counter()
+                records = parse_records(text, ids, pipeline_id)
+                t1 = time.perf_counter()
+                (n_bytes, n_chunks) = encode(records, ingress_format)
+                t2 = time.perf_counter()
+                n_records = sum(map(len, records.values()))
+                line = (f'{n_rules:>6} {ids:>8} {ingress_format:>6} {n_records:>8} {n_bytes/2**10:8.1f}KB '
+                        f'{n_chunks:>6} {t1-t0:7.2f}s {t2-t1:7.2f}s')
+                if session:
+                    elapsed = await transpile(session, records, ingress_format, pipeline_id)
+                    line += f' {elapsed:9.2f}s {n_records/elapsed:>10.0f}'
+                print(line, flush=True)
+    finally:
+        if session:
+            await session.close()
+
+
+
+if __name__ == '__main__':
+    asyncio.run(main(arg_parser.parse_args()))
@@ -0,0 +1,49 @@
+import sys
+import time
+
+import grasp.parser as parser
+import grasp.manifest as manifest
+from program_generator import generate_program
+
+
+
+def rule_line_index(lines, rule_index):
+    return lines.index(f'output{rule_index}(id:, total:, label:) <-')
+
+def edit_one_rule(text, rule_index):
+    # flips the condition of one rule, without moving any lines
+    lines = text.split('\n')
+    i = rule_line_index(lines, rule_index)
+    lines[i+4] = lines[i+4].replace(' > ', ' < ')
+    return '\n'.join(lines)
+
+def insert_one_line(text, rule_index):
+    # repeats the first body line of one rule, moving all later rules down
+    lines = text.split('\n')
+    i = rule_line_index(lines, rule_index)
+    lines.insert(i+2, lines[i+1])
+    return '\n'.join(lines)
+
+EDITS = [('in place', edit_one_rule), ('line inserted', insert_one_line)]
+
+def count_rows(records):
+    return sum(len(rows) for rows in records.values())
+
+def main(sizes):
+    # rows of the edited rule change, and a line insertion also changes
+    # the rule row (the only one with absolute lines) of every later rule
+    print(f'{"edit":>14} {"rules":>8} {"rows":>9} {"inserts":>8} {"deletes":>8} {"diff":>10}')
+    for n_rules in sizes:
+        text = generate_program(n_rules)
+        prev = parser.parse(text, 'generated.grasp', mode='lalr')
+        for (edit_name, edit) in EDITS:
+            curr = parser.parse(edit(text, n_rules // 2), 'generated.grasp', mode='lalr')
+            t0 = time.perf_counter()
+            (inserts, deletes) = manifest.diff_records(prev, curr)
+            elapsed = time.perf_counter() - t0
+            print(f'{edit_name:>14} {n_rules:>8} {count_rows(curr):>9} {count_rows(inserts):>8} {count_rows(deletes):>8} {elapsed*1000:8.1f}ms')
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [500, 2000]
+    main(sizes)
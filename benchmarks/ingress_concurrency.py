@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import asyncio
+import itertools
+
+import aiohttp
+from aiohttp import web
+
+import grasp.parser as parser
+from grasp.util import insert_records
+from program_generator import generate_program
+
+
+
+PORT = 18181
+
+def stand_in_app(latency):
+    # answers like Feldera ingress: every request takes `latency` seconds
+    tokens = itertools.count(1)
+    stats = {'requests': 0, 'bytes': 0}
+
+    async def ingress(request):
+        body = await request.read()
+        stats['requests'] += 1
+        stats['bytes'] += len(body)
+        await asyncio.sleep(latency)
+        return web.json_response({'token': str(next(tokens))})
+
+    app = web.Application(client_max_size=2**30)
+    app.add_routes([web.post('/v0/pipelines/{pipeline_name}/ingress/{table_name}', ingress)])
+    return (app, stats)
+
+async def main(n_rules, latency, concurrencies, max_rows):
+    records = parser.parse(generate_program(n_rules), 'generated.grasp', mode='lalr')
+    n_rows = sum(len(rows) for rows in records.values())
+
+    (app, stats) = stand_in_app(latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, 'localhost', PORT).start()
+    try:
+        print(f'{n_rows} rows in {len(records)} tables, {latency*1000:.0f}ms per request, '
+              f'chunks of {max_rows} rows')
+        print(f'{"concurrency":>12} {"requests":>9} {"time":>10} {"rows/s":>10}')
+        async with aiohttp.ClientSession(f'http://localhost:{PORT}') as session:
+            for concurrency in concurrencies:
+                stats['requests'] = 0
+                t0 = time.perf_counter()
+                await insert_records(
+                    session, 'bench', records, concurrency=concurrency, max_rows=max_rows)
+                elapsed = time.perf_counter() - t0
+                print(f'{concurrency:>12} {stats["requests"]:>9} {elapsed*1000:8.1f}ms {n_rows/elapsed:10.0f}')
+    finally:
+        await runner.cleanup()
+
+
+
+if __name__ == '__main__':
+    n_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    # progress of every request is printed to stderr, silence it
+    sys.stderr = open(os.devnull, 'w')
+    asyncio.run(main(n_rules, latency, [1, 2, 4, 8, 16, 32], max_rows=1000))
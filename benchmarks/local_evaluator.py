@@ -0,0 +1,64 @@
+import sys
+import time
+import random
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.cli import add_fields_to_records
+
+
+
+# Joins, negation, aggregation and unnest over generated rows, run in process.
+PROGRAM = '''
+person_region(name:, region:) <-
+	person(name:, country:)
+	country(name: country, region:)
+
+stateless(name:) <-
+	person(name:, country:)
+	not country(name: country)
+
+by_country(country:, count: count<>, oldest: max<age>) <-
+	person(country:, age:)
+	age >= 18
+
+tagged(name:, tag:) <-
+	person(name:, tags:)
+	(tag) := *tags
+'''
+
+SCHEMA = {
+    'tables': {
+        'person': {'columns': {
+            'name': {'type': 'TEXT'}, 'country': {'type': 'TEXT'},
+            'age': {'type': 'INTEGER'}, 'tags': {'type': 'JSON'}}},
+        'country': {'columns': {'name': {'type': 'TEXT'}, 'region': {'type': 'TEXT'}}},
+    }
+}
+
+def generate_rows(n_persons, n_countries=200):
+    rnd = random.Random(n_persons)
+    # every tenth country is unknown, so negation has something to find
+    countries = [{'name': f'c{i}', 'region': f'r{i % 7}'} for i in range(n_countries) if i % 10]
+    persons = [
+        {'name': f'p{i}', 'country': f'c{rnd.randrange(n_countries)}', 'age': rnd.randrange(100),
+         'tags': [f't{rnd.randrange(5)}' for _ in range(rnd.randrange(3))]}
+        for i in range(n_persons)]
+    return {'person': persons, 'country': countries}
+
+def main(sizes):
+    records = parser.parse(PROGRAM, 'bench.grasp', SCHEMA, mode='lalr')
+    sql = '\n'.join(local_backend.transpile(add_fields_to_records(records, {'pipeline_id': 'bench'}), 'bench'))
+    print(f'{"persons":>9} {"output":>9} {"run":>9}')
+    for n_persons in sizes:
+        inputs = generate_rows(n_persons)
+        t0 = time.perf_counter()
+        outputs = local_backend.run_sql(sql, inputs)
+        elapsed = time.perf_counter() - t0
+        print(f'{n_persons:>9} {sum(map(len, outputs.values())):>9} {elapsed:8.2f}s')
+
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [10000, 100000]
+    main(sizes)
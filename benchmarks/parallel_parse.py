@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import tempfile
+
+import grasp.parser as parser
+from program_generator import generate_program
+
+
+
+def write_modules(dir_path, n_files, rules_per_file):
+    paths = []
+    for i in range(n_files):
+        path = f'{dir_path}/module{i}.grasp'
+        with open(path, 'w') as f:
+            f.write(generate_program(rules_per_file, seed=i))
+        paths.append(path)
+    return paths
+
+def time_parallel_parse(paths, max_workers):
+    t0 = time.perf_counter()
+    results = dict(parser.parse_files_in_parallel(paths, mode='lalr', max_workers=max_workers))
+    return (time.perf_counter() - t0, results)
+
+def main(n_files, rules_per_file):
+    # warm up the on-disk grammar cache, so workers do not build it
+    parser.get_parser('lalr')
+    with tempfile.TemporaryDirectory() as dir_path:
+        paths = write_modules(dir_path, n_files, rules_per_file)
+        n_cpus = os.cpu_count()
+        workers = sorted(set([1, 2, 4, 8, 16, n_cpus]) & set(range(1, n_cpus + 1)))
+        print(f'{n_files} files, {rules_per_file} rules each, {n_cpus} cpus')
+        print(f'{"workers":>8} {"time":>10} {"speedup":>8}')
+        baseline = None
+        base_results = None
+        for max_workers in workers:
+            elapsed, results = time_parallel_parse(paths, max_workers)
+            if base_results is None:
+                (baseline, base_results) = (elapsed, results)
+            # ids must not depend on the number of workers or order of completion
+            assert results == base_results, f'Records differ with {max_workers} workers'
+            print(f'{max_workers:>8} {elapsed*1000:8.1f}ms {baseline/elapsed:7.2f}x')
+
+
+
+if __name__ == '__main__':
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    rules_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    main(n_files, rules_per_file)
@@ -0,0 +1,37 @@
+import sys
+import time
+
+import grasp.parser as parser
+from grasp.util import root_dir
+
+
+
+def program_of_size(copies):
+    # rules of the testcases, repeated. Parser does not care about duplicates
+    texts = [open(f'{root_dir()}/test/{name}.test.grasp', 'r').read()
+             for name in ['json_matching', 'binop', 'joins', 'strings', 'unnest']]
+    return '\n'.join(texts * copies)
+
+def time_parse(text, mode):
+    parser.get_parser(mode)
+    t0 = time.perf_counter()
+    parser.parse_tree(text, mode)
+    return time.perf_counter() - t0
+
+def main(max_copies):
+    print(f'{"rules":>8} {"lines":>8} {"earley":>12} {"lalr":>12} {"lalr per line":>14}')
+    copies = 1
+    while copies <= max_copies:
+        text = program_of_size(copies)
+        n_rules = len(parser.parse_tree(text, 'lalr').children)
+        n_lines = text.count('\n')
+        # earley gets too slow to wait for on big programs
+        earley = f'{time_parse(text, "earley")*1000:10.1f}ms' if copies <= 16 else '-'
+        lalr = time_parse(text, 'lalr')
+        print(f'{n_rules:>8} {n_lines:>8} {earley:>12} {lalr*1000:10.1f}ms {lalr/n_lines*1e6:11.1f}us')
+        copies *= 4
+
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 256)
@@ -0,0 +1,56 @@
+import os
+import sys
+import glob
+import time
+import tempfile
+import subprocess
+
+import grasp.parser as parser
+from grasp.util import root_dir
+
+
+
+# measured in a fresh interpreter, so in-process caches do not interfere
+CHILD_SCRIPT = """
+import sys
+import time
+t0 = time.perf_counter()
+import grasp.parser as parser
+t1 = time.perf_counter()
+parser.get_parser()
+t2 = time.perf_counter()
+parser.parse(open(sys.argv[1], 'r').read(), sys.argv[1])
+t3 = time.perf_counter()
+print(f'{t1-t0} {t2-t1} {t3-t2}')
+"""
+
+def run_child(source_path, cache_dir):
+    env = {**os.environ, 'GRASP_CACHE_DIR': cache_dir}
+    out = subprocess.check_output([sys.executable, '-c', CHILD_SCRIPT, source_path], env=env, text=True)
+    return [float(x) for x in out.split()]
+
+def report(label, import_time, build_time, parse_time):
+    print(f'{label:<24} import {import_time*1000:8.1f}ms  build {build_time*1000:8.1f}ms  parse {parse_time*1000:8.1f}ms')
+
+def main(source_path, repeat):
+    print(f'Source: {source_path}')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        report('cold process', *run_child(source_path, cache_dir))
+        report('warm disk cache', *run_child(source_path, cache_dir))
+
+    text = open(source_path, 'r').read()
+    t0 = time.perf_counter()
+    parser.parse(text, source_path)
+    first = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        parser.parse(text, source_path)
+    rest = (time.perf_counter() - t0) / repeat
+    print(f'in-process: first parse {first*1000:.1f}ms, next {repeat} parses {rest*1000:.1f}ms each')
+
+
+
+if __name__ == '__main__':
+    paths = sys.argv[1:] or sorted(glob.glob(f'{root_dir()}/test/joins.test.grasp'))
+    for path in paths:
+        main(path, repeat=10)
@@ -0,0 +1,58 @@
+import sys
+import random
+
+
+
+def fact_source(table_name, args):
+    return f'{table_name}({", ".join(args)})'
+
+def nested_dict_source(depth, leaf):
+    # {k0: {k1: leaf}} for depth 2
+    source = leaf
+    for level in reversed(range(depth)):
+        source = f'{{k{level}: {source}}}'
+    return source
+
+def every_nth(i, density):
+    # spreads density*n rules evenly over n rules, without randomness,
+    # so programs of different densities differ only where they have to
+    return int((i + 1) * density) > int(i * density)
+
+def generate_program(n_rules, facts_per_rule=3, seed=0, json_depth=0, aggregation_density=1.0, negation_density=0.0):
+    # Every rule joins facts_per_rule facts of input tables on a shared
+    # variable, and has a condition and a computed column.
+    # With json_depth, input facts carry a nested dict, matched by a pattern in every rule.
+    # Share of rules with aggregation and with a negated fact are set by densities.
+    rnd = random.Random(seed)
+    lines = []
+    for i in range(n_rules // 10 + 1):
+        args = [f'id: {i}', f'name: "name{i}"', f'value: {rnd.randint(0, 100)}']
+        if json_depth:
+            args.append(f'doc: {nested_dict_source(json_depth, str(i))}')
+        lines.append(fact_source(f'input{i}', args))
+    lines.append('')
+    for i in range(n_rules):
+        lines.append(f'output{i}(id:, total:, label:) <-')
+        for j in range(facts_per_rule):
+            input_table = f'input{rnd.randint(0, n_rules // 10)}'
+            args = ['id:', f'value: v{j}']
+            if json_depth and j == 0:
+                args.append(f'doc: {nested_dict_source(json_depth, "deep")}')
+            lines.append('\t' + fact_source(input_table, args))
+        if every_nth(i, negation_density):
+            lines.append('\t' + fact_source(f'not input{i % (n_rules // 10 + 1)}', ['id:', 'name: "missing"']))
+        last = f'v{facts_per_rule - 1}'
+        rest = ', '.join(f'v{j}' for j in range(1, facts_per_rule))
+        lines.append(f'\tv0 > {rnd.randint(0, 100)} and {last} != {rnd.randint(0, 100)}')
+        lines.append(f'\ttotal := max<v0>' if every_nth(i, aggregation_density) else f'\ttotal := v0')
+        if json_depth:
+            lines.append(f'\tlabel := {{ id:, first: v0, rest: [{rest}], deep: }}')
+        else:
+            lines.append(f'\tlabel := {{ id:, first: v0, rest: [{rest}] }}')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+
+if __name__ == '__main__':
+    print(generate_program(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,38 @@
+import sys
+import time
+import tracemalloc
+
+import grasp.parser as parser
+from program_generator import generate_program
+
+
+
+def build_records(tree):
+    sink = parser.RecordSink()
+    parser.records_from_tree(tree, 'generated.grasp', None, sink)
+    return sink.records
+
+def main(sizes):
+    print(f'{"rules":>8} {"rows":>9} {"records":>10} {"per rule":>10} {"peak mem":>10}')
+    for n_rules in sizes:
+        tree = parser.parse_tree(generate_program(n_rules), 'lalr')
+
+        t0 = time.perf_counter()
+        records = build_records(tree)
+        elapsed = time.perf_counter() - t0
+        n_rows = sum(len(rows) for rows in records.values())
+        del records
+
+        # measured separately, tracemalloc slows down allocations
+        tracemalloc.start()
+        build_records(tree)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f'{n_rules:>8} {n_rows:>9} {elapsed*1000:8.1f}ms {elapsed/n_rules*1e6:8.1f}us {peak/2**20:8.1f}MB')
+
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [1250, 2500, 5000, 10000]
+    main(sizes)
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+
+import aiohttp
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.cli import add_fields_to_records, fetch_full_pipeline_sql
+from grasp.util import root_dir, json_array_chunks, insert_record_deltas, INGRESS_CHUNK_ROWS, INGRESS_CHUNK_BYTES
+from program_generator import generate_program
+
+
+
+# Whole toolchain on synthetic programs: parse, upload, transpile.
+# Every size class is appended as one JSON line to the results file,
+# so regressions can be tracked across commits.
+
+SIZE_CLASSES = {
+    'small': {'n_rules': 10, 'facts_per_rule': 3, 'json_depth': 1, 'aggregation_density': 0.5, 'negation_density': 0.2},
+    'medium': {'n_rules': 100, 'facts_per_rule': 3, 'json_depth': 2, 'aggregation_density': 0.5, 'negation_density': 0.2},
+    'large': {'n_rules': 300, 'facts_per_rule': 5, 'json_depth': 3, 'aggregation_density': 0.5, 'negation_density': 0.2},
+    'wide': {'n_rules': 20, 'facts_per_rule': 20, 'json_depth': 1, 'aggregation_density': 1.0, 'negation_density': 1.0},
+}
+
+arg_parser = argparse.ArgumentParser(description='Benchmark of parsing and transpiling synthetic programs')
+arg_parser.add_argument(
+    '--backend', type=str, choices=['local', 'feldera'], default='local',
+    help='Transpile in process, or with the transpiler pipeline in running Feldera')
+arg_parser.add_argument(
+    '--feldera-url', type=str, default=os.environ.get('FELDERA_URL', 'http://localhost:8080'))
+arg_parser.add_argument(
+    '--results', type=str, default=f'{root_dir()}/benchmarks/results.jsonl',
+    help='JSON lines file the results are appended to')
+arg_parser.add_argument(
+    'size_classes', nargs='*',
+    help=f'Size classes to run, all by default: {", ".join(SIZE_CLASSES)}')
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=root_dir(),
+            capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def ingress_bytes(records):
+    # the same bodies insert_records would post
+    return sum(
+        len(body)
+        for rows in records.values()
+        for (body, _n_rows) in json_array_chunks(rows, INGRESS_CHUNK_ROWS, INGRESS_CHUNK_BYTES))
+
+async def transpile_with_feldera(feldera_url, records, pipeline_id):
+    from transpile_tables import PIPELINE_NAME, transpile
+    from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
+    async with aiohttp.ClientSession(feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        await ensure_transpiler_pipeline_is_ready(session, PIPELINE_NAME)
+        t0 = time.perf_counter()
+        await transpile(session, records)
+        sql_lines = await fetch_full_pipeline_sql(session, PIPELINE_NAME, pipeline_id)
+        elapsed = time.perf_counter() - t0
+        # leave the transpiler pipeline as it was
+        await insert_record_deltas(session, PIPELINE_NAME, {}, records)
+    return (sql_lines, elapsed)
+
+def run_size_class(args, name, params):
+    text = generate_program(**params)
+    pipeline_id = f'bench-{name}-{time.time()}'
+
+    t0 = time.perf_counter()
+    records = add_fields_to_records(
+        parser.parse(text, 'generated.grasp', mode='lalr'), {'pipeline_id': pipeline_id})
+    parse_s = time.perf_counter() - t0
+
+    if args.backend == 'local':
+        t0 = time.perf_counter()
+        sql_lines = local_backend.transpile(records, pipeline_id)
+        transpile_s = time.perf_counter() - t0
+    else:
+        (sql_lines, transpile_s) = asyncio.run(transpile_with_feldera(args.feldera_url, records, pipeline_id))
+
+    sql = '\n'.join(sql_lines)
+    return {
+        'size_class': name,
+        'params': params,
+        'backend': args.backend,
+        'source_bytes': len(text.encode('utf-8')),
+        'parse_s': round(parse_s, 4),
+        'records': sum(map(len, records.values())),
+        'ingress_bytes': ingress_bytes(records),
+        'transpile_s': round(transpile_s, 4),
+        'sql_lines': len(sql_lines),
+        'sql_bytes': len(sql.encode('utf-8')),
+    }
+
+def main(args):
+    size_classes = args.size_classes or list(SIZE_CLASSES.keys())
+    for name in size_classes:
+        if name not in SIZE_CLASSES:
+            raise Exception(f"Unknown size class: {name}")
+    run_info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+    }
+    print(f'{"class":>8} {"records":>8} {"ingress":>10} {"parse":>9} {"transpile":>10} {"sql lines":>10} {"sql size":>10}')
+    with open(args.results, 'a') as f:
+        for name in size_classes:
+            result = run_size_class(args, name, SIZE_CLASSES[name])
+            print(f'{name:>8} {result["records"]:>8} {result["ingress_bytes"]/2**10:8.1f}KB '
+                  f'{result["parse_s"]:8.2f}s {result["transpile_s"]:9.2f}s '
+                  f'{result["sql_lines"]:>10} {result["sql_bytes"]/2**10:8.1f}KB')
+            f.write(json.dumps({**run_info, **result}) + '\n')
+    print(f'Results appended to {args.results}')
+
+
+
+if __name__ == '__main__':
+    main(arg_parser.parse_args())
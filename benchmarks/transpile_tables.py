@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import asyncio
+
+import aiohttp
+
+import grasp.parser as parser
+from grasp.cli import add_fields_to_records, fetch_full_pipeline_sql
+from grasp.util import start_transaction, commit_transaction, insert_records, insert_record_deltas, wait_till_input_tokens_processed, fetch_pipeline_stats
+from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
+from program_generator import generate_program
+
+
+
+# Needs running Feldera with the transpiler pipeline, unlike other benchmarks.
+FELDERA_URL = os.environ.get('FELDERA_URL', 'http://localhost:8080')
+PIPELINE_NAME = 'grasp_transpiler'
+
+async def pipeline_rss_bytes(session):
+    match await fetch_pipeline_stats(session, PIPELINE_NAME):
+        case {'global_metrics': {'rss_bytes': rss_bytes}}:
+            return rss_bytes
+        case stats:
+            raise Exception(f"Unexpected stats: {stats}")
+
+async def transpile(session, records):
+    try:
+        await start_transaction(session, PIPELINE_NAME)
+        tokens = await insert_records(session, PIPELINE_NAME, records)
+    finally:
+        await commit_transaction(session, PIPELINE_NAME)
+    await wait_till_input_tokens_processed(session, PIPELINE_NAME, tokens)
+
+async def main(sizes):
+    async with aiohttp.ClientSession(FELDERA_URL, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        await ensure_transpiler_pipeline_is_ready(session, PIPELINE_NAME)
+        print(f'{"tables":>8} {"lines":>8} {"transpile":>10} {"fetch":>10} {"rss delta":>10}')
+        for n_tables in sizes:
+            # every generated rule defines its own output table
+            pipeline_id = f'bench-{n_tables}-{time.time()}'
+            records = add_fields_to_records(
+                parser.parse(generate_program(n_tables), 'generated.grasp', mode='lalr'),
+                {'pipeline_id': pipeline_id})
+
+            rss_before = await pipeline_rss_bytes(session)
+            t0 = time.perf_counter()
+            await transpile(session, records)
+            t1 = time.perf_counter()
+            sql_lines = await fetch_full_pipeline_sql(session, PIPELINE_NAME, pipeline_id)
+            t2 = time.perf_counter()
+            rss_after = await pipeline_rss_bytes(session)
+            print(f'{n_tables:>8} {len(sql_lines):>8} {t1-t0:9.2f}s {t2-t1:9.2f}s {(rss_after-rss_before)/2**20:8.1f}MB')
+
+            # leave the transpiler pipeline as it was
+            await insert_record_deltas(session, PIPELINE_NAME, {}, records)
+
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [10, 100, 1000]
+    asyncio.run(main(sizes))
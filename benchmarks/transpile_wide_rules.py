@@ -0,0 +1,93 @@
+import re
+import sys
+import time
+import asyncio
+import argparse
+
+import aiohttp
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.cli import add_fields_to_records, fetch_full_pipeline_sql
+from grasp.util import insert_record_deltas, read_transpiler_sql
+from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
+from baseline_transpiler import git_transpiler_sql, load_transpiler, convert_records, normalized_statements
+from program_generator import generate_program
+from transpile_tables import FELDERA_URL, PIPELINE_NAME, transpile
+
+
+
+# Fixpoint iterations of the transpiler's recursive views on rules with many
+# facts, counted by the local backend for the baseline and the current SQL.
+# Records are converted to the table layout of each, see baseline_transpiler.
+# With --feldera also measures transpile latency with running Feldera.
+N_RULES = 20
+
+arg_parser = argparse.ArgumentParser()
+arg_parser.add_argument(
+    '--baseline', type=str, required=True,
+    help='Git revision of the baseline transpiler, e.g. the branch merged into')
+arg_parser.add_argument('--feldera', action='store_true', help='Also transpile with running Feldera')
+arg_parser.add_argument('sizes', nargs='*', type=int, default=[10, 50, 100], help='Numbers of facts per rule')
+
+def count_recursive_views(sql):
+    return len(re.findall(r'^DECLARE RECURSIVE VIEW', sql, re.M))
+
+def generated_records(facts_per_rule, pipeline_id):
+    text = generate_program(N_RULES, facts_per_rule=facts_per_rule)
+    return add_fields_to_records(
+        parser.parse(text, 'generated.grasp', mode='lalr'), {'pipeline_id': pipeline_id})
+
+def evaluate_locally(program, records):
+    iterations = {}
+    t0 = time.perf_counter()
+    db = local_backend.evaluate_views(program, records, ['full_pipeline_sql'], iterations)
+    elapsed = time.perf_counter() - t0
+    [row] = local_backend.view_rows(db, 'full_pipeline_sql')
+    return (iterations, elapsed, row['sql_lines'])
+
+def compare_locally(args):
+    transpilers = [(args.baseline, load_transpiler(args.baseline)), ('current', load_transpiler())]
+    print(f'{"sql":>10} {"facts":>6} {"rules":>6} {"recursive":>10} {"iterations":>11} {"max":>5} {"evaluate":>10}')
+    for facts_per_rule in args.sizes:
+        records = generated_records(facts_per_rule, 'bench-wide')
+        outputs = []
+        for (name, (program, tables)) in transpilers:
+            (iterations, elapsed, sql_lines) = evaluate_locally(program, convert_records(records, tables))
+            outputs.append(sql_lines)
+            print(f'{name:>10} {facts_per_rule:>6} {N_RULES:>6} {len(iterations):>10} '
+                  f'{sum(iterations.values()):>11} {max(iterations.values(), default=0):>5} {elapsed:9.2f}s')
+        # aliases and the order of conditions may differ between transpilers
+        statements = [normalized_statements(o) for o in outputs]
+        n_differ = sum(a != b for (a, b) in zip(statements[0], statements[1]))
+        if n_differ or len(statements[0]) != len(statements[1]):
+            print(f'Output SQL differs for {facts_per_rule} facts per rule in {n_differ} of '
+                  f'{len(statements[0])} statements, {len(statements[1])} now')
+
+async def transpile_with_feldera(args):
+    async with aiohttp.ClientSession(FELDERA_URL, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        await ensure_transpiler_pipeline_is_ready(session, PIPELINE_NAME)
+        print(f'{"facts":>8} {"rules":>8} {"lines":>8} {"transpile":>10}')
+        for facts_per_rule in args.sizes:
+            pipeline_id = f'bench-wide-{facts_per_rule}-{time.time()}'
+            records = generated_records(facts_per_rule, pipeline_id)
+
+            t0 = time.perf_counter()
+            await transpile(session, records)
+            sql_lines = await fetch_full_pipeline_sql(session, PIPELINE_NAME, pipeline_id)
+            elapsed = time.perf_counter() - t0
+            print(f'{facts_per_rule:>8} {N_RULES:>8} {len(sql_lines):>8} {elapsed:9.2f}s')
+
+            await insert_record_deltas(session, PIPELINE_NAME, {}, records)
+
+def main(args):
+    print(f'Recursive views in transpiler: {count_recursive_views(git_transpiler_sql(args.baseline))} '
+          f'in {args.baseline}, {count_recursive_views(read_transpiler_sql())} now')
+    compare_locally(args)
+    if args.feldera:
+        asyncio.run(transpile_with_feldera(args))
+
+
+
+if __name__ == '__main__':
+    main(arg_parser.parse_args())
@@ -0,0 +1,63 @@
+import time
+import asyncio
+import argparse
+
+import aiohttp
+
+import grasp.parser as parser
+from grasp.cli import add_fields_to_records, fetch_full_pipeline_sql
+from grasp.util import insert_record_deltas, wait_till_input_tokens_processed
+from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
+from program_generator import generate_program
+from transpile_tables import FELDERA_URL, PIPELINE_NAME, transpile, pipeline_rss_bytes
+
+
+
+# Needs running Feldera with the transpiler pipeline, unlike other benchmarks.
+# Many runs one after another, each retracting its records after the SQL is
+# fetched, the way `grasp` does. Memory and latency must stay flat, compare
+# with --keep-records to see them grow.
+
+arg_parser = argparse.ArgumentParser(description='Soak test of the transpiler pipeline')
+arg_parser.add_argument('--runs', type=int, default=10000)
+arg_parser.add_argument('--window', type=int, default=500, help='Number of runs in one row of the report')
+arg_parser.add_argument('--rules', type=int, default=5, help='Number of rules in every program')
+arg_parser.add_argument('--keep-records', action='store_true', help='Do not retract records of runs')
+
+async def main(args):
+    # the same program, so the only thing that changes from run to run is pipeline_id
+    records0 = parser.parse(generate_program(args.rules), 'generated.grasp', mode='lalr')
+    async with aiohttp.ClientSession(FELDERA_URL, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        await ensure_transpiler_pipeline_is_ready(session, PIPELINE_NAME)
+        rss0 = await pipeline_rss_bytes(session)
+        print(f'{"runs":>8} {"avg":>10} {"max":>10} {"rss":>10} {"rss delta":>10}')
+        windows = []
+        latencies = []
+        for i in range(args.runs):
+            pipeline_id = f'soak:{time.time()}:{i}'
+            records = add_fields_to_records(records0, {'pipeline_id': pipeline_id})
+            t0 = time.perf_counter()
+            await transpile(session, records)
+            await fetch_full_pipeline_sql(session, PIPELINE_NAME, pipeline_id)
+            latencies.append(time.perf_counter() - t0)
+            if not args.keep_records:
+                tokens = await insert_record_deltas(session, PIPELINE_NAME, {}, records)
+                # processed before memory is sampled, so windows are comparable
+                await wait_till_input_tokens_processed(session, PIPELINE_NAME, tokens)
+
+            if len(latencies) == args.window or i + 1 == args.runs:
+                rss = await pipeline_rss_bytes(session)
+                avg = sum(latencies) / len(latencies)
+                windows.append((avg, rss))
+                print(f'{i+1:>8} {avg*1000:8.1f}ms {max(latencies)*1000:8.1f}ms '
+                      f'{rss/2**20:8.1f}MB {(rss-rss0)/2**20:8.1f}MB', flush=True)
+                latencies = []
+
+        ((first_avg, first_rss), (last_avg, last_rss)) = (windows[0], windows[-1])
+        print(f'Latency of the last window is {last_avg/first_avg:.2f}x of the first, '
+              f'memory grew by {(last_rss-first_rss)/2**20:.1f}MB')
+
+
+
+if __name__ == '__main__':
+    asyncio.run(main(arg_parser.parse_args()))
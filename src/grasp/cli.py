@@ -1,46 +1,202 @@
+import os
+import sys
+import json
+import signal
 import argparse
 import pathlib
 import asyncio
 import time
+import contextlib
 
 import json5
 import aiohttp
 
 from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
-from grasp.util import start_transaction, commit_transaction, insert_records, wait_till_input_tokens_processed, adhoc_query
+from grasp.util import start_transaction, commit_transaction, insert_records_from_iter, insert_record_deltas, wait_till_input_tokens_processed, adhoc_query, iter_adhoc_query, format_wait_metrics, ingest_files, sql_str, pipeline_id_timestamp, transpiler_table_names, INGRESS_CONCURRENCY, INGRESS_CHUNK_BYTES
 import grasp.parser as parser
+import grasp.manifest as manifest
+import grasp.local_backend as local_backend
+import grasp.trace as trace
+import grasp.service as service
+import grasp.result_cache as result_cache
 
 
 
 arg_parser = argparse.ArgumentParser(
     prog='Grasp',
-    description='Transpiler from Grasp to Feldera SQL')
+    description='Transpiler from Grasp to Feldera SQL',
+    epilog='Run `grasp watch [options] input...` to re-transpile on every change of inputs, '
+           '`grasp ingest --help` to load data into a pipeline, '
+           '`grasp run --help` to run a program over data without Feldera, '
+           '`grasp serve --help` to batch transpile requests of many clients, '
+           '`grasp gc --help` to remove records of old runs from the transpiler')
 
 arg_parser.add_argument(
     '--feldera-url', type=str, default='http://localhost:8080', help='Feldera URL')
+arg_parser.add_argument(
+    '--backend', type=str, choices=['feldera', 'local', 'service'], default='feldera',
+    help='Transpile with the transpiler pipeline in Feldera, in process without a server, '
+         'or by `grasp serve` running at --service-url')
+arg_parser.add_argument(
+    '--service-url', type=str, default='http://localhost:8081', help='URL of `grasp serve`')
 arg_parser.add_argument(
     '--transpiler-pipeline-name', type=str, default='grasp_transpiler',
     help='Name of the pipeline responsible for the transpiler')
 arg_parser.add_argument(
+    '--parser-mode', type=str, choices=parser.PARSER_MODES, default=parser.DEFAULT_PARSER_MODE,
+    help='Grammar used to parse *.grasp files: LALR, Earley, or LALR with Earley fallback (auto)')
+arg_parser.add_argument(
+    '--batch-rules', type=int, default=200,
+    help='Number of top-level rules parsed and uploaded in one batch')
+arg_parser.add_argument(
+    '--jobs', type=int, default=1,
+    help='Number of processes parsing input files in parallel, 0 means one per CPU')
+arg_parser.add_argument(
+    '--incremental', action='store_true',
+    help='Send only records changed since the previous run with the same inputs')
+arg_parser.add_argument(
+    '--poll-interval', type=float, default=0.05,
+    help='How often `grasp watch` checks input files for changes, in seconds')
+arg_parser.add_argument(
+    '--wait-metrics', action='store_true',
+    help='Print how long it took to wait for Feldera, per kind of wait')
+arg_parser.add_argument(
+    '--compact-ids', action='store_true',
+    help='Number AST nodes densely over the whole run, instead of ids derived from content. '
+         'Ids are smaller, but change from run to run, so not for --incremental')
+arg_parser.add_argument(
+    '--ingress-format', type=str, choices=['json', 'csv'], default='json',
+    help='Format of records sent to the transpiler pipeline, CSV has no repeated keys')
+arg_parser.add_argument(
+    '--keep-records', action='store_true',
+    help='Do not retract records of this run from the transpiler pipeline after the SQL is fetched')
+arg_parser.add_argument(
+    '--no-cache', action='store_true',
+    help='Do not look up nor store output SQL in the result cache')
+arg_parser.add_argument(
+    '--cache-stats', action='store_true',
+    help='Print hits and misses of the result cache')
+arg_parser.add_argument(
+    '--trace', type=str,
+    help='Write spans of parsing, ingress, waits and queries into this file, in Chrome trace format')
+arg_parser.add_argument(
+    'input', nargs='+', type=pathlib.Path,
+    help='Input file(s) *.grasp and *.schema.json5')
+
+
+ingest_arg_parser = argparse.ArgumentParser(
+    prog='grasp ingest',
+    description='Stream *.jsonl and *.csv files into tables of a running Feldera pipeline')
+ingest_arg_parser.add_argument(
+    '--feldera-url', type=str, default='http://localhost:8080', help='Feldera URL')
+ingest_arg_parser.add_argument(
+    '--pipeline-name', type=str, required=True, help='Name of the pipeline to load data into')
+ingest_arg_parser.add_argument(
+    '--concurrency', type=int, default=INGRESS_CONCURRENCY,
+    help='Number of chunks uploaded in parallel')
+ingest_arg_parser.add_argument(
+    '--chunk-bytes', type=int, default=INGRESS_CHUNK_BYTES,
+    help='Size of one uploaded chunk')
+ingest_arg_parser.add_argument(
+    '--csv-header', action='store_true',
+    help='Skip the first line of every *.csv file')
+ingest_arg_parser.add_argument(
+    'input', nargs='+', type=str,
+    help='table_name=path, or just path, then table name is the file name up to the first dot')
+
+
+run_arg_parser = argparse.ArgumentParser(
+    prog='grasp run',
+    description='Transpile and run a program over *.jsonl files in process, without Feldera. '
+                'Rows of output views are printed as JSON lines')
+run_arg_parser.add_argument(
+    '--parser-mode', type=str, choices=parser.PARSER_MODES, default=parser.DEFAULT_PARSER_MODE,
+    help='Grammar used to parse *.grasp files: LALR, Earley, or LALR with Earley fallback (auto)')
+run_arg_parser.add_argument(
+    '--data', type=str, action='append', default=[],
+    help='table_name=path of *.jsonl file, or just path, then table name is the file name up to the first dot')
+run_arg_parser.add_argument(
+    '--view', type=str, action='append',
+    help='Name of the output view to print, all views by default')
+run_arg_parser.add_argument(
+    '--trace', type=str,
+    help='Write spans of parsing, transpiling and running into this file, in Chrome trace format')
+run_arg_parser.add_argument(
     'input', nargs='+', type=pathlib.Path,
     help='Input file(s) *.grasp and *.schema.json5')
 
 
+serve_arg_parser = argparse.ArgumentParser(
+    prog='grasp serve',
+    description='HTTP service transpiling requests of many clients. Requests arriving within '
+                'a short window share one transaction of the transpiler pipeline')
+serve_arg_parser.add_argument(
+    '--feldera-url', type=str, default='http://localhost:8080', help='Feldera URL')
+serve_arg_parser.add_argument(
+    '--transpiler-pipeline-name', type=str, default='grasp_transpiler',
+    help='Name of the pipeline responsible for the transpiler')
+serve_arg_parser.add_argument(
+    '--parser-mode', type=str, choices=parser.PARSER_MODES, default=parser.DEFAULT_PARSER_MODE,
+    help='Grammar used to parse *.grasp files: LALR, Earley, or LALR with Earley fallback (auto)')
+serve_arg_parser.add_argument('--host', type=str, default='localhost')
+serve_arg_parser.add_argument('--port', type=int, default=8081)
+serve_arg_parser.add_argument(
+    '--batch-window', type=float, default=0.05,
+    help='How long the first request of a batch waits for others, in seconds')
+serve_arg_parser.add_argument(
+    '--max-batch', type=int, default=64, help='Maximal number of requests in one transaction')
+
+
+gc_arg_parser = argparse.ArgumentParser(
+    prog='grasp gc',
+    description='Retract records of old runs from the transpiler pipeline. Records of runs '
+                'that failed or were interrupted are never retracted by the runs themselves')
+gc_arg_parser.add_argument(
+    '--feldera-url', type=str, default='http://localhost:8080', help='Feldera URL')
+gc_arg_parser.add_argument(
+    '--transpiler-pipeline-name', type=str, default='grasp_transpiler',
+    help='Name of the pipeline responsible for the transpiler')
+gc_arg_parser.add_argument(
+    '--older-than', type=float, default=3600,
+    help='Only pipeline_ids started this many seconds ago or earlier are stale. Records of '
+         'running `grasp watch` sessions and of --incremental manifests are never stale')
+gc_arg_parser.add_argument(
+    '--batch', type=int, default=100, help='Number of pipeline_ids retracted at once')
+gc_arg_parser.add_argument(
+    '--dry-run', action='store_true', help='Only print stale pipeline_ids')
+
 
-def natural_num_generator():
-    n = 1
-    while True:
-        yield n
-        n += 1
 
 def add_fields_to_records(records, fields):
     def mix_in_fields(rows):
         return [{**r, **fields} for r in rows]
     return dict([(table_name, mix_in_fields(rows)) for (table_name, rows) in records.items()])
 
-async def grasp_main():
-    args = arg_parser.parse_args()
+async def fetch_manifest_if_loaded(session, pipeline_name, key):
+    # records of the previous run might be lost, if the transpiler pipeline
+    # was restarted or recompiled. Then everything is sent again
+    prev = manifest.read_manifest(key)
+    if not prev:
+        return None
+    sql = f"SELECT COUNT(*) AS n FROM rule WHERE pipeline_id = '{prev['pipeline_id']}'"
+    resp = await adhoc_query(session, pipeline_name, sql)
+    match resp:
+        case {'n': n} | [{'n': n}] if n == len(prev['records'].get('rule', [])):
+            return prev
+        case _:
+            return None
 
+async def fetch_full_pipeline_sql(session, pipeline_name, pipeline_id):
+    sql = f'SELECT sql_lines FROM full_pipeline_sql WHERE pipeline_id = \'{pipeline_id}\''
+    rows = [row async for row in iter_adhoc_query(session, pipeline_name, sql)]
+    match rows:
+        case [{'sql_lines': sql_lines}]:
+            trace.counter('sql_lines', lines=len(sql_lines))
+            return sql_lines
+        case _:
+            raise Exception(f"Unexpected response {rows}")
+
+async def grasp_main(args):
     grasp_source_paths = [p for p in args.input if p.suffix == '.grasp']
     schema_paths = [p for p in args.input if (p.name[-13:] == '.schema.json5')]
     for p in args.input:
@@ -48,43 +204,138 @@ async def grasp_main():
             print(f'Unexpected input, neither *.grasp nor *.schema.json5 prefix: {p}')
             exit(1)
 
+    if args.compact_ids and (args.incremental or args.jobs != 1):
+        print('--compact-ids are numbered in one process and differ between runs, '
+              'neither --incremental nor --jobs can be used with them')
+        exit(1)
+    idgen = parser.dense_ids() if args.compact_ids else None
+
+    cache_key = None
+    if not args.no_cache:
+        cache_key = result_cache.cache_key(
+            [*schema_paths, *grasp_source_paths],
+            [f'backend={args.backend}', *(['compact_ids'] if args.compact_ids else [])])
+        sql = result_cache.read(cache_key)
+        if sql is not None:
+            # no HTTP session at all
+            print(sql)
+            if args.cache_stats:
+                print(result_cache.format_stats(), file=sys.stderr)
+            return
+
+    def print_sql(sql_lines):
+        sql = '\n'.join(sql_lines)
+        if cache_key:
+            result_cache.write(cache_key, sql)
+        print(sql)
+        if args.cache_stats and cache_key:
+            print(result_cache.format_stats(), file=sys.stderr)
+
     pipeline_id = str(time.time())
-    idgen = natural_num_generator()
+
+    def iter_all_records():
+        for schema_path in schema_paths:
+            schema = json5.loads(open(schema_path, 'r').read())
+            records0 = parser.records_from_schema(schema)
+            yield add_fields_to_records(records0, {'pipeline_id': pipeline_id})
+
+        if args.jobs != 1:
+            # every file is parsed as a whole
+            parsed_iter = parser.parse_files_in_parallel(
+                grasp_source_paths, mode=args.parser_mode, max_workers=(args.jobs or None))
+            for (_source_path, records0) in parsed_iter:
+                yield add_fields_to_records(records0, {'pipeline_id': pipeline_id})
+            return
+
+        for source_path in grasp_source_paths:
+            records_iter = parser.iter_records(
+                open(source_path, 'r').read(), str(source_path),
+                idgen=idgen, mode=args.parser_mode, batch_size=args.batch_rules)
+            for records0 in records_iter:
+                yield add_fields_to_records(records0, {'pipeline_id': pipeline_id})
+
+    if args.backend == 'local':
+        # all records at once, there is nothing to send incrementally,
+        # parsed and transpiled in a thread, so the event loop is not blocked
+        def transpile_locally():
+            sink = parser.RecordSink()
+            for records in iter_all_records():
+                sink.add_records(records)
+            return local_backend.transpile(sink.records, pipeline_id)
+        print_sql(await asyncio.to_thread(transpile_locally))
+        return
+
+    if args.backend == 'service':
+        # sources are parsed by the service
+        files = dict((str(p), open(p, 'r').read()) for p in [*schema_paths, *grasp_source_paths])
+        async with aiohttp.ClientSession(args.service_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+            async with session.post('/transpile', json={'files': files}) as resp:
+                match await resp.json():
+                    case {'sql_lines': sql_lines}:
+                        print_sql(sql_lines)
+                    case {'error': error}:
+                        print(error, file=sys.stderr)
+                        exit(1)
+                    case json_resp:
+                        raise Exception(f"Unexpected response {resp.status}: {json_resp}")
+        return
 
     async with aiohttp.ClientSession(args.feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
         await ensure_transpiler_pipeline_is_ready(session, args.transpiler_pipeline_name)
 
-        queued_tokens = set()
-        try:
-            await start_transaction(session, args.transpiler_pipeline_name)
-            for schema_path in schema_paths:
-                schema = json5.loads(open(schema_path, 'r').read())
-                records0 = parser.records_from_schema(schema)
-                records = add_fields_to_records(records0, {'pipeline_id': pipeline_id})
-                tokens = await insert_records(session, args.transpiler_pipeline_name, records)
-                queued_tokens = queued_tokens.union(tokens)
-
-            for source_path in grasp_source_paths:
-                    records0 = parser.parse(open(source_path, 'r').read(), str(source_path), idgen=idgen)
-                    records = add_fields_to_records(records0, {'pipeline_id': pipeline_id})
-                    tokens = await insert_records(session, args.transpiler_pipeline_name, records)
-                    queued_tokens = queued_tokens.union(tokens)
-        finally:
-            await commit_transaction(session, args.transpiler_pipeline_name)
+        if args.incremental:
+            key = manifest.program_key(args.input)
+            prev = await fetch_manifest_if_loaded(session, args.transpiler_pipeline_name, key)
+            prev_records = {}
+            if prev:
+                (pipeline_id, prev_records) = (prev['pipeline_id'], prev['records'])
+            sink = parser.RecordSink()
+            for records in iter_all_records():
+                sink.add_records(records)
+            (inserts, deletes) = manifest.diff_records(prev_records, sink.records)
+            print(f"Inserting {sum(map(len, inserts.values()))} and deleting "
+                  f"{sum(map(len, deletes.values()))} records", file=sys.stderr)
+            # the manifest is invalid until the changes are committed. Meanwhile
+            # a lease keeps `grasp gc` off the records of this pipeline_id
+            manifest.renew_lease(pipeline_id)
+            try:
+                manifest.remove_manifest(key)
+                try:
+                    await start_transaction(session, args.transpiler_pipeline_name)
+                    queued_tokens = await insert_record_deltas(
+                        session, args.transpiler_pipeline_name, inserts, deletes)
+                finally:
+                    await commit_transaction(session, args.transpiler_pipeline_name)
+                manifest.write_manifest(key, pipeline_id, sink.records)
+            finally:
+                manifest.remove_lease(pipeline_id)
+        else:
+            sent = parser.RecordSink()
+            def iter_sent_records():
+                for records in iter_all_records():
+                    sent.add_records(records)
+                    yield records
+            try:
+                await start_transaction(session, args.transpiler_pipeline_name)
+                queued_tokens = await insert_records_from_iter(
+                    session, args.transpiler_pipeline_name, iter_sent_records(),
+                    ingress_format=args.ingress_format)
+            finally:
+                await commit_transaction(session, args.transpiler_pipeline_name)
 
         # print(f"Queued: {queued_tokens}")
 
         # all_tokens = set().union(*queued_tokens.values())
         await wait_till_input_tokens_processed(
             session, args.transpiler_pipeline_name, queued_tokens)
-        sql = f'SELECT sql_lines FROM full_pipeline_sql WHERE pipeline_id = \'{pipeline_id}\''
-        resp = await adhoc_query(session, args.transpiler_pipeline_name, sql)
-        match resp:
-            case {'sql_lines': sql_lines}:
-                print('\n'.join(sql_lines))
-            case _:
-                raise Exception(f"Unexpected response {resp}")
-                # exit(1)
+        sql_lines = await fetch_full_pipeline_sql(session, args.transpiler_pipeline_name, pipeline_id)
+        print_sql(sql_lines)
+        if not args.incremental and not args.keep_records:
+            # without a transaction, nobody reads this pipeline_id anymore.
+            # Incremental runs keep records for the next run
+            await insert_record_deltas(session, args.transpiler_pipeline_name, {}, sent.records)
+        if args.wait_metrics:
+            print(format_wait_metrics(), file=sys.stderr)
 
         # paths_without_errors = (set(testcases_paths) - set(with_errors.keys())) & set(pipeline_ids.keys())
         # for testcase_path in paths_without_errors:
@@ -97,5 +348,232 @@ async def grasp_main():
 
 
 
+def input_file_stamp(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return None
+
+def input_file_records(path, pipeline_id, mode):
+    if path.suffix == '.grasp':
+        records0 = parser.parse(open(path, 'r').read(), str(path), mode=mode)
+    else:
+        records0 = parser.records_from_schema(json5.loads(open(path, 'r').read()))
+    return add_fields_to_records(records0, {'pipeline_id': pipeline_id})
+
+async def send_record_deltas(session, pipeline_name, inserts, deletes):
+    try:
+        await start_transaction(session, pipeline_name)
+        tokens = await insert_record_deltas(session, pipeline_name, inserts, deletes)
+    finally:
+        await commit_transaction(session, pipeline_name)
+    await wait_till_input_tokens_processed(session, pipeline_name, tokens)
+
+async def grasp_watch(args):
+    for p in args.input:
+        if p.suffix != '.grasp' and p.name[-13:] != '.schema.json5':
+            print(f'Unexpected input, neither *.grasp nor *.schema.json5 prefix: {p}')
+            exit(1)
+
+    # one pipeline_id for the whole session, every change is sent as a delta
+    pipeline_id = f'watch:{time.time()}'
+    pipeline_name = args.transpiler_pipeline_name
+    # build the parser before the first change
+    parser.get_parser('earley' if args.parser_mode == 'earley' else 'lalr')
+
+    stamps = {}
+    file_records = {}
+    if args.backend == 'local':
+        # no server, records of all files are transpiled on every change
+        session_context = contextlib.nullcontext()
+    else:
+        session_context = aiohttp.ClientSession(args.feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0))
+    async with session_context as session:
+        if session:
+            await ensure_transpiler_pipeline_is_ready(session, pipeline_name)
+        print(f"Watching {len(args.input)} file(s)", file=sys.stderr)
+        # stop the same way on Ctrl-C and on kill
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        # records of the session are not garbage collected while it renews the lease
+        manifest.renew_lease(pipeline_id)
+        lease_renewed = time.time()
+        try:
+            while True:
+                if time.time() - lease_renewed >= manifest.LEASE_RENEW_INTERVAL:
+                    manifest.renew_lease(pipeline_id)
+                    lease_renewed = time.time()
+                changed = [p for p in args.input if input_file_stamp(p) != stamps.get(p)]
+                if not changed:
+                    await asyncio.sleep(args.poll_interval)
+                    continue
+
+                t0 = time.perf_counter()
+                inserts = parser.RecordSink()
+                deletes = parser.RecordSink()
+                for path in changed:
+                    stamps[path] = input_file_stamp(path)
+                    try:
+                        records = {}
+                        if stamps[path]:
+                            records = await asyncio.to_thread(
+                                input_file_records, path, pipeline_id, args.parser_mode)
+                        (file_inserts, file_deletes) = manifest.diff_records(file_records.get(path, {}), records)
+                    except Exception as e:
+                        # file might be saved halfway, keep its previous records
+                        print(f"Failed to read {path}: {e}", file=sys.stderr)
+                        continue
+                    inserts.add_records(file_inserts)
+                    deletes.add_records(file_deletes)
+                    file_records[path] = records
+                if not inserts.records and not deletes.records:
+                    continue
+
+                if session:
+                    await send_record_deltas(session, pipeline_name, inserts.records, deletes.records)
+                try:
+                    if session:
+                        sql_lines = await fetch_full_pipeline_sql(session, pipeline_name, pipeline_id)
+                    else:
+                        all_records = parser.RecordSink()
+                        for records in file_records.values():
+                            all_records.add_records(records)
+                        sql_lines = await asyncio.to_thread(
+                            local_backend.transpile, all_records.records, pipeline_id)
+                    print('\n'.join(sql_lines), flush=True)
+                except Exception as e:
+                    print(f"Failed to transpile: {e}", file=sys.stderr)
+                print(f"Transpiled in {(time.perf_counter() - t0)*1000:.0f}ms", file=sys.stderr)
+                if args.wait_metrics:
+                    print(format_wait_metrics(), file=sys.stderr)
+        finally:
+            # do not leave records of the session in the transpiler
+            all_records = parser.RecordSink()
+            for records in file_records.values():
+                all_records.add_records(records)
+            if session:
+                await send_record_deltas(session, pipeline_name, {}, all_records.records)
+            manifest.remove_lease(pipeline_id)
+
+
+
+async def grasp_gc(args):
+    pipeline_name = args.transpiler_pipeline_name
+    table_names = transpiler_table_names()
+    async with aiohttp.ClientSession(args.feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        n_rows = {}
+        for table_name in table_names:
+            sql = f'SELECT pipeline_id, COUNT(*) AS n FROM {table_name} GROUP BY pipeline_id'
+            async for row in iter_adhoc_query(session, pipeline_name, sql):
+                n_rows[row['pipeline_id']] = n_rows.get(row['pipeline_id'], 0) + row['n']
+
+        # testcases have no timestamp, incremental runs and watch sessions are still in use
+        now = time.time()
+        live = manifest.manifests_pipeline_ids() | manifest.leased_pipeline_ids(now)
+        stale = sorted(
+            pipeline_id for pipeline_id in n_rows
+            if pipeline_id not in live
+            and (started := pipeline_id_timestamp(pipeline_id)) is not None
+            and now - started >= args.older_than)
+        print(f"{len(n_rows)} pipeline_ids, {len(stale)} stale with "
+              f"{sum(n_rows[p] for p in stale)} records", file=sys.stderr)
+        if args.dry_run:
+            for pipeline_id in stale:
+                print(f'{pipeline_id}\t{n_rows[pipeline_id]}')
+            return
+
+        for i in range(0, len(stale), args.batch):
+            pipeline_ids = ', '.join(map(sql_str, stale[i:i + args.batch]))
+            deletes = {}
+            for table_name in table_names:
+                sql = f'SELECT * FROM {table_name} WHERE pipeline_id IN ({pipeline_ids})'
+                rows = [row async for row in iter_adhoc_query(session, pipeline_name, sql)]
+                if rows:
+                    deletes[table_name] = rows
+            tokens = await insert_record_deltas(session, pipeline_name, {}, deletes)
+            await wait_till_input_tokens_processed(session, pipeline_name, tokens)
+            print(f"Retracted {min(i + args.batch, len(stale))} of {len(stale)} pipeline_ids", file=sys.stderr)
+
+
+
+def ingest_input_table_path(spec):
+    if '=' in spec:
+        (table_name, path) = spec.split('=', 1)
+        return (table_name, path)
+    return (os.path.basename(spec).split('.')[0], spec)
+
+async def grasp_ingest(args):
+    table_paths = [ingest_input_table_path(spec) for spec in args.input]
+    for (_table_name, path) in table_paths:
+        if not (path.endswith('.jsonl') or path.endswith('.csv')):
+            print(f'Unexpected input, neither *.jsonl nor *.csv: {path}')
+            exit(1)
+
+    async with aiohttp.ClientSession(args.feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        t0 = time.perf_counter()
+        (tokens, stats) = await ingest_files(
+            session, args.pipeline_name, table_paths, csv_header=args.csv_header,
+            concurrency=args.concurrency, chunk_bytes=args.chunk_bytes)
+        uploaded = time.perf_counter() - t0
+        await wait_till_input_tokens_processed(session, args.pipeline_name, tokens)
+        processed = time.perf_counter() - t0
+
+    print(f"Uploaded {stats['rows']} rows, {stats['bytes']/2**20:.1f}MB in {uploaded:.2f}s: "
+          f"{stats['rows']/uploaded:.0f} rows/s, {stats['bytes']/2**20/uploaded:.1f}MB/s", file=sys.stderr)
+    print(f"Processed in {processed:.2f}s: {stats['rows']/processed:.0f} rows/s", file=sys.stderr)
+
+
+
+def grasp_run(args):
+    for p in args.input:
+        if p.suffix != '.grasp' and p.name[-13:] != '.schema.json5':
+            print(f'Unexpected input, neither *.grasp nor *.schema.json5 prefix: {p}')
+            exit(1)
+
+    pipeline_id = 'run'
+    records = parser.RecordSink()
+    for path in args.input:
+        records.add_records(input_file_records(path, pipeline_id, args.parser_mode))
+    sql_lines = local_backend.transpile(records.records, pipeline_id)
+
+    tables_rows = {}
+    for spec in args.data:
+        (table_name, path) = ingest_input_table_path(spec)
+        with open(path, 'r') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        tables_rows.setdefault(table_name, []).extend(rows)
+    outputs = local_backend.run_sql('\n'.join(sql_lines), tables_rows, args.view)
+    for (view_name, rows) in outputs.items():
+        for row in rows:
+            print(json.dumps({'view': view_name, 'row': row}))
+
+
+
 def main():
-    asyncio.run(grasp_main(), debug=True)
\ No newline at end of file
+    if sys.argv[1:2] == ['run']:
+        args = run_arg_parser.parse_args(sys.argv[2:])
+        with trace.recording(args.trace):
+            grasp_run(args)
+    elif sys.argv[1:2] == ['serve']:
+        args = serve_arg_parser.parse_args(sys.argv[2:])
+        try:
+            asyncio.run(service.serve(
+                args.feldera_url, args.transpiler_pipeline_name, args.host, args.port,
+                args.parser_mode, args.batch_window, args.max_batch))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+    elif sys.argv[1:2] == ['gc']:
+        asyncio.run(grasp_gc(gc_arg_parser.parse_args(sys.argv[2:])), debug=True)
+    elif sys.argv[1:2] == ['ingest']:
+        asyncio.run(grasp_ingest(ingest_arg_parser.parse_args(sys.argv[2:])), debug=True)
+    elif sys.argv[1:2] == ['watch']:
+        args = arg_parser.parse_args(sys.argv[2:])
+        with trace.recording(args.trace):
+            try:
+                asyncio.run(grasp_watch(args), debug=True)
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                pass
+    else:
+        args = arg_parser.parse_args()
+        with trace.recording(args.trace):
+            asyncio.run(grasp_main(args), debug=True)
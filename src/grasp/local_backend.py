@@ -0,0 +1,1133 @@
+import re
+import hashlib
+import functools
+import collections
+
+import grasp.trace as trace
+from grasp.util import read_transpiler_sql
+
+
+
+# Local backend evaluates views of transpiler/*.sql in process, without Feldera.
+# It understands only the subset of SQL the transpiler is written in,
+# and the transpiler generates, so the views stay the single source of truth
+# for the generated SQL, and the generated SQL can be run over fixtures too.
+
+MAX_FIXPOINT_ITERATIONS = 10000
+
+AGGREGATE_FUNCTIONS = {'COUNT', 'MIN', 'MAX', 'SUM', 'ARG_MIN', 'ARG_MAX', 'SOME', 'EVERY', 'ARRAY_AGG'}
+
+# words that end an expression or a FROM item, so they are never taken as an alias
+RESERVED_WORDS = {
+    'SELECT', 'DISTINCT', 'FROM', 'JOIN', 'CROSS', 'ON', 'WHERE', 'GROUP', 'BY', 'HAVING',
+    'UNION', 'AS', 'AND', 'OR', 'NOT', 'IS', 'IN', 'RLIKE', 'ORDER', 'WITH', 'FOR'}
+
+TOKEN_RE = re.compile(r"""
+    (?P<skip>\s+|--[^\n]*|/\*.*?\*/)
+    |(?P<str>'(?:[^']|'')*')
+    |(?P<name>"[^"]*")
+    |(?P<num>[0-9]+)
+    |(?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<op>\|\||!=|<>|<=|>=|->|[(),.\[\]*+\-=<>;])
+""", re.S | re.X)
+
+def tokenize(sql):
+    tokens = []
+    pos = 0
+    while pos < len(sql):
+        m = TOKEN_RE.match(sql, pos)
+        if not m:
+            raise Exception(f"Unexpected SQL at {pos}: {sql[pos:pos+40]!r}")
+        pos = m.end()
+        match m.lastgroup:
+            case 'skip':
+                pass
+            case 'str':
+                tokens.append(('str', m.group()[1:-1].replace("''", "'")))
+            case 'name':
+                tokens.append(('name', m.group()[1:-1]))
+            case 'num':
+                tokens.append(('num', int(m.group())))
+            case kind:
+                tokens.append((kind, m.group()))
+    tokens.append(('eof', None))
+    return tokens
+
+
+
+# Expressions are tuples:
+#   ('lit', value), ('col', alias or None, name), ('fn', NAME, args, extra),
+#   ('agg', NAME, args, (distinct, order_by)), ('exists', query), ('lambda', param, body).
+# Query is a list of UNION branches, every branch is a dict.
+
+class SqlParser:
+    def __init__(self, sql):
+        self.tokens = tokenize(sql)
+        self.pos = 0
+
+    def error(self, msg):
+        context = ' '.join(str(t[1]) for t in self.tokens[self.pos:self.pos+8])
+        return Exception(f"Unsupported SQL, {msg}: {context}")
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def is_kw(self, *words, offset=0):
+        (kind, value) = self.peek(offset)
+        return kind == 'ident' and value.upper() in words
+
+    def is_op(self, *ops, offset=0):
+        (kind, value) = self.peek(offset)
+        return kind == 'op' and value in ops
+
+    def accept_kw(self, word):
+        if self.is_kw(word):
+            self.pos += 1
+            return True
+        return False
+
+    def accept_op(self, op):
+        if self.is_op(op):
+            self.pos += 1
+            return True
+        return False
+
+    def expect_kw(self, word):
+        if not self.accept_kw(word):
+            raise self.error(f"expected {word}")
+
+    def expect_op(self, op):
+        if not self.accept_op(op):
+            raise self.error(f"expected {op}")
+
+    def name(self):
+        (kind, value) = self.peek()
+        if kind not in ('ident', 'name'):
+            raise self.error("expected name")
+        self.pos += 1
+        return value
+
+    def is_alias(self):
+        (kind, value) = self.peek()
+        return kind == 'name' or (kind == 'ident' and value.upper() not in RESERVED_WORDS)
+
+    def statements(self):
+        while self.peek()[0] != 'eof':
+            if not self.accept_op(';'):
+                yield self.statement()
+
+    def statement(self):
+        if self.accept_kw('DECLARE'):
+            self.expect_kw('RECURSIVE')
+            self.expect_kw('VIEW')
+            return ('declare', self.name(), self.column_defs())
+        self.expect_kw('CREATE')
+        if self.accept_kw('TABLE'):
+            name = self.name()
+            columns = self.column_defs()
+            self.skip_statement()
+            return ('table', name, columns)
+        if self.accept_kw('FUNCTION'):
+            # UDFs are implemented in Python, see SCALAR_FUNCTIONS
+            self.skip_statement()
+            return ('function',)
+        self.accept_kw('MATERIALIZED')
+        self.expect_kw('VIEW')
+        name = self.name()
+        self.expect_kw('AS')
+        return ('view', name, self.query())
+
+    def skip_statement(self):
+        while not self.is_op(';') and self.peek()[0] != 'eof':
+            self.pos += 1
+
+    def column_defs(self):
+        columns = []
+        self.expect_op('(')
+        while True:
+            name = self.name()
+            words = []
+            while not self.is_op(',', ')'):
+                words.append(str(self.peek()[1]).upper())
+                self.pos += 1
+            if words[-2:] == ['NOT', 'NULL']:
+                words = words[:-2]
+            columns.append((name, ' '.join(words)))
+            if self.accept_op(')'):
+                return columns
+            self.expect_op(',')
+
+    def query(self):
+        selects = [self.select()]
+        while self.accept_kw('UNION'):
+            selects.append(self.select())
+        return selects
+
+    def select(self):
+        self.expect_kw('SELECT')
+        distinct = self.accept_kw('DISTINCT')
+        items = [self.select_item(0)]
+        while self.accept_op(','):
+            items.append(self.select_item(len(items)))
+        from_items = []
+        if self.accept_kw('FROM'):
+            from_items.append(('join', self.from_item(), None))
+            while True:
+                if self.accept_kw('JOIN'):
+                    item = self.from_item()
+                    self.expect_kw('ON')
+                    from_items.append(('join', item, self.expr()))
+                elif self.accept_kw('CROSS'):
+                    self.expect_kw('JOIN')
+                    if self.accept_kw('UNNEST'):
+                        from_items.append(self.unnest_item())
+                    else:
+                        from_items.append(('join', self.from_item(), None))
+                else:
+                    break
+        where = self.expr() if self.accept_kw('WHERE') else None
+        group_by = []
+        if self.accept_kw('GROUP'):
+            self.expect_kw('BY')
+            group_by = self.expr_list()
+        having = self.expr() if self.accept_kw('HAVING') else None
+        return {
+            'distinct': distinct, 'items': items, 'from': from_items,
+            'where': where, 'group_by': group_by, 'having': having}
+
+    def select_item(self, index):
+        if self.accept_op('*'):
+            return (('lit', 1), '*')
+        expr = self.expr()
+        if self.accept_kw('AS') or self.is_alias():
+            return (expr, self.name())
+        match expr:
+            case ('col', _, name):
+                return (expr, name)
+            case _:
+                return (expr, f'EXPR${index}')
+
+    def from_item(self):
+        if self.accept_op('('):
+            if self.accept_kw('VALUES'):
+                rows = []
+                while True:
+                    self.expect_op('(')
+                    rows.append(self.expr_list())
+                    self.expect_op(')')
+                    if not self.accept_op(','):
+                        break
+                self.expect_op(')')
+                self.accept_kw('AS')
+                alias = self.name()
+                return ('values', rows, alias, self.column_names())
+            query = self.query()
+            self.expect_op(')')
+            self.accept_kw('AS')
+            return ('subquery', query, self.name())
+        name = self.name()
+        alias = name
+        if self.accept_kw('AS') or self.is_alias():
+            alias = self.name()
+        return ('table', name, alias)
+
+    def unnest_item(self):
+        self.expect_op('(')
+        expr = self.expr()
+        self.expect_op(')')
+        ordinality = False
+        if self.accept_kw('WITH'):
+            self.expect_kw('ORDINALITY')
+            ordinality = True
+        self.accept_kw('AS')
+        alias = self.name()
+        return ('unnest', expr, alias, self.column_names(), ordinality)
+
+    def column_names(self):
+        self.expect_op('(')
+        names = [self.name()]
+        while self.accept_op(','):
+            names.append(self.name())
+        self.expect_op(')')
+        return names
+
+    def expr_list(self):
+        exprs = [self.expr()]
+        while self.accept_op(','):
+            exprs.append(self.expr())
+        return exprs
+
+    def expr(self):
+        left = self.and_expr()
+        while self.accept_kw('OR'):
+            left = ('fn', 'OR', [left, self.and_expr()], None)
+        return left
+
+    def and_expr(self):
+        left = self.not_expr()
+        while self.accept_kw('AND'):
+            left = ('fn', 'AND', [left, self.not_expr()], None)
+        return left
+
+    def not_expr(self):
+        if self.accept_kw('NOT'):
+            return ('fn', 'NOT', [self.not_expr()], None)
+        return self.predicate()
+
+    def predicate(self):
+        left = self.additive()
+        if self.is_op('=', '!=', '<>', '<', '>', '<=', '>='):
+            op = self.peek()[1]
+            self.pos += 1
+            return ('fn', '!=' if op == '<>' else op, [left, self.additive()], None)
+        if self.accept_kw('IS'):
+            negated = self.accept_kw('NOT')
+            self.expect_kw('NULL')
+            return ('fn', 'IS NOT NULL' if negated else 'IS NULL', [left], None)
+        negated = self.accept_kw('NOT')
+        if self.accept_kw('RLIKE'):
+            expr = ('fn', 'RLIKE', [left, self.additive()], None)
+            return ('fn', 'NOT', [expr], None) if negated else expr
+        if self.accept_kw('IN'):
+            self.expect_op('(')
+            values = self.expr_list()
+            self.expect_op(')')
+            return ('fn', 'NOT IN' if negated else 'IN', [left, *values], None)
+        if negated:
+            raise self.error("expected RLIKE or IN after NOT")
+        return left
+
+    def additive(self):
+        left = self.unary()
+        while self.is_op('+', '-', '||'):
+            op = self.peek()[1]
+            self.pos += 1
+            left = ('fn', op, [left, self.unary()], None)
+        return left
+
+    def unary(self):
+        if self.accept_op('-'):
+            return ('fn', 'NEG', [self.unary()], None)
+        expr = self.primary()
+        while self.accept_op('['):
+            expr = ('fn', 'SUBSCRIPT', [expr, self.expr()], None)
+            self.expect_op(']')
+        return expr
+
+    def primary(self):
+        (kind, value) = self.peek()
+        match kind:
+            case 'str' | 'num':
+                self.pos += 1
+                return ('lit', value)
+            case 'name':
+                return self.column()
+            case 'op' if value == '(':
+                if self.is_kw('SELECT', offset=1):
+                    raise self.error("scalar subqueries are not supported")
+                if self.peek(1)[0] == 'ident' and self.is_op(')', offset=2) and self.is_op('->', offset=3):
+                    self.pos += 1
+                    param = self.name()
+                    self.pos += 2
+                    return ('lambda', param, self.expr())
+                self.pos += 1
+                expr = self.expr()
+                self.expect_op(')')
+                return expr
+            case 'ident':
+                pass
+            case _:
+                raise self.error("expected expression")
+
+        word = value.upper()
+        if word in ('NULL', 'TRUE', 'FALSE'):
+            self.pos += 1
+            return ('lit', {'NULL': None, 'TRUE': True, 'FALSE': False}[word])
+        if self.is_op('->', offset=1):
+            self.pos += 2
+            return ('lambda', value, self.expr())
+        if word == 'EXISTS':
+            self.pos += 1
+            self.expect_op('(')
+            query = self.query()
+            self.expect_op(')')
+            return ('exists', query)
+        if word == 'CAST':
+            self.pos += 1
+            self.expect_op('(')
+            expr = self.expr()
+            self.expect_kw('AS')
+            words = []
+            while not self.is_op(')'):
+                if self.accept_op('('):
+                    # precision of DECIMAL(p, s) and VARCHAR(n) is ignored
+                    while not self.accept_op(')'):
+                        self.pos += 1
+                    continue
+                words.append(self.name().upper())
+            self.pos += 1
+            return ('fn', 'CAST', [expr], ' '.join(words))
+        if word in ('ARRAY', 'MAP') and self.is_op('[', offset=1):
+            self.pos += 2
+            elements = [] if self.is_op(']') else self.expr_list()
+            self.expect_op(']')
+            return ('fn', word, elements, None)
+        if self.is_op('(', offset=1):
+            return self.call(word)
+        return self.column()
+
+    def column(self):
+        name = self.name()
+        if self.accept_op('.'):
+            return ('col', name, self.name())
+        return ('col', None, name)
+
+    def call(self, fn_name):
+        self.pos += 2
+        if fn_name == 'SUBSTRING':
+            args = [self.expr()]
+            self.expect_kw('FROM')
+            args.append(self.expr())
+            if self.accept_kw('FOR'):
+                args.append(self.expr())
+            self.expect_op(')')
+            return ('fn', fn_name, args, None)
+        distinct = self.accept_kw('DISTINCT')
+        args = []
+        if fn_name == 'COUNT' and self.accept_op('*'):
+            pass
+        elif not self.is_op(')'):
+            args = self.expr_list()
+        order_by = []
+        if self.accept_kw('ORDER'):
+            self.expect_kw('BY')
+            while True:
+                expr = self.expr()
+                desc = self.accept_kw('DESC')
+                if not desc:
+                    self.accept_kw('ASC')
+                order_by.append((expr, desc))
+                if not self.accept_op(','):
+                    break
+        self.expect_op(')')
+        if fn_name in AGGREGATE_FUNCTIONS:
+            return ('agg', fn_name, args, (distinct, order_by))
+        if distinct or order_by:
+            raise self.error(f"DISTINCT and ORDER BY are not supported in {fn_name}")
+        return ('fn', fn_name, args, None)
+
+
+
+@functools.cache
+def parse_program(sql):
+    program = {'tables': {}, 'declared': {}, 'views': {}, 'order': []}
+    for stmt in SqlParser(sql).statements():
+        match stmt:
+            case ('table', name, columns):
+                program['tables'][name] = [c for (c, _) in columns]
+            case ('declare', name, columns):
+                program['declared'][name] = columns
+            case ('view', name, query):
+                program['views'][name] = query
+                program['order'].append(name)
+            case ('function',):
+                pass
+    return program
+
+def transpiler_program():
+    return parse_program(read_transpiler_sql())
+
+
+
+# Values: TEXT is str, integers are int, BOOLEAN is bool, arrays are tuples, NULL is None.
+# VARIANT holds the same values, and VariantMap for JSON objects and MAPs.
+
+class VariantMap(tuple):
+    # (key, value) pairs sorted by key, hashable unlike dict
+    @staticmethod
+    def from_pairs(pairs):
+        return VariantMap(sorted(dict(pairs).items()))
+
+    def get(self, key):
+        for (k, v) in self:
+            if k == key:
+                return v
+        return None
+
+def value_from_json(value):
+    match value:
+        case dict():
+            return VariantMap.from_pairs((k, value_from_json(v)) for (k, v) in value.items())
+        case list():
+            return tuple(map(value_from_json, value))
+        case _:
+            return value
+
+def value_to_json(value):
+    match value:
+        case VariantMap():
+            return dict((k, value_to_json(v)) for (k, v) in value)
+        case tuple():
+            return [value_to_json(v) for v in value]
+        case _:
+            return value
+
+def sort_key(value):
+    # NULLs are the largest, like NULLS LAST in ascending order
+    match value:
+        case None:
+            return (5,)
+        case bool():
+            return (0, value)
+        case int() | float():
+            return (1, value)
+        case str():
+            return (2, value)
+        case VariantMap():
+            return (4, tuple((k, sort_key(v)) for (k, v) in value))
+        case tuple():
+            return (3, tuple(map(sort_key, value)))
+        case _:
+            raise Exception(f"Unexpected value: {value!r}")
+
+def to_text(value):
+    match value:
+        case None | str():
+            return value
+        case bool():
+            return 'TRUE' if value else 'FALSE'
+        case int() | float():
+            return str(value)
+        case _:
+            raise Exception(f"Can't cast to TEXT: {value!r}")
+
+def to_number(value, number_type):
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    return number_type(value)
+
+def cast(value, type_name):
+    # values of VARIANT of another type are cast to NULL
+    if value is None:
+        return None
+    match type_name:
+        case 'VARIANT':
+            return value
+        case _ if type_name.endswith(' ARRAY'):
+            if not isinstance(value, tuple) or isinstance(value, VariantMap):
+                return None
+            element_type = type_name[:-len(' ARRAY')]
+            return tuple(cast(x, element_type) for x in value)
+        case _ if isinstance(value, tuple):
+            return None
+        case 'TEXT' | 'VARCHAR' | 'STRING' | 'CHAR':
+            return to_text(value)
+        case 'INTEGER' | 'INT' | 'BIGINT' | 'SMALLINT' | 'TINYINT' | 'INTEGER UNSIGNED' | 'BIGINT UNSIGNED':
+            return to_number(value, int)
+        case 'DECIMAL' | 'NUMERIC':
+            # integral decimals stay integers, like in JSON
+            number = to_number(value, float)
+            return int(number) if number is not None and number.is_integer() else number
+        case 'DOUBLE' | 'FLOAT' | 'REAL':
+            return to_number(value, float)
+        case 'BOOLEAN':
+            return value if isinstance(value, bool) else str(value).upper() == 'TRUE'
+        case 'TIMESTAMP' | 'DATE' | 'TIME':
+            return to_text(value)
+        case _:
+            raise Exception(f"Unsupported CAST to {type_name}")
+
+def strict(fn):
+    # most functions return NULL if any argument is NULL
+    def strict_fn(*args):
+        if any(a is None for a in args):
+            return None
+        return fn(*args)
+    return strict_fn
+
+def array_drop_sides(array, drop_on_left, drop_on_right):
+    left = min(drop_on_left, len(array))
+    right = len(array) - min(drop_on_right, len(array))
+    return array[left:right] if left < right else ()
+
+def subscript(value, index):
+    # arrays are indexed from 1, out of bounds and missing keys are NULL
+    match (value, index):
+        case (VariantMap(), str()):
+            return value.get(index)
+        case (VariantMap(), _) | (_, str()):
+            return None
+        case (tuple(), int()):
+            return value[index - 1] if 1 <= index <= len(value) else None
+        case _:
+            return None
+
+def variant_map(*keys_and_values):
+    return VariantMap.from_pairs(zip(keys_and_values[0::2], keys_and_values[1::2]))
+
+def substring(text, start, length=None):
+    start = max(start - 1, 0)
+    return text[start:] if length is None else text[start:start + max(length, 0)]
+
+SCALAR_FUNCTIONS = {
+    '||': strict(lambda a, b: to_text(a) + to_text(b)),
+    '+': strict(lambda a, b: a + b),
+    '-': strict(lambda a, b: a - b),
+    'NEG': strict(lambda a: -a),
+    '=': strict(lambda a, b: a == b),
+    '!=': strict(lambda a, b: a != b),
+    '<': strict(lambda a, b: a < b),
+    '>': strict(lambda a, b: a > b),
+    '<=': strict(lambda a, b: a <= b),
+    '>=': strict(lambda a, b: a >= b),
+    'RLIKE': strict(lambda s, pattern: re.search(pattern, s) is not None),
+    'IS NULL': lambda a: a is None,
+    'IS NOT NULL': lambda a: a is not None,
+    'ARRAY': lambda *elements: elements,
+    'ARRAY_CONCAT': strict(lambda *arrays: tuple(x for a in arrays for x in a)),
+    'ARRAY_TO_STRING': strict(lambda a, sep: sep.join(to_text(x) for x in a if x is not None)),
+    'ARRAY_SIZE': strict(len),
+    'ARRAY_LENGTH': strict(len),
+    'CARDINALITY': strict(len),
+    'SORT_ARRAY': strict(lambda a: tuple(sorted(a, key=sort_key))),
+    'CHAR_LENGTH': strict(len),
+    'SUBSTRING': strict(substring),
+    'SUBSCRIPT': strict(subscript),
+    'MAP': variant_map,
+    'MD5': strict(lambda s: hashlib.md5(s.encode('utf-8')).hexdigest()),
+    'GRASP_TEXT_ARRAY_DROP_SIDES': strict(array_drop_sides),
+    'GRASP_VARIANT_ARRAY_DROP_SIDES': strict(array_drop_sides),
+}
+
+def in_list(value, *values):
+    if value is None:
+        return None
+    if value in values:
+        return True
+    return None if None in values else False
+
+def sql_and(a, b):
+    if a is False or b is False:
+        return False
+    return None if a is None or b is None else True
+
+def sql_or(a, b):
+    if a is True or b is True:
+        return True
+    return None if a is None or b is None else False
+
+def sql_not(a):
+    return None if a is None else not a
+
+def aggregate(fn_name, values, distinct):
+    # values are tuples of arguments, one per row of the group
+    if distinct:
+        values = list(dict.fromkeys(values))
+    match fn_name:
+        case 'COUNT':
+            return sum(1 for v in values if None not in v)
+        case 'SUM':
+            xs = [v[0] for v in values if v[0] is not None]
+            return sum(xs) if xs else None
+        case 'MIN' | 'MAX':
+            xs = [v[0] for v in values if v[0] is not None]
+            if not xs:
+                return None
+            return (min if fn_name == 'MIN' else max)(xs, key=sort_key)
+        case 'ARG_MIN' | 'ARG_MAX':
+            xs = [(k, x) for (x, k) in values if k is not None]
+            if not xs:
+                return None
+            best = (min if fn_name == 'ARG_MIN' else max)(sort_key(k) for (k, _) in xs)
+            # ties are broken by the smallest value
+            return min((x for (k, x) in xs if sort_key(k) == best), key=sort_key)
+        case 'SOME' | 'EVERY':
+            xs = [v[0] for v in values if v[0] is not None]
+            if not xs:
+                return None
+            return any(xs) if fn_name == 'SOME' else all(xs)
+        case _:
+            raise Exception(f"Unsupported aggregate {fn_name}")
+
+def array_agg(rows, order_by):
+    # rows are (value, order keys). Without ORDER BY elements are sorted by value,
+    # ties in ORDER BY are broken by value as well, so the result is deterministic
+    rows = sorted(rows, key=lambda r: sort_key(r[0]))
+    for i in reversed(range(len(order_by))):
+        rows.sort(key=lambda r: sort_key(r[1][i]), reverse=order_by[i])
+    return tuple(r[0] for r in rows)
+
+
+
+# Scope resolves column names: list of (alias, {column: index}), innermost first,
+# and names of lambda params. Row environment maps alias to a row tuple.
+
+def scope_with(scope, aliases):
+    (outer, lambdas) = scope
+    return (aliases + outer, lambdas)
+
+def resolve_column(scope, alias, name):
+    (aliases, lambdas) = scope
+    if alias is None and name in lambdas:
+        return None
+    for (a, columns) in aliases:
+        if (alias is None or a == alias) and name in columns:
+            return (a, columns[name])
+    raise Exception(f"Unknown column {name if alias is None else alias + '.' + name}")
+
+def subexprs(expr):
+    match expr:
+        case ('fn', _, args, _):
+            return args
+        case ('agg', _, args, (_, order_by)):
+            return args + [e for (e, _) in order_by]
+        case _:
+            return []
+
+def expr_aliases(expr, scope):
+    # None stands for aliases of a correlated subquery, they are not tracked
+    match expr:
+        case ('col', alias, name):
+            resolved = resolve_column(scope, alias, name)
+            return set() if resolved is None else {resolved[0]}
+        case ('lambda', param, body):
+            return expr_aliases(body, (scope[0], scope[1] | {param}))
+        case ('exists', _):
+            return {None}
+        case _:
+            return set().union(*[expr_aliases(e, scope) for e in subexprs(expr)])
+
+def has_aggregate(expr):
+    match expr:
+        case ('agg', *_):
+            return True
+        case ('lambda', _, body):
+            return has_aggregate(body)
+        case _:
+            return any(has_aggregate(e) for e in subexprs(expr))
+
+def conjuncts(expr):
+    match expr:
+        case None:
+            return []
+        case ('fn', 'AND', [left, right], _):
+            return conjuncts(left) + conjuncts(right)
+        case _:
+            return [expr]
+
+def compile_expr(expr, scope, db, group=False):
+    # compiles into a function of a row environment,
+    # or of a list of environments of the group, if it is an aggregated expression
+    match expr:
+        case ('lit', value):
+            return lambda env: value
+        case ('col', alias, name):
+            resolved = resolve_column(scope, alias, name)
+            if resolved is None:
+                key = '->' + name
+                f = lambda env: env[key]
+            else:
+                (a, i) = resolved
+                f = lambda env: env[a][i]
+            return (lambda envs: f(envs[0]) if envs else None) if group else f
+        case ('exists', query):
+            f = compile_exists(query, scope, db)
+            return (lambda envs: f(envs[0]) if envs else False) if group else f
+        case ('lambda', param, body):
+            # called with a lambda argument, from TRANSFORM
+            key = '->' + param
+            f = compile_expr(body, (scope[0], scope[1] | {param}), db)
+            if group:
+                return lambda envs: lambda x: f({**(envs[0] if envs else {}), key: x})
+            return lambda env: lambda x: f({**env, key: x})
+        case ('agg', fn_name, args, (distinct, order_by)):
+            if not group:
+                raise Exception(f"Aggregate {fn_name} outside of GROUP BY")
+            arg_fs = [compile_expr(a, scope, db) for a in args]
+            order_fs = [compile_expr(e, scope, db) for (e, _) in order_by]
+            if fn_name == 'ARRAY_AGG':
+                [value_f] = arg_fs
+                descs = [desc for (_, desc) in order_by]
+                def array_agg_f(envs):
+                    rows = [(value_f(env), [f(env) for f in order_fs]) for env in envs]
+                    if distinct:
+                        rows = list({r[0]: r for r in rows}.values())
+                    return array_agg(rows, descs)
+                return array_agg_f
+            if fn_name == 'COUNT' and not args:
+                return len
+            return lambda envs: aggregate(fn_name, [tuple(f(env) for f in arg_fs) for env in envs], distinct)
+        case ('fn', fn_name, args, extra):
+            fs = [compile_expr(a, scope, db, group) for a in args]
+            match (fn_name, fs):
+                case ('AND', [f1, f2]):
+                    return lambda env: sql_and(f1(env), f2(env))
+                case ('OR', [f1, f2]):
+                    return lambda env: sql_or(f1(env), f2(env))
+                case ('NOT', [f1]):
+                    return lambda env: sql_not(f1(env))
+                case ('IN', [f1, *value_fs]):
+                    return lambda env: in_list(f1(env), *[f(env) for f in value_fs])
+                case ('NOT IN', [f1, *value_fs]):
+                    return lambda env: sql_not(in_list(f1(env), *[f(env) for f in value_fs]))
+                case ('CAST', [f1]):
+                    return lambda env: cast(f1(env), extra)
+                case ('TRANSFORM', [array_f, lambda_f]):
+                    def transform_f(env):
+                        array = array_f(env)
+                        return None if array is None else tuple(map(lambda_f(env), array))
+                    return transform_f
+                case (_, [f1]):
+                    fn = scalar_function(fn_name)
+                    return lambda env: fn(f1(env))
+                case (_, [f1, f2]):
+                    fn = scalar_function(fn_name)
+                    return lambda env: fn(f1(env), f2(env))
+                case _:
+                    fn = scalar_function(fn_name)
+                    return lambda env: fn(*[f(env) for f in fs])
+        case _:
+            raise Exception(f"Unexpected expression {expr}")
+
+def scalar_function(fn_name):
+    if fn_name not in SCALAR_FUNCTIONS:
+        raise Exception(f"Unsupported function {fn_name}")
+    return SCALAR_FUNCTIONS[fn_name]
+
+def is_true(f):
+    return lambda env: f(env) is True
+
+
+
+def relation_of(item, db):
+    # FROM item as (alias, columns, rows)
+    match item:
+        case ('table', name, alias):
+            if name not in db:
+                raise Exception(f"Unknown table or view {name}")
+            (columns, rows) = db[name]
+            return (alias, columns, rows)
+        case ('values', value_rows, alias, columns):
+            rows = [tuple(compile_expr(e, ([], frozenset()), db)({}) for e in r) for r in value_rows]
+            return (alias, columns, rows)
+        case ('subquery', query, alias):
+            (columns, rows) = eval_query(query, db)
+            return (alias, columns, rows)
+
+def from_aliases(from_items, db):
+    # aliases of all FROM items, and rows of relations joined by them
+    aliases = []
+    relations = []
+    for item in from_items:
+        match item:
+            case ('join', item, _):
+                (alias, columns, rows) = relation_of(item, db)
+                relations.append(rows)
+            case ('unnest', _, alias, columns, _):
+                relations.append(None)
+        aliases.append((alias, dict((c, i) for (i, c) in enumerate(columns))))
+    return (aliases, relations)
+
+def split_join_key(cond, alias, available, scope):
+    # `available_expr = alias_expr` conditions of the join turn into hash join keys
+    match cond:
+        case ('fn', '=', [left, right], _):
+            left_aliases = expr_aliases(left, scope)
+            right_aliases = expr_aliases(right, scope)
+            if right_aliases == {alias} and left_aliases and left_aliases <= available:
+                return (left, right)
+            if left_aliases == {alias} and right_aliases and right_aliases <= available:
+                return (right, left)
+    return None
+
+def join_envs(from_items, conds, scope, db, base_env):
+    # inner joins of FROM items, ON and WHERE conditions are applied as soon as possible
+    (aliases, relations) = from_aliases(from_items, db)
+    scope = scope_with(scope, aliases)
+    available = set(base_env)
+    pending = [(c, expr_aliases(c, scope)) for c in conds]
+    envs = [base_env]
+    for (item, (alias, _), rows) in zip(from_items, aliases, relations):
+        ready = [c for (c, a) in pending if None not in a and a <= available | {alias}]
+        pending = [(c, a) for (c, a) in pending if None in a or not a <= available | {alias}]
+        match item:
+            case ('unnest', array_expr, _, _, ordinality):
+                array_f = compile_expr(array_expr, scope, db)
+                new_envs = []
+                for env in envs:
+                    array = array_f(env)
+                    for (i, x) in enumerate(array or (), 1):
+                        new_envs.append({**env, alias: (x, i) if ordinality else (x,)})
+                envs = new_envs
+            case _:
+                keys = []
+                rest = []
+                for c in ready:
+                    key = split_join_key(c, alias, available, scope)
+                    if key:
+                        keys.append(key)
+                    elif expr_aliases(c, scope) <= {alias}:
+                        # filter the joined relation before hashing
+                        f = is_true(compile_expr(c, scope, db))
+                        rows = [r for r in rows if f({alias: r})]
+                    else:
+                        rest.append(c)
+                ready = rest
+                if keys:
+                    left_fs = [compile_expr(left, scope, db) for (left, _) in keys]
+                    right_fs = [compile_expr(right, scope, db) for (_, right) in keys]
+                    index = collections.defaultdict(list)
+                    for r in rows:
+                        key = tuple(f({alias: r}) for f in right_fs)
+                        if None not in key:
+                            index[key].append(r)
+                    new_envs = []
+                    for env in envs:
+                        key = tuple(f(env) for f in left_fs)
+                        for r in index.get(key, ()):
+                            new_envs.append({**env, alias: r})
+                    envs = new_envs
+                else:
+                    envs = [{**env, alias: r} for env in envs for r in rows]
+        for c in ready:
+            f = is_true(compile_expr(c, scope, db))
+            envs = [env for env in envs if f(env)]
+        available.add(alias)
+    for (c, _) in pending:
+        f = is_true(compile_expr(c, scope, db))
+        envs = [env for env in envs if f(env)]
+    return envs
+
+def select_conds(select):
+    conds = conjuncts(select['where'])
+    for item in select['from']:
+        match item:
+            case ('join', _, on):
+                conds = conjuncts(on) + conds
+    return conds
+
+def compile_exists(query, scope, db):
+    match query:
+        case [{'group_by': [], 'having': None, 'items': items} as select] if not any(has_aggregate(e) for (e, _) in items):
+            pass
+        case _:
+            # not correlated with equality, evaluated for every row
+            return lambda env: bool(eval_query(query, db, scope, env)[1])
+    # correlated subquery: rows of the subquery are computed once,
+    # and indexed by columns compared with the outer row
+    (aliases, _) = from_aliases(select['from'], db)
+    inner = set(a for (a, _) in aliases)
+    inner_scope = scope_with(scope, aliases)
+    inner_conds = []
+    keys = []
+    rest = []
+    for c in select_conds(select):
+        c_aliases = expr_aliases(c, inner_scope)
+        if None not in c_aliases and c_aliases <= inner:
+            inner_conds.append(c)
+            continue
+        match c:
+            case ('fn', '=', [left, right], _):
+                left_aliases = expr_aliases(left, inner_scope)
+                right_aliases = expr_aliases(right, inner_scope)
+                if None not in right_aliases and left_aliases and left_aliases <= inner and not right_aliases & inner:
+                    keys.append((right, left))
+                    continue
+                if None not in left_aliases and right_aliases and right_aliases <= inner and not left_aliases & inner:
+                    keys.append((left, right))
+                    continue
+        rest.append(c)
+    outer_fs = [compile_expr(outer, scope, db) for (outer, _) in keys]
+    inner_fs = [compile_expr(inner, inner_scope, db) for (_, inner) in keys]
+    rest_fs = [is_true(compile_expr(c, inner_scope, db)) for c in rest]
+    index = None
+    def exists(env):
+        nonlocal index
+        if index is None:
+            index = collections.defaultdict(list)
+            for inner_env in join_envs(select['from'], inner_conds, scope, db, {}):
+                key = tuple(f(inner_env) for f in inner_fs)
+                if None not in key:
+                    index[key].append(inner_env)
+        key = tuple(f(env) for f in outer_fs)
+        for inner_env in index.get(key, ()):
+            merged = {**env, **inner_env}
+            if all(f(merged) for f in rest_fs):
+                return True
+        return False
+    return exists
+
+def eval_select(select, db, scope, base_env):
+    if select['from']:
+        (aliases, _) = from_aliases(select['from'], db)
+        envs = join_envs(select['from'], select_conds(select), scope, db, base_env)
+        scope = scope_with(scope, aliases)
+    else:
+        f = is_true(compile_expr(select['where'] or ('lit', True), scope, db))
+        envs = [base_env] if f(base_env) else []
+    items = select['items']
+    if select['group_by'] or select['having'] or any(has_aggregate(e) for (e, _) in items):
+        key_fs = [compile_expr(e, scope, db) for e in select['group_by']]
+        groups = collections.defaultdict(list)
+        for env in envs:
+            groups[tuple(f(env) for f in key_fs)].append(env)
+        if not key_fs and not groups:
+            # aggregation without GROUP BY returns one row even for no rows
+            groups[()] = []
+        item_fs = [compile_expr(e, scope, db, group=True) for (e, _) in items]
+        having_f = is_true(compile_expr(select['having'] or ('lit', True), scope, db, group=True))
+        rows = [tuple(f(g) for f in item_fs) for g in groups.values() if having_f(g)]
+    else:
+        item_fs = [compile_expr(e, scope, db) for (e, _) in items]
+        rows = [tuple(f(env) for f in item_fs) for env in envs]
+    if select['distinct']:
+        rows = list(dict.fromkeys(rows))
+    return ([name for (_, name) in items], rows)
+
+def eval_query(query, db, scope=([], frozenset()), base_env={}):
+    results = [eval_select(select, db, scope, base_env) for select in query]
+    (columns, rows) = results[0]
+    if len(results) == 1:
+        return (columns, rows)
+    rows = [r for (_, rows) in results for r in rows]
+    # branches may differ in types, like integer and text literals,
+    # then the column is TEXT
+    for i in range(len(columns)):
+        if any(isinstance(r[i], str) for r in rows) and any(isinstance(r[i], int) for r in rows):
+            rows = [r[:i] + (to_text(r[i]),) + r[i+1:] for r in rows]
+    return (columns, list(dict.fromkeys(rows)))
+
+def eval_view(program, name, db):
+    (columns, rows) = eval_query(program['views'][name], db)
+    if name in program['declared']:
+        declared = program['declared'][name]
+        columns = [c for (c, _) in declared]
+        rows = [tuple(cast(v, t) for (v, (_, t)) in zip(r, declared)) for r in rows]
+    return (columns, rows)
+
+
+
+def query_dependencies(query):
+    deps = set()
+    def walk_expr(expr):
+        match expr:
+            case ('exists', q):
+                deps.update(query_dependencies(q))
+            case ('lambda', _, body):
+                walk_expr(body)
+            case _:
+                for e in subexprs(expr):
+                    walk_expr(e)
+    for select in query:
+        for item in select['from']:
+            match item:
+                case ('join', ('table', name, _), on):
+                    deps.add(name)
+                    walk_expr(on)
+                case ('join', ('subquery', q, _), on):
+                    deps.update(query_dependencies(q))
+                    walk_expr(on)
+                case ('join', _, on):
+                    walk_expr(on)
+                case ('unnest', expr, *_):
+                    walk_expr(expr)
+        for (e, _) in select['items']:
+            walk_expr(e)
+        for e in [select['where'], select['having'], *select['group_by']]:
+            if e is not None:
+                walk_expr(e)
+    return deps
+
+def view_components(program, targets):
+    # strongly connected components of views needed for targets, dependencies first
+    deps = dict((name, query_dependencies(q) & program['views'].keys()) for (name, q) in program['views'].items())
+    index = {}
+    lowlink = {}
+    stack = []
+    components = []
+    def strongconnect(v):
+        index[v] = lowlink[v] = len(index)
+        stack.append(v)
+        for w in deps[v]:
+            if w not in index:
+                strongconnect(w)
+                lowlink[v] = min(lowlink[v], lowlink[w])
+            elif w in stack:
+                lowlink[v] = min(lowlink[v], index[w])
+        if lowlink[v] == index[v]:
+            component = []
+            while True:
+                w = stack.pop()
+                component.append(w)
+                if w == v:
+                    break
+            recursive = len(component) > 1 or v in deps[v]
+            components.append((sorted(component, key=program['order'].index), recursive))
+    for t in targets:
+        if t not in index:
+            strongconnect(t)
+    return components
+
+def evaluate_views(program, records, targets, iterations=None):
+    # iterations, if given, gets the number of passes over every recursive component
+    db = {}
+    for (table_name, columns) in program['tables'].items():
+        db[table_name] = (columns, [])
+    for (table_name, rows) in records.items():
+        if table_name not in program['tables']:
+            raise Exception(f"Unknown table {table_name}")
+        columns = program['tables'][table_name]
+        db[table_name] = (columns, [tuple(map(value_from_json, map(r.get, columns))) for r in rows])
+    for (component, recursive) in view_components(program, targets):
+        if not recursive:
+            db[component[0]] = eval_view(program, component[0], db)
+            continue
+        # recursive views start empty and are re-evaluated till nothing changes
+        for name in component:
+            columns = [c for (c, _) in program['declared'].get(name, [])]
+            db[name] = (columns, [])
+        for i in range(MAX_FIXPOINT_ITERATIONS):
+            changed = False
+            for name in component:
+                (columns, rows) = eval_view(program, name, db)
+                if collections.Counter(rows) != collections.Counter(db[name][1]):
+                    changed = True
+                db[name] = (columns, rows)
+            if not changed:
+                break
+        else:
+            raise Exception(f"Recursive views did not converge: {', '.join(component)}")
+        if iterations is not None:
+            iterations[tuple(component)] = i + 1
+    return db
+
+def view_rows(db, name):
+    (columns, rows) = db[name]
+    return [dict(zip(columns, r)) for r in rows]
+
+def run_sql(sql, records, view_names=None):
+    # runs SQL of a transpiled program over rows of its tables,
+    # rows are dicts of JSON values, like lines of *.input.jsonl
+    program = parse_program(sql)
+    for name in (view_names or []):
+        if name not in program['views']:
+            raise Exception(f"Unknown view {name}")
+    with trace.span('local_run', rows=sum(map(len, records.values()))):
+        db = evaluate_views(program, records, view_names or program['order'])
+    return dict(
+        (name, [dict((k, value_to_json(v)) for (k, v) in r.items()) for r in view_rows(db, name)])
+        for name in (view_names or program['order']))
+
+def transpile(records, pipeline_id):
+    program = transpiler_program()
+    with trace.span('local_transpile', records=sum(map(len, records.values()))):
+        db = evaluate_views(program, records, ['full_pipeline_sql'])
+    rows = [r for r in view_rows(db, 'full_pipeline_sql') if r['pipeline_id'] == pipeline_id]
+    match rows:
+        case [{'sql_lines': sql_lines}]:
+            return list(sql_lines)
+        case _:
+            raise Exception(f"Unexpected result {rows}")
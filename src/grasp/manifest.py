@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import hashlib
+import collections
+
+from grasp.parser import parser_cache_dir
+
+
+
+# Manifest remembers records sent to the transpiler pipeline for a program,
+# so the next run sends only the difference.
+
+def program_key(input_paths):
+    paths = sorted(os.path.abspath(p) for p in input_paths)
+    return hashlib.sha256('\n'.join(paths).encode('utf-8')).hexdigest()[:16]
+
+def manifest_path(key):
+    return f'{parser_cache_dir()}/manifests/{key}.json'
+
+def read_manifest(key):
+    path = manifest_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ignoring broken manifest {path}: {e}", file=sys.stderr)
+        return None
+
+def write_manifest(key, pipeline_id, records):
+    path = manifest_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write into temporary file first, so the manifest is never partially written
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'pipeline_id': pipeline_id, 'records': records}, f)
+    os.replace(tmp_path, path)
+
+def manifests_pipeline_ids():
+    # records of these pipeline_ids are kept in the transpiler for the next run
+    dirpath = os.path.dirname(manifest_path(''))
+    if not os.path.exists(dirpath):
+        return set()
+    result = set()
+    for filename in os.listdir(dirpath):
+        if filename.endswith('.json'):
+            prev = read_manifest(filename[:-5])
+            if prev:
+                result.add(prev['pipeline_id'])
+    return result
+
+# A lease marks records of a running `grasp watch` session, which has no manifest.
+# The session renews it while running, so a lease of a killed session expires.
+LEASE_RENEW_INTERVAL = 60
+LEASE_TIMEOUT = 5 * LEASE_RENEW_INTERVAL
+
+def lease_path(pipeline_id):
+    key = hashlib.sha256(pipeline_id.encode('utf-8')).hexdigest()[:16]
+    return f'{parser_cache_dir()}/leases/{key}.json'
+
+def renew_lease(pipeline_id):
+    path = lease_path(pipeline_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'pipeline_id': pipeline_id}, f)
+    os.replace(tmp_path, path)
+
+def remove_lease(pipeline_id):
+    path = lease_path(pipeline_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+def leased_pipeline_ids(now):
+    dirpath = os.path.dirname(lease_path(''))
+    if not os.path.exists(dirpath):
+        return set()
+    result = set()
+    for filename in os.listdir(dirpath):
+        if not filename.endswith('.json'):
+            continue
+        path = f'{dirpath}/{filename}'
+        try:
+            if now - os.path.getmtime(path) >= LEASE_TIMEOUT:
+                continue
+            with open(path, 'r') as f:
+                result.add(json.load(f)['pipeline_id'])
+        except Exception as e:
+            print(f"Ignoring broken lease {path}: {e}", file=sys.stderr)
+    return result
+
+def remove_manifest(key):
+    path = manifest_path(key)
+    if os.path.exists(path):
+        os.remove(path)
+
+def row_key(row):
+    # some AST columns are arrays, so rows are keyed by their JSON
+    return json.dumps(row, sort_keys=True)
+
+def diff_records(old_records, new_records):
+    # tables are multisets, so rows are counted, not just compared
+    inserts = {}
+    deletes = {}
+    for table_name in set(old_records) | set(new_records):
+        old_counts = collections.Counter(map(row_key, old_records.get(table_name, [])))
+        new_counts = collections.Counter(map(row_key, new_records.get(table_name, [])))
+        table_inserts = [json.loads(k) for k in (new_counts - old_counts).elements()]
+        table_deletes = [json.loads(k) for k in (old_counts - new_counts).elements()]
+        if table_inserts:
+            inserts[table_name] = table_inserts
+        if table_deletes:
+            deletes[table_name] = table_deletes
+    return (inserts, deletes)
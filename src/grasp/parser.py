@@ -1,8 +1,18 @@
 import os
 import re
+import sys
+import pickle
+import hashlib
 import functools
+import concurrent.futures
 
+import lark
 from lark import Lark, Tree, Token
+from lark.lark import PostLex
+from lark.exceptions import UnexpectedInput, UnexpectedToken
+from lark.load_grammar import load_grammar
+
+import grasp.trace as trace
 
 
 
@@ -12,510 +22,443 @@ def natural_num_generator():
         yield n
         n += 1
 
-def merge_records(records1, records2):
-    result = {}
-    # print(f"MERGE RECORDS {records1} {records2}")
-    for key, rows in records1.items():
-        if key in records2:
-            result[key] = [*rows, *records2[key]]
-        else:
-            result[key] = rows
-    for key, rows in records2.items():
-        if key not in result:
-            result[key] = rows
-    return result
-
-
-
-def records_from_val_args(rule_id, fncall_id, val_args, idgen):
-    records = []
+class ContentIds:
+    # Ids of AST nodes derived from the content of the top-level declaration
+    # and the position of the node in it, so an unchanged rule gets
+    # the same ids in every run, no matter what is changed around it.
+    def __init__(self, original_source_path):
+        self.original_source_path = original_source_path
+        self.occurrences = {}
+
+    def idgen(self, toplevel_decl):
+        # repr of the tree has no positions, only structure and token values.
+        # Identical declarations in one file are told apart by occurrence number.
+        content = f'{self.original_source_path}\n{toplevel_decl!r}'
+        content_hash = hashlib.blake2b(content.encode('utf-8'), digest_size=8).digest()
+        occurrence = self.occurrences.get(content_hash, 0)
+        self.occurrences[content_hash] = occurrence + 1
+        if occurrence:
+            content_hash = hashlib.blake2b(
+                content_hash + f':{occurrence}'.encode('utf-8'), digest_size=8).digest()
+        # The rule gets the hash, as a positive BIGINT. Its nodes are numbered
+        # from 1 in the order of appearance, ids of nodes need to be unique
+        # only in their rule, every join on them is also on rule_id.
+        yield int.from_bytes(content_hash, 'big') >> 1
+        yield from natural_num_generator()
+
+def dense_ids():
+    # Ids numbered in the order of appearance over all files of a run,
+    # smaller than content ids. Not stable between runs, unlike content ids.
+    return natural_num_generator()
+
+# Positions are packed into one BIGINT: start line and column, number of
+# lines to the end and end column. A field past its width is clamped,
+# positions only point to the source.
+POSITION_FIELDS_BITS = [24, 13, 13, 13]
+
+def encode_position(start_line, start_column, end_line, end_column):
+    pos = 0
+    for (value, bits) in zip([start_line, start_column, end_line - start_line, end_column], POSITION_FIELDS_BITS):
+        pos = (pos << bits) | min(max(value, 0), (1 << bits) - 1)
+    return pos
+
+def decode_position(pos):
+    fields = []
+    for bits in reversed(POSITION_FIELDS_BITS):
+        fields.append(pos & ((1 << bits) - 1))
+        pos >>= bits
+    (end_column, line_count, start_column, start_line) = fields
+    return (start_line, start_column, start_line + line_count, end_column)
+
+class RecordSink:
+    # Accumulates rows of AST tables. Rows are appended in place,
+    # so building records is linear in the number of AST nodes.
+    def __init__(self):
+        self.records = {}
+
+    def add(self, table_name, row):
+        rows = self.records.get(table_name)
+        if rows is None:
+            rows = self.records[table_name] = []
+        rows.append(row)
+
+    def add_records(self, records):
+        for table_name, rows in records.items():
+            for row in rows:
+                self.add(table_name, row)
+
+
+
+def records_from_val_args(rule_id, fncall_id, val_args, idgen, sink):
     for index, arg_expr in enumerate(val_args):
         match arg_expr:
             case Tree(data=Token(type='RULE', value='expr'), children=[expr]):
-                expr_id = f'ex{next(idgen)}'
-                expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
-                records.append(merge_records(
-                    expr_records,
-                    {
-                        'fn_val_arg': [{
-                            'rule_id': rule_id,
-                            'fncall_id': fncall_id,
-                            'arg_index': index,
-                            'expr_id': expr_id,
-                            'expr_type': expr_type,
-
-                            'start_line': arg_expr.meta.container_line,
-                            'start_column': arg_expr.meta.container_column,
-                            'end_line': arg_expr.meta.container_end_line,
-                            'end_column': arg_expr.meta.container_end_column,
-                        }]
-                    }
-                ))
+                expr_id = next(idgen)
+                expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
+                sink.add('fn_val_arg', {
+                    'rule_id': rule_id,
+                    'fncall_id': fncall_id,
+                    'arg_index': index,
+                    'expr_id': expr_id,
+                    'expr_type': expr_type,
+
+                    'start_line': arg_expr.meta.container_line,
+                    'start_column': arg_expr.meta.container_column,
+                    'end_line': arg_expr.meta.container_end_line,
+                    'end_column': arg_expr.meta.container_end_column,
+                })
             case _:
                 raise Exception(f"Invalid arg expr {arg_expr}")
-    return records
 
-def records_from_kv_args(rule_id, fncall_id, kv_args, idgen):
-    records = []
+def records_from_kv_args(rule_id, fncall_id, kv_args, idgen, sink):
     for arg in kv_args:
         match arg:
             case Tree(data=Token(type='RULE', value='kv_arg'), children=[
                 Token(type='IDENTIFIER', value=key),
                 Tree(data=Token(type='RULE', value='expr'), children=[expr]),
             ]):
-                expr_id = f'ex{next(idgen)}'
-                expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
-                records.append(merge_records(
-                    expr_records,
-                    {
-                        'fn_kv_arg': [{
-                            'rule_id': rule_id,
-                            'fncall_id': fncall_id,
-                            'key': key,
-                            'expr_id': expr_id,
-                            'expr_type': expr_type,
-
-                            'start_line': arg.meta.container_line,
-                            'start_column': arg.meta.container_column,
-                            'end_line': arg.meta.container_end_line,
-                            'end_column': arg.meta.container_end_column,
-                        }]
-                    }
-                ))
+                expr_id = next(idgen)
+                expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
+                sink.add('fn_kv_arg', {
+                    'rule_id': rule_id,
+                    'fncall_id': fncall_id,
+                    'key': key,
+                    'expr_id': expr_id,
+                    'expr_type': expr_type,
+
+                    'start_line': arg.meta.container_line,
+                    'start_column': arg.meta.container_column,
+                    'end_line': arg.meta.container_end_line,
+                    'end_column': arg.meta.container_end_column,
+                })
             case _:
                 raise Exception(f"Invalid arg expr {arg}")
-    return records
 
 
 
-def records_from_fncall_expr(aggr_expr, rule_id, expr_id, fn_name, fn_args, aggregated, idgen):
+def records_from_fncall_expr(aggr_expr, rule_id, expr_id, fn_name, fn_args, aggregated, idgen, sink):
     # print(f"{fn_name} {fn_args}")
-    fncall_id = f'fn{next(idgen)}'
+    fncall_id = next(idgen)
     match fn_args:
         case None:
-            return {
-                'fncall_expr': [{
-                    'rule_id': rule_id,
-                    'expr_id': expr_id,
-                    'fn_name': fn_name,
-                    'fncall_id': fncall_id,
-                    'aggregated': aggregated,
-
-                    'start_line': aggr_expr.meta.container_line,
-                    'start_column': aggr_expr.meta.container_column,
-                    'end_line': aggr_expr.meta.container_end_line,
-                    'end_column': aggr_expr.meta.container_end_column,
-                }]
-            }
+            pass
         case [Tree(data=Token(type='RULE', value='val_args'), children=val_args)]:
-            return functools.reduce(
-                merge_records,[
-                    *records_from_val_args(rule_id, fncall_id, val_args, idgen),
-                    {
-                        'fncall_expr': [{
-                            'rule_id': rule_id,
-                            'expr_id': expr_id,
-                            'fn_name': fn_name,
-                            'fncall_id': fncall_id,
-                            'aggregated': aggregated,
-
-                            'start_line': aggr_expr.meta.container_line,
-                            'start_column': aggr_expr.meta.container_column,
-                            'end_line': aggr_expr.meta.container_end_line,
-                            'end_column': aggr_expr.meta.container_end_column,
-                        }]
-                    }
-                ]
-            )
+            records_from_val_args(rule_id, fncall_id, val_args, idgen, sink)
         case [
             Tree(data=Token(type='RULE', value='val_args'), children=val_args),
             Tree(data=Token(type='RULE', value='kv_args'), children=kv_args),
         ]:
-            return functools.reduce(
-                merge_records,[
-                    *records_from_val_args(rule_id, fncall_id, val_args, idgen),
-                    *records_from_kv_args(rule_id, fncall_id, kv_args, idgen),
-                    {
-                        'fncall_expr': [{
-                            'rule_id': rule_id,
-                            'expr_id': expr_id,
-                            'fn_name': fn_name,
-                            'fncall_id': fncall_id,
-                            'aggregated': aggregated,
-
-                            'start_line': aggr_expr.meta.container_line,
-                            'start_column': aggr_expr.meta.container_column,
-                            'end_line': aggr_expr.meta.container_end_line,
-                            'end_column': aggr_expr.meta.container_end_column,
-                        }]
-                    }
-                ]
-            )
+            records_from_val_args(rule_id, fncall_id, val_args, idgen, sink)
+            records_from_kv_args(rule_id, fncall_id, kv_args, idgen, sink)
         case _:
             raise Exception(f"Invalid fn args {fn_args}")
-    raise Exception("Not implemented")
+    sink.add('fncall_expr', {
+        'rule_id': rule_id,
+        'expr_id': expr_id,
+        'fn_name': fn_name,
+        'fncall_id': fncall_id,
+        'aggregated': aggregated,
+
+        'start_line': aggr_expr.meta.container_line,
+        'start_column': aggr_expr.meta.container_column,
+        'end_line': aggr_expr.meta.container_end_line,
+        'end_column': aggr_expr.meta.container_end_column,
+    })
 
 
 
-def records_from_dict_arg(arg, rule_id, dict_id, idgen):
+def records_from_dict_arg(arg, rule_id, dict_id, idgen, sink):
     match arg:
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='IDENTIFIER', value=key),
         ]):
-            expr_id = f'ex{next(idgen)}'
-            return {
-                'var_expr': [{
-                    'rule_id': rule_id, 'expr_id': expr_id, 'var_name': key,
-                    'maybe_null_prefix': False,
-
-                    'start_line': arg.children[0].line,
-                    'start_column': arg.children[0].column,
-                    'end_line': arg.children[0].end_line,
-                    'end_column': arg.children[0].end_column,
-                }],
-                'dict_entry': [{
-                    'rule_id': rule_id,
-                    'dict_id': dict_id,
-                    'key': key,
-                    'expr_id': expr_id,
-                    'expr_type': 'var_expr',
-
-                    'start_line': arg.meta.container_line,
-                    'start_column': arg.meta.container_column,
-                    'end_line': arg.meta.container_end_line,
-                    'end_column': arg.meta.container_end_column,
-                }]
-            }
+            expr_id = next(idgen)
+            sink.add('var_expr', {
+                'rule_id': rule_id, 'expr_id': expr_id, 'var_name': key,
+                'maybe_null_prefix': False,
+
+                'start_line': arg.children[0].line,
+                'start_column': arg.children[0].column,
+                'end_line': arg.children[0].end_line,
+                'end_column': arg.children[0].end_column,
+            })
+            expr_type = 'var_expr'
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='IDENTIFIER', value=key),
             Tree(data=Token(type='RULE', value='expr'), children=children),
         ]):
-            expr_id = f'ex{next(idgen)}'
+            expr_id = next(idgen)
             match children:
                 case [expr]:
-                    expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
+                    expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
                 case [expr, Token(type='TYPE', value=assigned_type)]:
-                    expr_type, expr_records = records_from_expr(
-                        expr, rule_id, expr_id, idgen, assigned_type=assigned_type)
+                    expr_type = records_from_expr(
+                        expr, rule_id, expr_id, idgen, sink, assigned_type=assigned_type)
                 case [Token(type='MAYBE_NULL_PREFIX', value='?'), expr]:
-                    expr_type, expr_records = records_from_expr(
-                        expr, rule_id, expr_id, idgen,
+                    expr_type = records_from_expr(
+                        expr, rule_id, expr_id, idgen, sink,
                         maybe_null_prefix=True)
                 case [
                     Token(type='MAYBE_NULL_PREFIX', value='?'), expr,
                     Token(type='TYPE', value=assigned_type),
                 ]:
-                    expr_type, expr_records = records_from_expr(
-                        expr, rule_id, expr_id, idgen,
+                    expr_type = records_from_expr(
+                        expr, rule_id, expr_id, idgen, sink,
                         assigned_type=assigned_type, maybe_null_prefix=True)
                 case _:
                     raise Exception(f"Invalid arg expr {arg}")
-            return merge_records(
-                expr_records,
-                {
-                    'dict_entry': [{
-                        'rule_id': rule_id,
-                        'dict_id': dict_id,
-                        'key': key,
-                        'expr_id': expr_id,
-                        'expr_type': expr_type,
-
-                        'start_line': arg.meta.container_line,
-                        'start_column': arg.meta.container_column,
-                        'end_line': arg.meta.container_end_line,
-                        'end_column': arg.meta.container_end_column,
-                    }]
-                }
-            )
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='ESCAPED_STRING', value=str_key),
             Tree(data=Token(type='RULE', value='expr'), children=children),
         ]):
-            expr_id = f'ex{next(idgen)}'
+            expr_id = next(idgen)
             key = str_key[1:-1]
             match children:
                 case [expr]:
-                    expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
+                    expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
                 case [expr, Token(type='TYPE', value=assigned_type)]:
-                    expr_type, expr_records = records_from_expr(
-                        expr, rule_id, expr_id, idgen, assigned_type=assigned_type)
+                    expr_type = records_from_expr(
+                        expr, rule_id, expr_id, idgen, sink, assigned_type=assigned_type)
                 case _:
                     raise Exception(f"Invalid arg expr {arg}")
-            return merge_records(
-                expr_records,
-                {
-                    'dict_entry': [{
-                        'rule_id': rule_id,
-                        'dict_id': dict_id,
-                        'key': key,
-                        'expr_id': expr_id,
-                        'expr_type': expr_type,
-
-                        'start_line': arg.meta.container_line,
-                        'start_column': arg.meta.container_column,
-                        'end_line': arg.meta.container_end_line,
-                        'end_column': arg.meta.container_end_column,
-                    }]
-                }
-            )
         case _:
             raise Exception(f"Invalid arg expr {arg}")
+    sink.add('dict_entry', {
+        'rule_id': rule_id,
+        'dict_id': dict_id,
+        'key': key,
+        'expr_id': expr_id,
+        'expr_type': expr_type,
 
+        'start_line': arg.meta.container_line,
+        'start_column': arg.meta.container_column,
+        'end_line': arg.meta.container_end_line,
+        'end_column': arg.meta.container_end_column,
+    })
 
 
-def records_from_array_element(element, index, rule_id, array_id, idgen):
+
+def records_from_array_element(element, index, rule_id, array_id, idgen, sink):
     match element:
         case Tree(data=Token(type='RULE', value='array_element'), children=[
             Tree(data=Token(type='RULE', value='expr'), children=[expr]),
         ]):
-            expr_id = f'ex{next(idgen)}'
-            expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
-            return merge_records(
-                expr_records,
-                {
-                    'array_entry': [{
-                        'rule_id': rule_id,
-                        'array_id': array_id,
-                        'index': index,
-                        'expr_id': expr_id,
-                        'expr_type': expr_type,
-
-                        'start_line': element.meta.container_line,
-                        'start_column': element.meta.container_column,
-                        'end_line': element.meta.container_end_line,
-                        'end_column': element.meta.container_end_column,
-                    }]
-                }
-            )
+            expr_id = next(idgen)
+            expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
         case Tree(data='asterisk_var', children=[
             Token(type='IDENTIFIER', value=var_name),
         ]):
-            expr_id = f'ex{next(idgen)}'
-            return {
-                'var_expr': [{
-                    'rule_id': rule_id, 'expr_id': expr_id, 'var_name': var_name,
-                    'special_prefix': '*',
-                    'maybe_null_prefix': False,
-
-                    'start_line': element.children[0].line,
-                    'start_column': element.children[0].column,
-                    'end_line': element.children[0].end_line,
-                    'end_column': element.children[0].end_column,
-                }],
-                'array_entry': [{
-                    'rule_id': rule_id,
-                    'array_id': array_id,
-                    'index': index,
-                    'expr_id': expr_id,
-                    'expr_type': 'var_expr',
-
-                    'start_line': element.meta.container_line,
-                    'start_column': element.meta.container_column,
-                    'end_line': element.meta.container_end_line,
-                    'end_column': element.meta.container_end_column,
-                }]
-            }
+            expr_id = next(idgen)
+            sink.add('var_expr', {
+                'rule_id': rule_id, 'expr_id': expr_id, 'var_name': var_name,
+                'special_prefix': '*',
+                'maybe_null_prefix': False,
+
+                'start_line': element.children[0].line,
+                'start_column': element.children[0].column,
+                'end_line': element.children[0].end_line,
+                'end_column': element.children[0].end_column,
+            })
+            expr_type = 'var_expr'
         case _:
             raise Exception(f"Invalid array element {element}")
+    sink.add('array_entry', {
+        'rule_id': rule_id,
+        'array_id': array_id,
+        'index': index,
+        'expr_id': expr_id,
+        'expr_type': expr_type,
+
+        'start_line': element.meta.container_line,
+        'start_column': element.meta.container_column,
+        'end_line': element.meta.container_end_line,
+        'end_column': element.meta.container_end_column,
+    })
 
 def sql_str_into_template_array(s):
     return re.split(r'(\{\{[a-zA-Z_][a-zA-Z0-9_]*\}\})', s)
 
-def records_from_expr(expr, rule_id, expr_id, idgen, assigned_type=None, maybe_null_prefix=False):
+def records_from_expr(expr, rule_id, expr_id, idgen, sink, assigned_type=None, maybe_null_prefix=False):
+    # adds records of the expression into the sink, returns its expr_type
     match expr:
         case Tree(data=Token(type='RULE', value='expr'), children=[wrapped_expr]):
-            expr_type, records = records_from_expr(
-                wrapped_expr, rule_id, expr_id, idgen,
+            return records_from_expr(
+                wrapped_expr, rule_id, expr_id, idgen, sink,
                 assigned_type=assigned_type, maybe_null_prefix=maybe_null_prefix)
-            return expr_type, records
         case Token(type='NUMBER', value=value):
-            return 'int_expr', {
-                'int_expr': [{
-                    'rule_id': rule_id,
-                    'expr_id': expr_id,
-                    'value': int(value),
-
-                    'start_line': expr.line,
-                    'start_column': expr.column,
-                    'end_line': expr.end_line,
-                    'end_column': expr.end_column,
-                }]
-            }
+            sink.add('int_expr', {
+                'rule_id': rule_id,
+                'expr_id': expr_id,
+                'value': int(value),
+
+                'start_line': expr.line,
+                'start_column': expr.column,
+                'end_line': expr.end_line,
+                'end_column': expr.end_column,
+            })
+            return 'int_expr'
         case Token(type='IDENTIFIER', value="NULL"):
-            return 'null_expr', {
-                'null_expr': [{
-                    'rule_id': rule_id,
-                    'expr_id': expr_id,
-
-                    'start_line': expr.line,
-                    'start_column': expr.column,
-                    'end_line': expr.end_line,
-                    'end_column': expr.end_column,
-                }]
-            }
+            sink.add('null_expr', {
+                'rule_id': rule_id,
+                'expr_id': expr_id,
+
+                'start_line': expr.line,
+                'start_column': expr.column,
+                'end_line': expr.end_line,
+                'end_column': expr.end_column,
+            })
+            return 'null_expr'
         case Token(type='IDENTIFIER', value=var_name) if var_name in ["true", "false"]:
-            return 'bool_expr', {
-                'bool_expr': [{
-                    'rule_id': rule_id,
-                    'expr_id': expr_id,
-                    'value': (var_name == "true"),
-
-                    'start_line': expr.line,
-                    'start_column': expr.column,
-                    'end_line': expr.end_line,
-                    'end_column': expr.end_column,
-                }]
-            }
+            sink.add('bool_expr', {
+                'rule_id': rule_id,
+                'expr_id': expr_id,
+                'value': (var_name == "true"),
+
+                'start_line': expr.line,
+                'start_column': expr.column,
+                'end_line': expr.end_line,
+                'end_column': expr.end_column,
+            })
+            return 'bool_expr'
         case Token(type='IDENTIFIER', value=value):
-            return 'var_expr', {
-                'var_expr': [{
-                    'rule_id': rule_id,
-                    'expr_id': expr_id,
-                    'var_name': value,
-                    'assigned_type': assigned_type,
-                    'maybe_null_prefix': maybe_null_prefix,
-
-                    'start_line': expr.line,
-                    'start_column': expr.column,
-                    'end_line': expr.end_line,
-                    'end_column': expr.end_column,
-                }]
-            }
+            sink.add('var_expr', {
+                'rule_id': rule_id,
+                'expr_id': expr_id,
+                'var_name': value,
+                'assigned_type': assigned_type,
+                'maybe_null_prefix': maybe_null_prefix,
+
+                'start_line': expr.line,
+                'start_column': expr.column,
+                'end_line': expr.end_line,
+                'end_column': expr.end_column,
+            })
+            return 'var_expr'
         case Token(type='ESCAPED_STRING', value=value):
-            return 'str_expr', {
-                'str_expr': [{
-                    'rule_id': rule_id,
-                    'expr_id': expr_id,
-                    'value': value[1:-1],
-
-                    'start_line': expr.line,
-                    'start_column': expr.column,
-                    'end_line': expr.end_line,
-                    'end_column': expr.end_column,
-                }]
-            }
+            sink.add('str_expr', {
+                'rule_id': rule_id,
+                'expr_id': expr_id,
+                'value': value[1:-1],
+
+                'start_line': expr.line,
+                'start_column': expr.column,
+                'end_line': expr.end_line,
+                'end_column': expr.end_column,
+            })
+            return 'str_expr'
         case Token(type='INTERPOLATED_STRING', value=value):
             template = sql_str_into_template_array(value[1:-1])
-            return 'str_template_expr', {
-                'str_template_expr': [{
-                    'rule_id': rule_id,
-                    'expr_id': expr_id,
-                    'template': template,
-
-                    'start_line': expr.line,
-                    'start_column': expr.column,
-                    'end_line': expr.end_line,
-                    'end_column': expr.end_column,
-                }]
-            }
+            sink.add('str_template_expr', {
+                'rule_id': rule_id,
+                'expr_id': expr_id,
+                'template': template,
+
+                'start_line': expr.line,
+                'start_column': expr.column,
+                'end_line': expr.end_line,
+                'end_column': expr.end_column,
+            })
+            return 'str_template_expr'
         case Tree(data=Token(type='RULE', value='binop_expr'), children=[
             Tree(data=Token(type='RULE', value='expr'), children=[left_expr]),
-            Token(type='BIN_OP', value=op),
+            Token(type='OR_OP' | 'AND_OP' | 'CMP_OP' | 'MATCH_OP', value=op),
             Tree(data=Token(type='RULE', value='expr'), children=[right_expr]),
         ]):
-            left_expr_id = f'ex{next(idgen)}'
-            right_expr_id = f'ex{next(idgen)}'
-            left_expr_type, left_expr_records = records_from_expr(left_expr, rule_id, left_expr_id, idgen)
-            right_expr_type, right_expr_records = records_from_expr(right_expr, rule_id, right_expr_id, idgen)
-            return 'binop_expr', functools.reduce(
-                merge_records,
-                [
-                    left_expr_records,
-                    right_expr_records,
-                    {
-                        'binop_expr': [{
-                            'rule_id': rule_id,
-                            'expr_id': expr_id,
-                            'op': op,
-                            'left_expr_id': left_expr_id,
-                            'left_expr_type': left_expr_type,
-                            'right_expr_id': right_expr_id,
-                            'right_expr_type': right_expr_type,
-
-                            'start_line': expr.meta.container_line,
-                            'start_column': expr.meta.container_column,
-                            'end_line': expr.meta.container_end_line,
-                            'end_column': expr.meta.container_end_column,
-                        }]
-                    }
-                ])
+            left_expr_id = next(idgen)
+            right_expr_id = next(idgen)
+            left_expr_type = records_from_expr(left_expr, rule_id, left_expr_id, idgen, sink)
+            right_expr_type = records_from_expr(right_expr, rule_id, right_expr_id, idgen, sink)
+            sink.add('binop_expr', {
+                'rule_id': rule_id,
+                'expr_id': expr_id,
+                'op': op,
+                'left_expr_id': left_expr_id,
+                'left_expr_type': left_expr_type,
+                'right_expr_id': right_expr_id,
+                'right_expr_type': right_expr_type,
+
+                'start_line': expr.meta.container_line,
+                'start_column': expr.meta.container_column,
+                'end_line': expr.meta.container_end_line,
+                'end_column': expr.meta.container_end_column,
+            })
+            return 'binop_expr'
 
         case Tree(data=Token(type='RULE', value='aggregated_expr'), children=[
             Token(type='IDENTIFIER', value=fn_name),
             Tree(data=Token(type='RULE', value='fn_args'), children=fn_args),
         ]):
-            return 'fncall_expr', records_from_fncall_expr(expr, rule_id, expr_id, fn_name, fn_args, True, idgen)
+            records_from_fncall_expr(expr, rule_id, expr_id, fn_name, fn_args, True, idgen, sink)
+            return 'fncall_expr'
         case Tree(data=Token(type='RULE', value='aggregated_expr'), children=[
             Token(type='IDENTIFIER', value=fn_name),
         ]):
-            return 'fncall_expr', records_from_fncall_expr(expr, rule_id, expr_id, fn_name, None, True, idgen)
+            records_from_fncall_expr(expr, rule_id, expr_id, fn_name, None, True, idgen, sink)
+            return 'fncall_expr'
         case Tree(data=Token(type='RULE', value='funcall_expr'), children=[
             Token(type='IDENTIFIER', value=fn_name),
             Tree(data=Token(type='RULE', value='fn_args'), children=fn_args),
         ]):
-            return 'fncall_expr', records_from_fncall_expr(expr, rule_id, expr_id, fn_name, fn_args, False, idgen)
+            records_from_fncall_expr(expr, rule_id, expr_id, fn_name, fn_args, False, idgen, sink)
+            return 'fncall_expr'
 
         case Tree(data=Token(type='RULE', value='dict_expr'), children=[
             Tree(data=Token(type='RULE', value='kv_args'), children=kv_args),
         ]):
-            dict_id = f'dt{next(idgen)}'
-            args_records = [records_from_dict_arg(da, rule_id, dict_id, idgen) for da in kv_args]
-            return 'dict_expr', functools.reduce(merge_records, [
-                *args_records,
-                { 'dict_expr': [{
-                    'rule_id': rule_id, 'dict_id': dict_id, 'expr_id': expr_id,
-
-                    'start_line': expr.meta.container_line,
-                    'start_column': expr.meta.container_column,
-                    'end_line': expr.meta.container_end_line,
-                    'end_column': expr.meta.container_end_column,
-                }] },
-            ])
+            dict_id = next(idgen)
+            for da in kv_args:
+                records_from_dict_arg(da, rule_id, dict_id, idgen, sink)
+            sink.add('dict_expr', {
+                'rule_id': rule_id, 'dict_id': dict_id, 'expr_id': expr_id,
+
+                'start_line': expr.meta.container_line,
+                'start_column': expr.meta.container_column,
+                'end_line': expr.meta.container_end_line,
+                'end_column': expr.meta.container_end_column,
+            })
+            return 'dict_expr'
         case Tree(data=Token(type='RULE', value='array_expr'), children=array_elements):
-            array_id = f'ar{next(idgen)}'
-            elements_records = [records_from_array_element(e, i+1, rule_id, array_id, idgen) for (i, e) in enumerate(array_elements)]
-            return 'array_expr', functools.reduce(merge_records, [
-                *elements_records,
-                { 'array_expr': [{
-                    'rule_id': rule_id, 'array_id': array_id, 'expr_id': expr_id,
-
-                    'start_line': expr.meta.container_line,
-                    'start_column': expr.meta.container_column,
-                    'end_line': expr.meta.container_end_line,
-                    'end_column': expr.meta.container_end_column,
-                }] },
-            ])
+            array_id = next(idgen)
+            for (i, e) in enumerate(array_elements):
+                records_from_array_element(e, i+1, rule_id, array_id, idgen, sink)
+            sink.add('array_expr', {
+                'rule_id': rule_id, 'array_id': array_id, 'expr_id': expr_id,
+
+                'start_line': expr.meta.container_line,
+                'start_column': expr.meta.container_column,
+                'end_line': expr.meta.container_end_line,
+                'end_column': expr.meta.container_end_column,
+            })
+            return 'array_expr'
         case _:
             raise Exception(f"Invalid expr {expr}")
 
 
 
-def records_from_fact_arg(fact_arg, rule_id, fact_id, idgen):
-    expr_id = f'ex{next(idgen)}'
+def records_from_fact_arg(fact_arg, rule_id, fact_id, idgen, sink):
+    expr_id = next(idgen)
     match fact_arg:
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='IDENTIFIER', value=key),            
         ]):
-            return {
-                'fact_arg': [{
-                    'rule_id': rule_id, 'fact_id': fact_id, 'key': key,
-                    'expr_id': expr_id, 'expr_type': 'var_expr',
-
-                    'start_line': fact_arg.meta.container_line,
-                    'start_column': fact_arg.meta.container_column,
-                    'end_line': fact_arg.meta.container_end_line,
-                    'end_column': fact_arg.meta.container_end_column,
-                }],
-                'var_expr': [{
-                    'rule_id': rule_id, 'expr_id': expr_id, 'var_name': key,
-                    'maybe_null_prefix': False,
-
-                    'start_line': fact_arg.children[0].line,
-                    'start_column': fact_arg.children[0].column,
-                    'end_line': fact_arg.children[0].end_line,
-                    'end_column': fact_arg.children[0].end_column,
-                }],
-            }
+            sink.add('fact_arg', {
+                'rule_id': rule_id, 'fact_id': fact_id, 'key': key,
+                'expr_id': expr_id, 'expr_type': 'var_expr',
+
+                'start_line': fact_arg.meta.container_line,
+                'start_column': fact_arg.meta.container_column,
+                'end_line': fact_arg.meta.container_end_line,
+                'end_column': fact_arg.meta.container_end_column,
+            })
+            sink.add('var_expr', {
+                'rule_id': rule_id, 'expr_id': expr_id, 'var_name': key,
+                'maybe_null_prefix': False,
+
+                'start_line': fact_arg.children[0].line,
+                'start_column': fact_arg.children[0].column,
+                'end_line': fact_arg.children[0].end_line,
+                'end_column': fact_arg.children[0].end_column,
+            })
 
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='IDENTIFIER', value=key),
@@ -524,98 +467,87 @@ def records_from_fact_arg(fact_arg, rule_id, fact_id, idgen):
                 Token(type='IDENTIFIER', value=var_name),
             ]),
         ]):
-            return {
-                'fact_arg': [{
-                    'rule_id': rule_id, 'fact_id': fact_id, 'key': key,
-                    'expr_id': expr_id, 'expr_type': 'var_expr',
-
-                    'start_line': fact_arg.meta.container_line,
-                    'start_column': fact_arg.meta.container_column,
-                    'end_line': fact_arg.meta.container_end_line,
-                    'end_column': fact_arg.meta.container_end_column,
-                }],
-                'var_expr': [{
-                    'rule_id': rule_id, 'expr_id': expr_id, 'var_name': var_name,
-                    'maybe_null_prefix': True,
-
-                    'start_line': fact_arg.children[0].line,
-                    'start_column': fact_arg.children[0].column,
-                    'end_line': fact_arg.children[0].end_line,
-                    'end_column': fact_arg.children[0].end_column,
-                }],
-            }
+            sink.add('fact_arg', {
+                'rule_id': rule_id, 'fact_id': fact_id, 'key': key,
+                'expr_id': expr_id, 'expr_type': 'var_expr',
+
+                'start_line': fact_arg.meta.container_line,
+                'start_column': fact_arg.meta.container_column,
+                'end_line': fact_arg.meta.container_end_line,
+                'end_column': fact_arg.meta.container_end_column,
+            })
+            sink.add('var_expr', {
+                'rule_id': rule_id, 'expr_id': expr_id, 'var_name': var_name,
+                'maybe_null_prefix': True,
+
+                'start_line': fact_arg.children[0].line,
+                'start_column': fact_arg.children[0].column,
+                'end_line': fact_arg.children[0].end_line,
+                'end_column': fact_arg.children[0].end_column,
+            })
 
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='IDENTIFIER', value=key),
             Tree(data=Token(type='RULE', value='expr'), children=[expr]),
         ]):
-            expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
-            return merge_records(
-                expr_records,
-                {
-                    'fact_arg': [{
-                        'rule_id': rule_id, 'fact_id': fact_id, 'key': key,
-                        'expr_id': expr_id, 'expr_type': expr_type,
-
-                        'start_line': fact_arg.meta.container_line,
-                        'start_column': fact_arg.meta.container_column,
-                        'end_line': fact_arg.meta.container_end_line,
-                        'end_column': fact_arg.meta.container_end_column,
-                    }]
-                }
-            )
+            expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
+            sink.add('fact_arg', {
+                'rule_id': rule_id, 'fact_id': fact_id, 'key': key,
+                'expr_id': expr_id, 'expr_type': expr_type,
+
+                'start_line': fact_arg.meta.container_line,
+                'start_column': fact_arg.meta.container_column,
+                'end_line': fact_arg.meta.container_end_line,
+                'end_column': fact_arg.meta.container_end_column,
+            })
         case _:
             raise Exception(f"Invalid fact arg {fact_arg}")
 
 
 
-def records_from_body_stmt(index, stmt, rule_id, idgen):
+def records_from_body_stmt(index, stmt, rule_id, idgen, sink):
     match stmt:
         case Tree(data=Token(type='RULE', value='fact'), children=[
             Token(type='IDENTIFIER', value=table_name),
             Tree(data=Token(type='RULE', value='kv_args'), children=fact_args),
         ]):
             # print(f"fact: {stmt}")
-            fact_id = f'ft{next(idgen)}'
-            args_records = [records_from_fact_arg(fa, rule_id, fact_id, idgen) for fa in fact_args]
-            return functools.reduce(merge_records, [
-                *args_records,
-                { 'body_fact': [{
-                    'rule_id': rule_id, 'fact_id': fact_id, 'index': index,
-                    'table_name': table_name, 'negated': False,
-
-                    'start_line': stmt.meta.container_line,
-                    'start_column': stmt.meta.container_column,
-                    'end_line': stmt.meta.container_end_line,
-                    'end_column': stmt.meta.container_end_column,
-                }] },
-            ])
+            fact_id = next(idgen)
+            for fa in fact_args:
+                records_from_fact_arg(fa, rule_id, fact_id, idgen, sink)
+            sink.add('body_fact', {
+                'rule_id': rule_id, 'fact_id': fact_id, 'index': index,
+                'table_name': table_name, 'negated': False,
+
+                'start_line': stmt.meta.container_line,
+                'start_column': stmt.meta.container_column,
+                'end_line': stmt.meta.container_end_line,
+                'end_column': stmt.meta.container_end_column,
+            })
         case Tree(data=Token(type='RULE', value='negated_fact'), children=[
             Token(type='IDENTIFIER', value=table_name),
             Tree(data=Token(type='RULE', value='kv_args'), children=fact_args),
         ]):
             # print(f"fact: {stmt}")
-            fact_id = f'ft{next(idgen)}'
-            args_records = [records_from_fact_arg(fa, rule_id, fact_id, idgen) for fa in fact_args]
-            return functools.reduce(merge_records, [
-                *args_records,
-                { 'body_fact': [{
-                    'rule_id': rule_id, 'fact_id': fact_id, 'index': index,
-                    'table_name': table_name, 'negated': True,
-
-                    'start_line': stmt.meta.container_line,
-                    'start_column': stmt.meta.container_column,
-                    'end_line': stmt.meta.container_end_line,
-                    'end_column': stmt.meta.container_end_column,
-                }] },
-            ])
+            fact_id = next(idgen)
+            for fa in fact_args:
+                records_from_fact_arg(fa, rule_id, fact_id, idgen, sink)
+            sink.add('body_fact', {
+                'rule_id': rule_id, 'fact_id': fact_id, 'index': index,
+                'table_name': table_name, 'negated': True,
+
+                'start_line': stmt.meta.container_line,
+                'start_column': stmt.meta.container_column,
+                'end_line': stmt.meta.container_end_line,
+                'end_column': stmt.meta.container_end_column,
+            })
         case Tree(data=Token(type='RULE', value='negated_fact'), children=[
             Token(type='IDENTIFIER', value=table_name),
         ]):
             # negated fact without args, means that we check for existence
             # of at least one row in the table, without any conditions
-            fact_id = f'ft{next(idgen)}'
-            return { 'body_fact': [{
+            fact_id = next(idgen)
+            sink.add('body_fact', {
                 'rule_id': rule_id, 'fact_id': fact_id, 'index': index,
                 'table_name': table_name, 'negated': True,
 
@@ -623,32 +555,28 @@ def records_from_body_stmt(index, stmt, rule_id, idgen):
                 'start_column': stmt.meta.container_column,
                 'end_line': stmt.meta.container_end_line,
                 'end_column': stmt.meta.container_end_column,
-            }] }
+            })
         case Tree(data=Token(type='RULE', value='match_stmt'), children=[
             Tree(data=Token(type='RULE', value='expr'), children=[left_expr]),
             Tree(data=Token(type='RULE', value='expr'), children=[right_expr]),
         ]):
-            match_id = f'mt{next(idgen)}'
-            left_expr_id = f'ex{next(idgen)}'
-            right_expr_id = f'ex{next(idgen)}'
-            left_expr_type, left_expr_records = records_from_expr(
-                left_expr, rule_id, left_expr_id, idgen)
-            right_expr_type, right_expr_records = records_from_expr(
-                right_expr, rule_id, right_expr_id, idgen)
-            return functools.reduce(merge_records, [
-                left_expr_records,
-                right_expr_records,
-                { 'body_match': [{
-                    'rule_id': rule_id, 'match_id': match_id,
-                    'left_expr_id': left_expr_id, 'left_expr_type': left_expr_type,
-                    'right_expr_id': right_expr_id, 'right_expr_type': right_expr_type,
-
-                    'start_line': stmt.meta.container_line,
-                    'start_column': stmt.meta.container_column,
-                    'end_line': stmt.meta.container_end_line,
-                    'end_column': stmt.meta.container_end_column,
-                }] },
-            ])
+            match_id = next(idgen)
+            left_expr_id = next(idgen)
+            right_expr_id = next(idgen)
+            left_expr_type = records_from_expr(
+                left_expr, rule_id, left_expr_id, idgen, sink)
+            right_expr_type = records_from_expr(
+                right_expr, rule_id, right_expr_id, idgen, sink)
+            sink.add('body_match', {
+                'rule_id': rule_id, 'match_id': match_id,
+                'left_expr_id': left_expr_id, 'left_expr_type': left_expr_type,
+                'right_expr_id': right_expr_id, 'right_expr_type': right_expr_type,
+
+                'start_line': stmt.meta.container_line,
+                'start_column': stmt.meta.container_column,
+                'end_line': stmt.meta.container_end_line,
+                'end_column': stmt.meta.container_end_column,
+            })
         case Tree(data=Token(type='RULE', value='match_stmt'), children=[
             Tree(data=Token(type='RULE', value='unnest_pattern'), children=[
                 Tree(data=Token(type='RULE', value='expr'), children=[left_expr1]),
@@ -658,163 +586,152 @@ def records_from_body_stmt(index, stmt, rule_id, idgen):
                 Token(type='IDENTIFIER', value=var_name),
             ]),
         ]):
-            unnest_id = f'un{next(idgen)}'
-            left_expr1_id = f'ex{next(idgen)}'
-            right_expr_id = f'ex{next(idgen)}'
-            left_expr1_type, left_expr1_records = records_from_expr(
-                left_expr1, rule_id, left_expr1_id, idgen)
-            return functools.reduce(merge_records, [
-                left_expr1_records,
-                {
-                    'var_expr': [{
-                        'rule_id': rule_id, 'expr_id': right_expr_id, 'var_name': var_name,
-                        'maybe_null_prefix': False,
-
-                        'start_line': stmt.children[2].children[0].line,
-                        'start_column': stmt.children[2].children[0].column,
-                        'end_line': stmt.children[2].children[0].end_line,
-                        'end_column': stmt.children[2].children[0].end_column,
-                    }],
-                    'body_unnest': [{
-                        'rule_id': rule_id, 'unnest_id': unnest_id,
-                        'left_expr1_id': left_expr1_id, 'left_expr1_type': left_expr1_type,
-                        'right_expr_prefix': prefix,
-                        'right_expr_id': right_expr_id, 'right_expr_type': 'var_expr',
-
-                        'start_line': stmt.meta.container_line,
-                        'start_column': stmt.meta.container_column,
-                        'end_line': stmt.meta.container_end_line,
-                        'end_column': stmt.meta.container_end_column,
-                    }]
-                }
-            ])
+            unnest_id = next(idgen)
+            left_expr1_id = next(idgen)
+            right_expr_id = next(idgen)
+            left_expr1_type = records_from_expr(
+                left_expr1, rule_id, left_expr1_id, idgen, sink)
+            sink.add('var_expr', {
+                'rule_id': rule_id, 'expr_id': right_expr_id, 'var_name': var_name,
+                'maybe_null_prefix': False,
+
+                'start_line': stmt.children[2].children[0].line,
+                'start_column': stmt.children[2].children[0].column,
+                'end_line': stmt.children[2].children[0].end_line,
+                'end_column': stmt.children[2].children[0].end_column,
+            })
+            sink.add('body_unnest', {
+                'rule_id': rule_id, 'unnest_id': unnest_id,
+                'left_expr1_id': left_expr1_id, 'left_expr1_type': left_expr1_type,
+                'right_expr_prefix': prefix,
+                'right_expr_id': right_expr_id, 'right_expr_type': 'var_expr',
+
+                'start_line': stmt.meta.container_line,
+                'start_column': stmt.meta.container_column,
+                'end_line': stmt.meta.container_end_line,
+                'end_column': stmt.meta.container_end_column,
+            })
         case Tree(data=Token(type='RULE', value='expr'), children=[expr]):
             # if it is not a fact and not match,
             # then it must be an expression, that must evaluate to bool
-            expr_id = f'ex{next(idgen)}'
-            expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
-            return functools.reduce(merge_records, [
-                expr_records,
-                {
-                    'body_expr': [{
-                        'rule_id': rule_id, 'expr_id': expr_id, 'expr_type': expr_type,
-
-                        'start_line': stmt.meta.container_line,
-                        'start_column': stmt.meta.container_column,
-                        'end_line': stmt.meta.container_end_line,
-                        'end_column': stmt.meta.container_end_column,
-                    }]
-                }
-            ])
+            expr_id = next(idgen)
+            expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
+            sink.add('body_expr', {
+                'rule_id': rule_id, 'expr_id': expr_id, 'expr_type': expr_type,
+
+                'start_line': stmt.meta.container_line,
+                'start_column': stmt.meta.container_column,
+                'end_line': stmt.meta.container_end_line,
+                'end_column': stmt.meta.container_end_column,
+            })
         case Token(type='SQL_COND', value=sql_cond_expr):
             template = sql_str_into_template_array(sql_cond_expr[4:-1])
-            expr_id = f'ex{next(idgen)}'
-            return {
-                'sql_expr': [{
-                    'rule_id': rule_id, 'expr_id': expr_id, 'template': template,
-
-                    'start_line': stmt.line,
-                    'start_column': stmt.column,
-                    'end_line': stmt.end_line,
-                    'end_column': stmt.end_column,
-                }],
-                'body_sql_cond': [{
-                    'rule_id': rule_id, 'sql_expr_id': expr_id,
-
-                    'start_line': stmt.line,
-                    'start_column': stmt.column,
-                    'end_line': stmt.end_line,
-                    'end_column': stmt.end_column,
-                }]
-            }
+            expr_id = next(idgen)
+            sink.add('sql_expr', {
+                'rule_id': rule_id, 'expr_id': expr_id, 'template': template,
+
+                'start_line': stmt.line,
+                'start_column': stmt.column,
+                'end_line': stmt.end_line,
+                'end_column': stmt.end_column,
+            })
+            sink.add('body_sql_cond', {
+                'rule_id': rule_id, 'sql_expr_id': expr_id,
+
+                'start_line': stmt.line,
+                'start_column': stmt.column,
+                'end_line': stmt.end_line,
+                'end_column': stmt.end_column,
+            })
         case _:
             raise Exception(f"Invalid body stmt {stmt}")    
 
 
 
-def records_from_rule_param(rule_param, rule_id, idgen):
-    expr_id = f'ex{next(idgen)}'
+def records_from_rule_param(rule_param, rule_id, idgen, sink):
+    expr_id = next(idgen)
     match rule_param:
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='IDENTIFIER', value=key),
             Tree(data=Token(type='RULE', value='expr'), children=[expr]),
         ]):
-            expr_type, expr_records = records_from_expr(expr, rule_id, expr_id, idgen)
-            return merge_records(
-                expr_records,
-                { 'rule_param': [{
-                    'rule_id': rule_id, 'key': key, 'expr_id': expr_id, 'expr_type': expr_type,
-                
-                    'start_line': rule_param.meta.container_line,
-                    'start_column': rule_param.meta.container_column,
-                    'end_line': rule_param.meta.container_end_line,
-                    'end_column': rule_param.meta.container_end_column,
-                }] },
-            )
+            expr_type = records_from_expr(expr, rule_id, expr_id, idgen, sink)
+            sink.add('rule_param', {
+                'rule_id': rule_id, 'key': key, 'expr_id': expr_id, 'expr_type': expr_type,
+            
+                'start_line': rule_param.meta.container_line,
+                'start_column': rule_param.meta.container_column,
+                'end_line': rule_param.meta.container_end_line,
+                'end_column': rule_param.meta.container_end_column,
+            })
         case Tree(data=Token(type='RULE', value='kv_arg'), children=[
             Token(type='IDENTIFIER', value=key),
         ]):
-            return {
-                'rule_param': [{ 
-                    'rule_id': rule_id, 'key': key, 'expr_id': expr_id, 'expr_type': 'var_expr',
-
-                    'start_line': rule_param.meta.container_line,
-                    'start_column': rule_param.meta.container_column,
-                    'end_line': rule_param.meta.container_end_line,
-                    'end_column': rule_param.meta.container_end_column,
-                }],
-                'var_expr': [{
-                    'rule_id': rule_id, 'expr_id': expr_id, 'var_name': key,
-                    'maybe_null_prefix': False,
-                
-                    'start_line': rule_param.children[0].line,
-                    'start_column': rule_param.children[0].column,
-                    'end_line': rule_param.children[0].end_line,
-                    'end_column': rule_param.children[0].end_column,
-                }],
-            }
+            sink.add('rule_param', { 
+                'rule_id': rule_id, 'key': key, 'expr_id': expr_id, 'expr_type': 'var_expr',
+
+                'start_line': rule_param.meta.container_line,
+                'start_column': rule_param.meta.container_column,
+                'end_line': rule_param.meta.container_end_line,
+                'end_column': rule_param.meta.container_end_column,
+            })
+            sink.add('var_expr', {
+                'rule_id': rule_id, 'expr_id': expr_id, 'var_name': key,
+                'maybe_null_prefix': False,
+            
+                'start_line': rule_param.children[0].line,
+                'start_column': rule_param.children[0].column,
+                'end_line': rule_param.children[0].end_line,
+                'end_column': rule_param.children[0].end_column,
+            })
         case _:
             raise Exception(f"Invalid rule param {rule_param}")
 
 
 
-def records_from_rule_decl(rule_decl, original_source_path, table_name, rule_params, body_stmts, idgen):
-    rule_id = f'ru{next(idgen)}'
-    param_records = [records_from_rule_param(rp, rule_id, idgen) for rp in rule_params]
-    # print(f"params_recorsd {param_records}")
-    body_stmts_records = [records_from_body_stmt(i+1, bs, rule_id, idgen) for (i, bs) in enumerate(body_stmts)]
-    return functools.reduce(merge_records, [
-        *param_records,
-        *body_stmts_records,
-        { 'rule': [{
-            'rule_id': rule_id, 'table_name': table_name,
+def records_from_rule_decl(rule_decl, original_source_path, table_name, rule_params, body_stmts, idgen, sink):
+    rule_id = next(idgen)
+    rule_sink = RecordSink()
+    for rp in rule_params:
+        records_from_rule_param(rp, rule_id, idgen, rule_sink)
+    for (i, bs) in enumerate(body_stmts):
+        records_from_body_stmt(i+1, bs, rule_id, idgen, rule_sink)
+    # only the rule row has absolute lines, lines of its other rows are relative
+    # to it, so a rule moved by an edit above it changes just one row
+    rule_line = rule_decl.meta.container_line
+    for (ast_table_name, rows) in rule_sink.records.items():
+        for row in rows:
+            row['pos'] = encode_position(
+                row.pop('start_line') - rule_line, row.pop('start_column'),
+                row.pop('end_line') - rule_line, row.pop('end_column'))
+            sink.add(ast_table_name, row)
+    sink.add('rule', {
+        'rule_id': rule_id, 'table_name': table_name,
 
-            'source_path': original_source_path,
-            'start_line': rule_decl.meta.container_line,
-            'start_column': rule_decl.meta.container_column,
-            'end_line': rule_decl.meta.container_end_line,
-            'end_column': rule_decl.meta.container_end_column,
-        }] },
-    ])
+        'source_path': original_source_path,
+        'pos': encode_position(
+            rule_decl.meta.container_line, rule_decl.meta.container_column,
+            rule_decl.meta.container_end_line, rule_decl.meta.container_end_column),
+    })
 
 
 
-def records_from_toplevel_decls(toplevel_decl, original_source_path, idgen):
+def records_from_toplevel_decls(toplevel_decl, original_source_path, idgen, sink):
     # print(toplevel_decl)
     match toplevel_decl:
         case Tree(data=Token(type='RULE', value='rule'), children=[
             Token(type='IDENTIFIER', value=table_name),
             Tree(data=Token(type='RULE', value='kv_args'), children=rule_params),
         ]):
-            return records_from_rule_decl(
-                toplevel_decl, original_source_path, table_name, rule_params, [], idgen)
+            records_from_rule_decl(
+                toplevel_decl, original_source_path, table_name, rule_params, [], idgen, sink)
         case Tree(data=Token(type='RULE', value='rule'), children=[
             Token(type='IDENTIFIER', value=table_name),
             Tree(data=Token(type='RULE', value='kv_args'), children=rule_params),
             Tree(data=Token(type='RULE', value='body_stmt'), children=[body_stmt]),
         ]):
-            return records_from_rule_decl(
-                toplevel_decl, original_source_path, table_name, rule_params, [body_stmt], idgen)
+            records_from_rule_decl(
+                toplevel_decl, original_source_path, table_name, rule_params, [body_stmt], idgen, sink)
         case Tree(data=Token(type='RULE', value='rule'), children=[
             Token(type='IDENTIFIER', value=table_name),
             Tree(data=Token(type='RULE', value='kv_args'), children=rule_params),
@@ -827,20 +744,21 @@ def records_from_toplevel_decls(toplevel_decl, original_source_path, idgen):
                         body_stmts.append(body_stmt)
                     case _:
                         raise Exception(f"Invalid body stmt {child}")
-            return records_from_rule_decl(
-                toplevel_decl, original_source_path, table_name, rule_params, body_stmts, idgen)
+            records_from_rule_decl(
+                toplevel_decl, original_source_path, table_name, rule_params, body_stmts, idgen, sink)
         case _:
             raise Exception(f"Invalid toplevel decl {toplevel_decl}")
 
 
 
-def records_from_tree(tree, original_source_path, idgen):
+def records_from_tree(tree, original_source_path, idgen, sink):
+    # without idgen, ids are derived from the content of declarations
+    content_ids = ContentIds(original_source_path)
     match tree:
         case Tree(data=Token(type='RULE', value='start'), children=toplevel_decls):
-            return functools.reduce(
-                merge_records,
-                [records_from_toplevel_decls(d, original_source_path, idgen) for d in toplevel_decls],
-                {})
+            for d in toplevel_decls:
+                records_from_toplevel_decls(
+                    d, original_source_path, idgen or content_ids.idgen(d), sink)
         case _:
             raise Exception(f"Invalid tree {tree}")
 
@@ -868,25 +786,334 @@ def records_from_schema(schema):
 
 
 
-def parse(text, original_path, schema=None, idgen=None):
+PARSER_MODES = ['auto', 'lalr', 'earley']
+DEFAULT_PARSER_MODE = os.environ.get('GRASP_PARSER_MODE', 'auto')
+
+def grammar_path(mode='earley'):
     scripts_dir = os.path.abspath(os.path.dirname(__file__))
-    grammar_text = open(f'{scripts_dir}/../../grammar.lark', 'r').read()
+    match mode:
+        case 'earley':
+            return os.path.abspath(f'{scripts_dir}/../../grammar.lark')
+        case 'lalr':
+            return os.path.abspath(f'{scripts_dir}/../../grammar_lalr.lark')
+        case _:
+            raise Exception(f"Unknown parser mode {mode}")
+
+def parser_cache_dir():
+    default_dir = os.path.abspath(f'{os.path.dirname(grammar_path())}/.grasp_cache')
+    return os.environ.get('GRASP_CACHE_DIR', default_dir)
+
+def grammar_cache_path(grammar_text):
+    # loaded grammar is pickled, so the key must also cover lark and python versions
+    key = f'{grammar_text}{lark.__version__}{sys.version_info[:2]}'
+    grammar_hash = hashlib.sha256(key.encode('utf-8')).hexdigest()[:10]
+    return f'{parser_cache_dir()}/grammar.{grammar_hash}.pickle'
+
+def load_grammar_cached(grammar_text):
+    cache_path = grammar_cache_path(grammar_text)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring broken grammar cache {cache_path}: {e}", file=sys.stderr)
+
+    grammar, _ = load_grammar(grammar_text, grammar_path(), [], False)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # write into temporary file first, so concurrent processes
+        # would never see partially written cache
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(grammar, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Failed to write grammar cache {cache_path}: {e}", file=sys.stderr)
+    return grammar
+
+
+
+class GrammarPostLex(PostLex):
+    # Whitespace and comments are not ignored by the lexer of LALR grammar,
+    # they come here as gaps between tokens, and every gap is checked the way
+    # Earley grammar checks it, so LALR never accepts what Earley rejects.
+    # Newlines inside brackets are dropped, the rest become _NL, or _BODY_NL
+    # when the next line is a line of a multiline body.
+    BRACKETS = {'LPAR': 'RPAR', 'LSQB': 'RSQB', 'LBRACE': 'RBRACE', 'LESSTHAN': 'MORETHAN'}
+    GAP_TOKENS = ['WS_INLINE', 'COMMENT', '_NL']
+    # must be surrounded by spaces or tabs, on the same line
+    SPACED_TOKENS = ['OR_OP', 'AND_OP', 'CMP_OP', 'MATCH_OP', ':=', '_UNNEST_ASSIGN']
+    # must be followed by the next token without anything in between
+    PREFIX_TOKENS = ['MAYBE_NULL_PREFIX', 'ID_PREFIX', 'STAR', '::']
+    always_accept = ('_NL', 'WS_INLINE', 'COMMENT')
+
+    def process(self, stream):
+        # kinds of open brackets: fact, call, paren, array, dict, aggregate
+        brackets = []
+        in_body = False
+        (prev_kind, prev_gap, gap) = (None, [], [])
+        stmt_start = True
+        for token in stream:
+            if token.type == '_NL' and not brackets:
+                # yielded right away, the contextual lexer
+                # lexes the next token in the state after it
+                token = self.newline_token(token, gap, prev_kind == '<-' or in_body, prev_kind == '<-')
+                in_body = (token.type == '_BODY_NL')
+                stmt_start = True
+                (prev_kind, prev_gap, gap) = ('_NL', [], [])
+                yield token
+                continue
+            if token.type in self.GAP_TOKENS:
+                gap.append(token)
+                continue
+            kind = self.token_kind(token)
+            self.check_gap(token, kind, gap, prev_kind, prev_gap, brackets)
+
+            if kind in self.BRACKETS:
+                match kind:
+                    case 'LPAR' if prev_kind == 'IDENTIFIER':
+                        brackets.append('fact' if prev_first else 'call')
+                    case 'LPAR':
+                        brackets.append('paren')
+                    case 'LSQB':
+                        brackets.append('array')
+                    case 'LBRACE':
+                        brackets.append('dict')
+                    case 'LESSTHAN':
+                        brackets.append('aggregate')
+            elif kind in self.BRACKETS.values() and brackets:
+                brackets.pop()
+            prev_first = stmt_start and not brackets
+            stmt_start = kind in ['<-', 'NOT']
+            (prev_kind, prev_gap, gap) = (kind, gap, [])
+            yield token
+
+    def token_kind(self, token):
+        # anonymous terminals, like `<-`, have generated names
+        return token.value if token.type.startswith('__ANON') else token.type
+
+    def reject(self, token):
+        raise UnexpectedToken(token, set())
+
+    def check_gap(self, token, kind, gap, prev_kind, prev_gap, brackets):
+        multiline = any(t.type in ['_NL', 'COMMENT'] for t in gap)
+        if gap and (prev_kind in self.PREFIX_TOKENS or kind == '::'
+                    or (prev_kind == 'IDENTIFIER' and kind in ['LPAR', 'LESSTHAN'])
+                    or (prev_kind in ['IDENTIFIER', 'ESCAPED_STRING'] and kind == 'COLON')):
+            self.reject(token)
+        if (prev_kind in self.SPACED_TOKENS or kind in self.SPACED_TOKENS) and (multiline or not gap):
+            self.reject(token)
+        # value of key-value argument must be separated from `:` by whitespace
+        if (prev_kind == 'COLON' and kind not in ['COMMA', '_KV_COMMA', 'RPAR', 'RBRACE']
+                and (not gap or gap[0].type == 'COMMENT')):
+            self.reject(token)
+        match brackets[-1:]:
+            case ['call' | 'aggregate']:
+                # arguments of function calls and aggregations are on the same
+                # line as the brackets, and have no trailing comma
+                if multiline and (prev_kind in self.BRACKETS or kind in self.BRACKETS.values()):
+                    self.reject(token)
+                if kind in self.BRACKETS.values() and prev_kind == 'COMMA':
+                    self.reject(token)
+            case ['array'] if kind == 'RSQB' and prev_kind != 'LSQB':
+                # comments are not allowed after the last element of array
+                if any(t.type == 'COMMENT' for t in gap):
+                    self.reject(token)
+                if prev_kind == 'COMMA' and any(t.type == 'COMMENT' for t in prev_gap):
+                    self.reject(token)
+
+    def newline_token(self, newline, gap, in_body, starts_body):
+        lines = newline.value.replace('\r', '').split('\n')
+        if not in_body:
+            return self.end_of_line_token(newline, lines)
+        # Multiline body goes on with lines that are empty, comments, or start
+        # with a tab, and the next statement is indented with exactly one tab.
+        # Body without lines is not allowed, neither is a comment after
+        # `<-` or after a statement
+        if any(t.type == 'COMMENT' for t in gap):
+            self.reject(newline)
+        n_lines = 0 if starts_body else 1
+        for (i, line) in enumerate(lines[1:-1], 1):
+            if not line:
+                continue
+            if line.lstrip(' \t').startswith('#') or (line.startswith('\t') and not line.strip(' \t')):
+                n_lines += 1
+                continue
+            # body ends before this line
+            if not n_lines:
+                self.reject(newline)
+            return self.end_of_line_token(newline, lines[:i] + [''])
+        if lines[-1] == '\t':
+            return Token.new_borrow_pos('_BODY_NL', newline.value, newline)
+        if not n_lines:
+            self.reject(newline)
+        return self.end_of_line_token(newline, lines)
+
+    def end_of_line_token(self, newline, lines):
+        # Earley grammar matches trailing newlines and comment lines
+        # one by one, and the rule ends right after the last of them.
+        # Emulate that, so both grammars produce identical positions.
+        if len(lines) == 2:
+            end_line, end_column = newline.line, newline.column + 1
+        else:
+            end_line, end_column = newline.line + len(lines) - 2, len(lines[-2]) + 2
+        return Token('_NL', newline.value, newline.start_pos, newline.line, newline.column,
+                     end_line, end_column, newline.end_pos)
+
+
+
+@functools.cache
+def get_parser(mode='earley'):
+    with trace.span('load_grammar', mode=mode):
+        return build_parser(mode)
+
+def build_parser(mode):
     # propagate token positions: line, column, end_line, end_col.
     # https://github.com/lark-parser/lark/issues/12#issuecomment-304404835
-    parser = Lark(grammar_text, parser="earley", propagate_positions=True)
+    match mode:
+        case 'earley':
+            # Earley parser can't be serialized by lark (Lark.save() is LALR only),
+            # so only the loaded grammar is cached on disk, and the parser itself
+            # is built once per process.
+            grammar_text = open(grammar_path(mode), 'r').read()
+            grammar = load_grammar_cached(grammar_text)
+            return Lark(grammar, parser="earley", propagate_positions=True)
+        case 'lalr':
+            # lark keys the cache by grammar text, options and its own version
+            cache_path = f'{parser_cache_dir()}/grammar_lalr.cache'
+            os.makedirs(parser_cache_dir(), exist_ok=True)
+            return Lark(
+                open(grammar_path(mode), 'r').read(), parser="lalr", lexer="contextual",
+                postlex=GrammarPostLex(), propagate_positions=True, cache=cache_path)
+        case _:
+            raise Exception(f"Unknown parser mode {mode}")
+
+def normalize_tree(tree):
+    # Parser loaded from lark cache, as well as aliased rules, produce trees
+    # with plain string as data, while records_from_* match on Token('RULE', ...)
+    for subtree in tree.iter_subtrees():
+        if not isinstance(subtree.data, Token):
+            subtree.data = Token('RULE', subtree.data)
+    return tree
+
+def parse_prepared_text(text, mode):
+    match mode:
+        case 'auto':
+            # LALR grammar is stricter in some corner cases,
+            # fallback to Earley to get the same results as before
+            try:
+                return parse_prepared_text(text, 'lalr')
+            except UnexpectedInput:
+                return parse_prepared_text(text, 'earley')
+        case 'lalr' | 'earley':
+            lark_parser = get_parser(mode)
+            with trace.span('parse', mode=mode, bytes=len(text)):
+                return normalize_tree(lark_parser.parse(text))
+        case _:
+            raise Exception(f"Unknown parser mode {mode}")
+
+def parse_tree(text, mode=DEFAULT_PARSER_MODE):
     # for simplicity of grammar, always insert new lines in the beginnging of the file
     # and in the end
-    # for tok in parser.lex("\n" + text + "\n"):
-    #     print(f"TOKEN: {repr(tok)}")
-
-    tree = parser.parse("\n" + text + "\n")
+    return parse_prepared_text("\n" + text + "\n", mode)
+
+
+
+TOPLEVEL_DECL_START = re.compile(r'^[A-Za-z_]', re.MULTILINE)
+
+def split_toplevel_chunks(text):
+    # every line that starts with an identifier starts a new top-level
+    # declaration. Yields (line_offset, chunk, is_last) for every declaration.
+    starts = [m.start() for m in TOPLEVEL_DECL_START.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts = [0, *starts]
+    line_offset = 0
+    for i, start in enumerate(starts):
+        is_last = (i + 1 == len(starts))
+        chunk = text[start:] if is_last else text[start:starts[i+1]]
+        yield line_offset, chunk, is_last
+        line_offset += chunk.count('\n')
+
+def shift_tree_lines(tree, line_offset):
+    if line_offset == 0:
+        return tree
+    for subtree in tree.iter_subtrees():
+        for attr in ['line', 'end_line', 'container_line', 'container_end_line']:
+            if hasattr(subtree.meta, attr):
+                setattr(subtree.meta, attr, getattr(subtree.meta, attr) + line_offset)
+    for token in tree.scan_values(lambda v: isinstance(v, Token)):
+        token.line += line_offset
+        token.end_line += line_offset
+    return tree
+
+def iter_toplevel_decls(text, mode=DEFAULT_PARSER_MODE):
+    # Parses declarations one by one, so the caller can start processing
+    # the first ones before the whole text is parsed.
+    n_yielded = 0
+    try:
+        for line_offset, chunk, is_last in split_toplevel_chunks(text):
+            # chunk ends with a newline, unless it is the last one,
+            # and positions are the same as if the whole text was parsed
+            tree = parse_prepared_text("\n" + chunk + ("\n" if is_last else ""), mode)
+            shift_tree_lines(tree, line_offset)
+            for decl in tree.children:
+                yield decl
+                n_yielded += 1
+    except UnexpectedInput:
+        # declaration spans over several chunks, or the text is invalid.
+        # Parse the whole text, either it raises a proper error,
+        # or returns declarations that were not yielded yet.
+        tree = parse_tree(text, mode)
+        yield from tree.children[n_yielded:]
+
+def iter_records(text, original_path, idgen=None, mode=DEFAULT_PARSER_MODE, batch_size=1):
+    # yields records of every batch_size top-level declarations
+    content_ids = ContentIds(original_path)
+    sink = RecordSink()
+    n_decls = 0
+    for decl in iter_toplevel_decls(text, mode):
+        with trace.span('build_records', path=original_path):
+            records_from_toplevel_decls(decl, original_path, idgen or content_ids.idgen(decl), sink)
+        n_decls += 1
+        if n_decls % batch_size == 0:
+            trace.counter('records', **records_counts(sink.records))
+            yield sink.records
+            sink = RecordSink()
+    if sink.records:
+        trace.counter('records', **records_counts(sink.records))
+        yield sink.records
+
+def records_counts(records):
+    return dict((table_name, len(rows)) for (table_name, rows) in records.items())
+
+def parse(text, original_path, schema=None, idgen=None, mode=DEFAULT_PARSER_MODE):
+    tree = parse_tree(text, mode)
     # print(f'\n\ntree:\n{tree}\n\n')
     # print(f'\n\ntree:\n{tree.pretty()}\n\n')
-    if not idgen:
-        idgen = natural_num_generator()
-    if schema:
-        return merge_records(
-            records_from_tree(tree, original_path, idgen),
-            records_from_schema(schema))
-
-    return records_from_tree(tree, original_path, idgen)
+    sink = RecordSink()
+    with trace.span('build_records', path=original_path) as span_args:
+        records_from_tree(tree, original_path, idgen, sink)
+        if schema:
+            sink.add_records(records_from_schema(schema))
+        span_args['rows'] = records_counts(sink.records)
+    trace.counter('records', **span_args['rows'])
+    return sink.records
+
+def parse_file(path, schema=None, mode=DEFAULT_PARSER_MODE):
+    return parse(open(path, 'r').read(), str(path), schema=schema, mode=mode)
+
+def parse_files_in_parallel(paths, schemas=None, mode=DEFAULT_PARSER_MODE, max_workers=None):
+    # Yields (path, records) in the order files are parsed. Ids are derived
+    # from the content and the path of every file, so they do not depend
+    # on the order of completion, nor on the number of workers.
+    schemas = schemas or {}
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers)
+    try:
+        futures = dict([
+            (pool.submit(parse_file, path, schemas.get(path), mode), path)
+            for path in paths])
+        for future in concurrent.futures.as_completed(futures):
+            yield (futures[future], future.result())
+    finally:
+        # do not parse the rest of files if the caller has failed
+        pool.shutdown(cancel_futures=True)
@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import fcntl
+import hashlib
+import contextlib
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.util import read_transpiler_sql, read_transpiler_udf_rs
+
+
+
+# Output SQL of previous runs, keyed by everything it depends on: the transpiler,
+# the parser, the backend and every input file. Entries are shared by all processes using
+# the same cache dir. Total size is bounded, least recently used entries are
+# evicted first, mtime of an entry is its last use.
+
+MAX_CACHE_BYTES = int(os.environ.get('GRASP_RESULT_CACHE_BYTES', 256 * 2**20))
+
+def cache_dir():
+    return f'{parser.parser_cache_dir()}/results'
+
+def toolchain_hash():
+    h = hashlib.sha256()
+    for text in [
+        read_transpiler_sql(), read_transpiler_udf_rs(),
+        open(parser.grammar_path('earley'), 'r').read(), open(parser.grammar_path('lalr'), 'r').read(),
+        open(parser.__file__, 'r').read(), open(local_backend.__file__, 'r').read(),
+    ]:
+        h.update(hashlib.sha256(text.encode('utf-8')).digest())
+    return h.hexdigest()
+
+def cache_key(input_paths, options=()):
+    # paths are part of the key, they end up in the records.
+    # The order is kept, it is the order records are sent in.
+    # Options are the ones that change the output, like the kind of ids
+    # or the backend, output of the local backend may differ from Feldera
+    h = hashlib.sha256(toolchain_hash().encode('utf-8'))
+    for option in options:
+        h.update(option.encode('utf-8') + b'\0')
+    for path in input_paths:
+        h.update(str(path).encode('utf-8') + b'\0')
+        h.update(hashlib.sha256(open(path, 'rb').read()).digest())
+    return h.hexdigest()[:32]
+
+def entry_path(key):
+    return f'{cache_dir()}/{key}.sql'
+
+@contextlib.contextmanager
+def locked_stats():
+    # stats are updated by concurrent processes, so under an exclusive lock
+    os.makedirs(cache_dir(), exist_ok=True)
+    with open(f'{cache_dir()}/stats.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        path = f'{cache_dir()}/stats.json'
+        try:
+            with open(path, 'r') as f:
+                stats = json.load(f)
+        except (FileNotFoundError, ValueError):
+            stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        yield stats
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, path)
+
+def count(name, n=1):
+    try:
+        with locked_stats() as stats:
+            stats[name] = stats.get(name, 0) + n
+    except OSError as e:
+        print(f"Failed to update result cache stats: {e}", file=sys.stderr)
+
+def read(key):
+    path = entry_path(key)
+    try:
+        with open(path, 'r') as f:
+            sql = f.read()
+        # entry might be evicted by another process right now, it is fine
+        os.utime(path)
+    except FileNotFoundError:
+        count('misses')
+        return None
+    count('hits')
+    return sql
+
+def write(key, sql, max_bytes=MAX_CACHE_BYTES):
+    path = entry_path(key)
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        # write into temporary file first, so concurrent processes
+        # would never see partially written entry
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(sql)
+        os.replace(tmp_path, path)
+        evict(max_bytes, keep=path)
+    except OSError as e:
+        print(f"Failed to write result cache {path}: {e}", file=sys.stderr)
+
+def entries():
+    # [(mtime, size, path)], oldest first
+    result = []
+    for entry in os.scandir(cache_dir()):
+        if not entry.name.endswith('.sql'):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        result.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    result.sort()
+    return result
+
+def evict(max_bytes, keep=None):
+    # the entry just written is kept, even if it alone is over the limit
+    cached = entries()
+    total = sum(size for (_, size, _) in cached)
+    n_evicted = 0
+    for (_, size, path) in cached:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            n_evicted += 1
+        except FileNotFoundError:
+            # evicted by another process
+            pass
+        total -= size
+    if n_evicted:
+        count('evictions', n_evicted)
+
+def format_stats():
+    with locked_stats() as stats:
+        pass
+    cached = entries()
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = f'{stats["hits"]/lookups*100:.0f}%' if lookups else '-'
+    return (f"Result cache {cache_dir()}: {stats['hits']} hits, {stats['misses']} misses ({hit_rate}), "
+            f"{stats['evictions']} evictions, {len(cached)} entries, "
+            f"{sum(size for (_, size, _) in cached)/2**20:.1f}MB of {MAX_CACHE_BYTES/2**20:.1f}MB")
@@ -0,0 +1,77 @@
+import sys
+import glob
+import asyncio
+import difflib
+
+import aiohttp
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.util import root_dir, start_transaction, commit_transaction, insert_records, insert_record_deltas, wait_till_input_tokens_processed
+from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
+from grasp.scripts.ensure_tests_transpiled import fetch_output_sql_lines, testcase_schema, testcase_pipeline_id, testcase_records
+
+
+
+# Transpiles every testcase with Feldera and with the local backend,
+# output of both must be the same byte by byte.
+
+def testcase_records_to_check(testcase_path):
+    # own pipeline_id, so records of `make test` are not touched
+    pipeline_id = f'check_local_backend:{testcase_pipeline_id(testcase_path)}'
+    records0 = parser.parse_file(testcase_path, testcase_schema(testcase_path))
+    return (pipeline_id, testcase_records(testcase_path, pipeline_id, records0))
+
+def compare_outputs(testcase_path, feldera_sql, local_sql):
+    if feldera_sql == local_sql:
+        print(f"✅ {testcase_path}")
+        return True
+    print(f"❌ {testcase_path}: local backend output differs")
+    diff = difflib.unified_diff(
+        feldera_sql.splitlines(keepends=True), local_sql.splitlines(keepends=True),
+        fromfile='feldera', tofile='local')
+    sys.stdout.writelines(diff)
+    return False
+
+async def main(testcases_paths):
+    feldera_url = 'http://localhost:8080'
+    pipeline_name = 'grasp_transpiler'
+    if not testcases_paths:
+        testcases_paths = sorted(glob.glob(f'{root_dir()}/test/*.test.grasp'))
+
+    testcases = {}
+    for testcase_path in testcases_paths:
+        try:
+            testcases[testcase_path] = testcase_records_to_check(testcase_path)
+        except Exception as e:
+            # neither backend can transpile it, nothing to compare
+            print(f"⚠️  {testcase_path}: failed to parse: {type(e).__name__}")
+    async with aiohttp.ClientSession(feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        await ensure_transpiler_pipeline_is_ready(session, pipeline_name)
+        tokens = set()
+        try:
+            await start_transaction(session, pipeline_name)
+            for (_pipeline_id, records) in testcases.values():
+                tokens |= await insert_records(session, pipeline_name, records)
+        finally:
+            await commit_transaction(session, pipeline_name)
+        await wait_till_input_tokens_processed(session, pipeline_name, tokens)
+
+        results = []
+        try:
+            for (testcase_path, (pipeline_id, records)) in testcases.items():
+                feldera_lines = await fetch_output_sql_lines(session, pipeline_name, pipeline_id)
+                local_lines = local_backend.transpile(records, pipeline_id)
+                results.append(compare_outputs(
+                    testcase_path, '\n'.join(feldera_lines) + '\n', '\n'.join(local_lines) + '\n'))
+        finally:
+            for (_pipeline_id, records) in testcases.values():
+                await insert_record_deltas(session, pipeline_name, {}, records)
+
+    if not all(results):
+        exit(1)
+
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+import sys
+import glob
+import collections
+
+import grasp.parser as parser
+import grasp.manifest as manifest
+from grasp.util import root_dir, testcase_key
+
+
+
+# --incremental and `grasp watch` send diff_records of AST records,
+# every testcase must diff against nothing and against itself.
+
+def table_counts(records):
+    return dict(
+        (table_name, collections.Counter(map(manifest.row_key, rows)))
+        for (table_name, rows) in records.items() if rows)
+
+def check_testcase(testcase_path):
+    key = testcase_key(testcase_path)
+    try:
+        records = parser.parse_file(testcase_path)
+    except Exception as e:
+        # parse errors are reported by check_parser_modes
+        print(f"⚠️  {key}: Failed to parse: {type(e).__name__}")
+        return True
+    try:
+        checks = [
+            ('insert all', manifest.diff_records({}, records), (records, {})),
+            ('delete all', manifest.diff_records(records, {}), ({}, records)),
+            ('no change', manifest.diff_records(records, records), ({}, {})),
+        ]
+    except Exception as e:
+        print(f"❌ {key}: Failed to diff records: {type(e).__name__}: {e}")
+        return False
+
+    at_least_one_failed = False
+    for (name, (inserts, deletes), (expected_inserts, expected_deletes)) in checks:
+        if table_counts(inserts) != table_counts(expected_inserts) or table_counts(deletes) != table_counts(expected_deletes):
+            print(f"❌ {key}: Wrong diff for {name}")
+            at_least_one_failed = True
+    if not at_least_one_failed:
+        print(f"✅ {key}")
+    return (not at_least_one_failed)
+
+def main(testcases_paths):
+    if not testcases_paths:
+        testcases_paths = sorted(glob.glob(f'{root_dir()}/test/*.test.grasp'))
+    results = [check_testcase(p) for p in testcases_paths]
+    if not all(results):
+        exit(1)
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,129 @@
+import os
+import sys
+import glob
+
+import json5
+
+import grasp.parser as parser
+from grasp.util import root_dir, testcase_schema_path
+
+
+
+def parse_with_mode(text, path, schema, mode):
+    try:
+        return parser.parse(text, path, schema, mode=mode)
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+
+# Whitespace corner cases. LALR must reject everything Earley rejects,
+# otherwise `auto` mode would accept programs Earley does not.
+REJECTED_SNIPPETS = {
+    'body_indented_with_spaces': 'foo(x:) <-\n    x := [\n1, 2\n]\n',
+    'body_tab_and_space': 'a(x:) <-\n\t b(x:)\n',
+    'body_two_tabs': 'a(x:) <-\n\t\tb(x:)\n',
+    'empty_body': 'a(x:) <-\nb(x: 1)\n',
+    'empty_body_blank_line': 'a(x:) <-\n\nb(x: 1)\n',
+    'comment_after_arrow': 'a(x:) <- # c\n\tb(x:)\n',
+    'comment_after_body_stmt': 'a(x:) <-\n\tb(x:) # c\n',
+    'head_and_arrow_on_two_lines': 'a(x:)\n<- b(x:)\n',
+    'no_space_after_kv_colon': 'a(x:1)\n',
+    'comment_after_kv_colon': 'a(x:# c\n 1)\n',
+    'space_before_fact_args': 'a (x: 1)\n',
+    'space_before_call_args': 'a(x:) <- x := f (1)\n',
+    'newline_after_call_paren': 'a(x:) <- x := f(\n1)\n',
+    'newline_before_call_paren': 'a(x:) <- x := f(1\n)\n',
+    'trailing_comma_in_call': 'a(x:) <- x := f(1, y: 2,)\n',
+    'space_before_aggregation_args': 'a(x:) <- x := max <y>\n',
+    'newline_around_binop': 'a(x:) <- b(x: (1\n\t= 2))\n',
+    'no_space_around_assign': 'a(x:) <- x:=1\n',
+    'space_in_cast': 'a(x:) <- x := y :: INT\n',
+    'space_after_maybe_null': 'a(x:) <- x := ? y\n',
+    'space_after_unnest_prefix': 'a(x:) <-\n\tb(arr:)\n\t(x) := * arr\n',
+    'comment_before_array_end': 'a(x: [1 # c\n])\n',
+    'comment_before_trailing_comma': 'a(x: [1 # c\n, ])\n',
+}
+
+# Accepted by Earley, LALR must accept them as well and give the same records
+ACCEPTED_SNIPPETS = {
+    'body_line_at_column_0_in_brackets': 'foo(x:) <-\n\tx := [\n1, 2\n]\n',
+    'body_comment_and_tab_lines': 'a(x:) <-\n\tb(x:)\n   # c\n\t  \n\tc(x:)\n',
+    'body_ends_at_blank_line_with_spaces': 'a(x:) <-\n\tb(x:)\n  \n\tc(x: 1)\n',
+    'body_of_comments_only': 'a(x:) <-\n# c\nb(x: 1)\n',
+    'indented_fact': 'a(x: 1)\n  b(x: 2)\n',
+    'newlines_in_brackets': 'a(x:\n1, y: (\n2), z: {\nw: [1,\n2\n],\n})\n',
+    'newline_between_call_args': 'a(x:) <- x := f(1,\n2)\n',
+    'newline_between_aggregation_args': 'a(x:) <- x := max<1,\n2>\n',
+    'comments_after_rules': 'a(x: 1) # c\nb(x:) <- a(x:) # c\n',
+    'crlf': 'a(x:) <-\r\n\tb(x:)\r\n',
+}
+
+def check_rejected(name, text):
+    accepted_by = [
+        mode for mode in ['earley', 'lalr', 'auto']
+        if not isinstance(parse_with_mode(text, name, None, mode), str)]
+    if accepted_by:
+        print(f"❌ {name}: must be rejected, accepted by {', '.join(accepted_by)}")
+        return False
+    print(f"✅ {name}")
+    return True
+
+def check_accepted(name, text):
+    if isinstance(parse_with_mode(text, name, None, 'earley'), str):
+        print(f"❌ {name}: must be accepted, rejected by earley")
+        return False
+    return check_text(name, text, None)
+
+def check_testcase(testcase_path):
+    schema_path = testcase_schema_path(testcase_path)
+    schema = None
+    if os.path.exists(schema_path):
+        schema = json5.loads(open(schema_path, 'r').read())
+    text = open(testcase_path, 'r').read()
+    return check_text(testcase_path, text, schema)
+
+def check_text(testcase_path, text, schema):
+    earley_records = parse_with_mode(text, testcase_path, schema, 'earley')
+    lalr_records = parse_with_mode(text, testcase_path, schema, 'lalr')
+
+    match (earley_records, lalr_records):
+        case (str(earley_error), str(lalr_error)):
+            # same input is rejected by both, nothing to compare
+            print(f"⚠️  {testcase_path}: both parsers failed")
+            return True
+        case (str(earley_error), _):
+            print(f"❌ {testcase_path}: only Earley failed: {earley_error}")
+            return False
+        case (_, str(lalr_error)):
+            print(f"❌ {testcase_path}: only LALR failed: {lalr_error}")
+            return False
+    if earley_records == lalr_records:
+        print(f"✅ {testcase_path}")
+        return True
+
+    for table_name in sorted(set(earley_records.keys()) | set(lalr_records.keys())):
+        earley_rows = earley_records.get(table_name, [])
+        lalr_rows = lalr_records.get(table_name, [])
+        if earley_rows != lalr_rows:
+            print(f"❌ {testcase_path}: {table_name} differs")
+            for earley_row, lalr_row in zip(earley_rows, lalr_rows):
+                if earley_row != lalr_row:
+                    print(f"  earley: {earley_row}")
+                    print(f"  lalr:   {lalr_row}")
+                    break
+            if len(earley_rows) != len(lalr_rows):
+                print(f"  earley has {len(earley_rows)} rows, lalr has {len(lalr_rows)}")
+    return False
+
+def main(testcases_paths):
+    if not testcases_paths:
+        testcases_paths = sorted(glob.glob(f'{root_dir()}/test/*.test.grasp'))
+    results = [check_testcase(p) for p in testcases_paths]
+    results += [check_accepted(name, text) for (name, text) in ACCEPTED_SNIPPETS.items()]
+    results += [check_rejected(name, text) for (name, text) in REJECTED_SNIPPETS.items()]
+    if not all(results):
+        exit(1)
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,52 +1,202 @@
 import os
-import sys
+import argparse
+import time
 import asyncio
+import collections
 import hashlib
 
 import json5
 import json
 import aiohttp
 
-from grasp.util import testcase_dest_path, recompile_pipeline, do_need_to_recompile_pipeline, wait_till_pipeline_compiled, ensure_pipeline_started, testcase_expected_records_path, adhoc_query, testcase_key, testcase_table_inputs_paths, insert_records, wait_till_input_tokens_processed, root_dir, read_transpiler_sql, read_transpiler_udf_rs
-
-
-
-def value_to_sql(v):
-    if isinstance(v, str):
-        return f"'{v}'"
-    else:
-        return str(v)
-
-def expected_record_check_sql(key, table_name, r):
-    return f'SELECT true AS passed FROM "{key}:{table_name}" WHERE {" AND ".join(f"\"{k}\" = {value_to_sql(v)}" for k, v in r.items())}'
+from grasp.util import testcase_dest_path, recompile_pipeline, do_need_to_recompile_pipeline, wait_till_pipeline_compiled, ensure_pipeline_started, testcase_expected_records_path, adhoc_query_columns, testcase_key, testcase_table_inputs_paths, ingest_files, wait_till_input_tokens_processed, root_dir, read_transpiler_sql, read_transpiler_udf_rs, fetch_pipeline_status, stop_and_clear_pipeline, insert_record_deltas, file_hash
+
+
+
+def normalize_value(expected, actual):
+    # VARIANT columns are returned as JSON text
+    if isinstance(expected, (dict, list)) and isinstance(actual, str):
+        try:
+            return json.loads(actual)
+        except ValueError:
+            return actual
+    # MAP columns decoded from Arrow are lists of (key, value) pairs
+    if isinstance(expected, dict) and isinstance(actual, list) and all(isinstance(kv, tuple) for kv in actual):
+        return dict(actual)
+    return actual
+
+def row_key(row):
+    return json.dumps(row, sort_keys=True)
+
+def compare_table_rows(expected_rows, actual_rows):
+    # Expected rows may list only some of the columns, an actual row matches
+    # an expected row when it has the same values in the columns the expected
+    # row lists. Output views are SELECT DISTINCT, so rows are compared as sets.
+    expected_by_columns = {}
+    for r in expected_rows:
+        columns = tuple(sorted(r.keys()))
+        (samples, keys) = expected_by_columns.setdefault(columns, ({}, set()))
+        samples.update(r)
+        keys.add(row_key(r))
+    all_samples = dict([(k, v) for r in expected_rows for (k, v) in r.items()])
+    all_columns = all_samples.keys() if expected_rows else set(k for r in actual_rows for k in r)
+    matched = set()
+    unexpected = set()
+    for r in actual_rows:
+        found = False
+        for (columns, (samples, keys)) in expected_by_columns.items():
+            key = row_key(dict([(k, normalize_value(samples[k], r.get(k))) for k in columns]))
+            if key in keys:
+                matched.add(key)
+                found = True
+        if not found:
+            unexpected.add(row_key(dict([(k, normalize_value(all_samples.get(k), r.get(k))) for k in all_columns])))
+    missing = [json.loads(k) for k in sorted(set(map(row_key, expected_rows)) - matched)]
+    return (missing, [json.loads(k) for k in sorted(unexpected)])
+
+async def fetch_table_rows(session, pipeline_name, key, table_name):
+    # a view is fetched as columns, as Arrow IPC when pyarrow is installed
+    sql = f'SELECT * FROM "{key}:{table_name}"'
+    columns = await adhoc_query_columns(session, pipeline_name, sql)
+    return [dict(zip(columns.keys(), values)) for values in zip(*columns.values())]
 
 async def check_testcase_results(session, pipeline_name, testcase_path):
     records_path = testcase_expected_records_path(testcase_path)
     expected_records = json5.loads(open(records_path, 'r').read())
     key = testcase_key(testcase_path)
+    # every output view is fetched once, all of them at the same time
+    table_names = list(expected_records.keys())
+    tables_rows = await asyncio.gather(*[
+        fetch_table_rows(session, pipeline_name, key, table_name) for table_name in table_names])
     at_least_one_failed = False
-    for table_name, records in expected_records.items():
-        for r in records:
-            sql = expected_record_check_sql(key, table_name, r)
-            resp = await adhoc_query(session, pipeline_name, sql)
-            print(f"Checking record: {table_name}({r}), response: {resp}")
-            if not resp: # resp.get('passed', False):
-                print(f"❌ Missing record: {table_name}({r})")
-                at_least_one_failed = True
+    for (table_name, actual_rows) in zip(table_names, tables_rows):
+        (missing, unexpected) = compare_table_rows(expected_records[table_name], actual_rows)
+        for r in missing:
+            print(f"❌ {key}: Missing record: {table_name}({r})")
+        for r in unexpected:
+            print(f"❌ {key}: Unexpected record: {table_name}({r})")
+        at_least_one_failed = at_least_one_failed or bool(missing or unexpected)
     return (not at_least_one_failed)
 
-async def insert_testcases_input_data(session, pipeline_name, testcases_paths):
-    records_to_insert = {}
+# Testcases are split into shards, every shard is a pipeline of its own, so an edit
+# recompiles only the shard of the edited testcase, and shards compile and run
+# at the same time. A testcase is assigned to a shard by the hash of its key, so
+# adding or removing testcases does not move the others. Inputs applied to a
+# running shard are kept in its state file, next time only the difference is sent.
+DEFAULT_N_SHARDS = int(os.environ.get('GRASP_TEST_SHARDS', 4))
+
+def testcase_shard(testcase_path, n_shards):
+    digest = hashlib.sha256(testcase_key(testcase_path).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % n_shards
+
+def shard_state_path(cache_dir, pipeline_name):
+    return f'{cache_dir}/{pipeline_name}.inputs.json'
+
+def read_shard_state(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def write_shard_state(path, state):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def testcases_inputs(testcases_paths):
+    # {"key:table": {'hash': ..., 'path': ...}}
+    inputs = {}
     for testcase_path in testcases_paths:
         key = testcase_key(testcase_path)
         for table_name, input_path in testcase_table_inputs_paths(testcase_path).items():
-            records_to_insert[f"{key}:{table_name}"] = []
-            with open(input_path, 'r') as f:
-                for line in f:
-                    records_to_insert[f"{key}:{table_name}"].append(json.loads(line))
-    return await insert_records(session, pipeline_name, records_to_insert)
+            inputs[f"{key}:{table_name}"] = {'hash': file_hash(input_path), 'path': input_path}
+    return inputs
 
-async def main(testcases_paths):
+def read_input_rows(input_path):
+    with open(input_path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def diff_input_rows(prev_rows, rows):
+    prev = collections.Counter(map(row_key, prev_rows))
+    curr = collections.Counter(map(row_key, rows))
+    inserts = [json.loads(k) for k in (curr - prev).elements()]
+    deletes = [json.loads(k) for k in (prev - curr).elements()]
+    return (inserts, deletes)
+
+async def insert_testcases_input_data(session, pipeline_name, testcases_paths):
+    table_paths = []
+    for testcase_path in testcases_paths:
+        key = testcase_key(testcase_path)
+        for table_name, input_path in testcase_table_inputs_paths(testcase_path).items():
+            table_paths.append((f"{key}:{table_name}", input_path))
+    (tokens, _stats) = await ingest_files(session, pipeline_name, table_paths)
+    return tokens
+
+async def apply_input_deltas(session, pipeline_name, prev_inputs, inputs):
+    # only tables whose input files changed are read and diffed
+    (inserts, deletes) = ({}, {})
+    for table_name in set(prev_inputs) | set(inputs):
+        prev = prev_inputs.get(table_name)
+        curr = inputs.get(table_name)
+        if prev and curr and prev['hash'] == curr['hash']:
+            continue
+        (table_inserts, table_deletes) = diff_input_rows(
+            prev['rows'] if prev else [], read_input_rows(curr['path']) if curr else [])
+        if table_inserts:
+            inserts[table_name] = table_inserts
+        if table_deletes:
+            deletes[table_name] = table_deletes
+    n_changes = sum(map(len, inserts.values())) + sum(map(len, deletes.values()))
+    if not n_changes:
+        return ([], 0)
+    return (await insert_record_deltas(session, pipeline_name, inserts, deletes), n_changes)
+
+async def run_shard(session, pipeline_name, testcases_paths, testsuite_sql, udf_rs, cache_dir):
+    # (passed, report line)
+    t0 = time.perf_counter()
+    program_hash = hashlib.sha256((testsuite_sql + udf_rs).encode('utf-8')).hexdigest()
+    state_path = shard_state_path(cache_dir, pipeline_name)
+    state = read_shard_state(state_path)
+    recompiled = await do_need_to_recompile_pipeline(session, pipeline_name, testsuite_sql, udf_rs)
+    if recompiled:
+        await recompile_pipeline(session, pipeline_name, testsuite_sql, udf_rs)
+    await wait_till_pipeline_compiled(session, pipeline_name)
+    t1 = time.perf_counter()
+
+    status = await fetch_pipeline_status(session, pipeline_name)
+    inputs = testcases_inputs(testcases_paths)
+    can_apply_deltas = (
+        not recompiled and status['deployment_status'] == 'Running'
+        and state is not None and state['program_hash'] == program_hash)
+    # if applying fails half way, the next run starts from scratch
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    if can_apply_deltas:
+        (tokens, n_changes) = await apply_input_deltas(session, pipeline_name, state['inputs'], inputs)
+        inputs_line = f'{n_changes} input changes'
+    else:
+        # what is in the tables of a stopped or unknown shard is not known, so it is cleared
+        if not recompiled:
+            await stop_and_clear_pipeline(session, pipeline_name)
+        await ensure_pipeline_started(session, pipeline_name)
+        tokens = await insert_testcases_input_data(session, pipeline_name, testcases_paths)
+        inputs_line = 'all inputs'
+    await wait_till_input_tokens_processed(session, pipeline_name, tokens)
+    for table_input in inputs.values():
+        table_input['rows'] = read_input_rows(table_input['path'])
+    write_shard_state(state_path, {'program_hash': program_hash, 'inputs': inputs})
+
+    results = await asyncio.gather(*[
+        check_testcase_results(session, pipeline_name, testcase_path)
+        for testcase_path in testcases_paths])
+    t2 = time.perf_counter()
+    compile_line = f'compiled in {t1-t0:.1f}s' if recompiled else 'up to date'
+    return (all(results), f"{pipeline_name}: {len(testcases_paths)} testcases, {compile_line}, "
+                          f"{inputs_line}, run in {t2-t1:.1f}s, {sum(results)}/{len(results)} passed")
+
+async def main(testcases_paths, n_shards):
     feldera_url = 'http://localhost:8080'
     pipeline_name = 'grasp_testsuite'
     # curr_dir = os.path.abspath(os.path.dirname(__file__))
@@ -56,40 +206,48 @@ async def main(testcases_paths):
     udf_rs = read_transpiler_udf_rs()
     transpiler_hash = hashlib.sha256((transpiler_sql + udf_rs).encode('utf-8')).hexdigest()[:10]
 
-    # prefer deterministic order
-    testcases_paths.sort()
-
-    testsuite_sql = ''
     udf_rs_path = f'{root_dir()}/transpiler/udf.rs'
     udf_sql_preface_path = f'{root_dir()}/transpiler/001_udf.sql'
-    testsuite_sql += open(udf_sql_preface_path, 'r').read()
+    udf_sql_preface = open(udf_sql_preface_path, 'r').read()
+    udf_rs = open(udf_rs_path, 'r').read()
 
-    for testcase_path in testcases_paths:
-        dest_path = testcase_dest_path(testcase_path, cache_dir, transpiler_hash)
-        if not os.path.exists(dest_path):
-            raise Exception(f"{dest_path} does not exist")
-        
-        with open(dest_path, 'r') as f:
-            testsuite_sql += f.read()
+    # prefer deterministic order
+    shards = {}
+    for testcase_path in sorted(testcases_paths):
+        shards.setdefault(testcase_shard(testcase_path, n_shards), []).append(testcase_path)
+
+    shards_sql = {}
+    for (shard, shard_testcases_paths) in shards.items():
+        testsuite_sql = udf_sql_preface
+        for testcase_path in shard_testcases_paths:
+            dest_path = testcase_dest_path(testcase_path, cache_dir, transpiler_hash)
+            if not os.path.exists(dest_path):
+                raise Exception(f"{dest_path} does not exist")
+
+            with open(dest_path, 'r') as f:
+                testsuite_sql += f.read()
+        shards_sql[shard] = testsuite_sql
 
     async with aiohttp.ClientSession(feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
-        udf_rs = open(udf_rs_path, 'r').read()
-        if (await do_need_to_recompile_pipeline(session, pipeline_name, testsuite_sql, udf_rs)):
-            await recompile_pipeline(session, pipeline_name, testsuite_sql, udf_rs)
-        await wait_till_pipeline_compiled(session, pipeline_name)
-        await ensure_pipeline_started(session, pipeline_name)
-        tokens = await insert_testcases_input_data(session, pipeline_name, testcases_paths)
-        await wait_till_input_tokens_processed(session, pipeline_name, tokens)
-        # await asyncio.sleep(5)
-
-        at_least_one_failed = False
-        for testcase_path in testcases_paths:
-            at_least_one_failed = at_least_one_failed or not (await check_testcase_results(session, pipeline_name, testcase_path))
-
-        if not at_least_one_failed:
+        t0 = time.perf_counter()
+        shards_results = await asyncio.gather(*[
+            run_shard(session, f'{pipeline_name}_{shard}', shards[shard], shards_sql[shard], udf_rs, cache_dir)
+            for shard in sorted(shards)])
+        for (_passed, line) in shards_results:
+            print(line)
+        print(f"Verified {len(testcases_paths)} testcases in {len(shards)} shards in {time.perf_counter() - t0:.1f}s")
+
+        if all(passed for (passed, _line) in shards_results):
             print("✅ All tests passed!")
+        else:
+            exit(1)
+
 
 
+arg_parser = argparse.ArgumentParser(description='Compile testcases into Feldera pipelines and run them')
+arg_parser.add_argument('--shards', type=int, default=DEFAULT_N_SHARDS, help='Number of pipelines to split testcases into')
+arg_parser.add_argument('testcases_paths', nargs='+')
 
 if __name__ == '__main__':
-    asyncio.run(main(sys.argv[1:]), debug=True)
\ No newline at end of file
+    args = arg_parser.parse_args()
+    asyncio.run(main(args.testcases_paths, args.shards), debug=True)
\ No newline at end of file
@@ -7,25 +7,29 @@ import aiohttp
 import json5
 
 import grasp.parser as parser
-from grasp.util import testcase_key, insert_records, file_hash, need_to_transpile_testcase, adhoc_query, testcase_dest_path, testcase_schema_path, wait_till_input_tokens_processed, start_transaction, commit_transaction, root_dir, read_transpiler_sql, read_transpiler_udf_rs
+from grasp.util import testcase_key, insert_records_from_iter, file_hash, need_to_transpile_testcase, adhoc_query, iter_adhoc_query, testcase_dest_path, testcase_schema_path, wait_till_input_tokens_processed, start_transaction, commit_transaction, root_dir, read_transpiler_sql, read_transpiler_udf_rs
 
 
 
 async def fetch_output_sql_lines(session, pipeline_name, pipeline_id):
     sql = f"SELECT sql_lines FROM full_pipeline_sql WHERE pipeline_id = '{pipeline_id}'"
-    result = await adhoc_query(session, pipeline_name, sql)
-    assert result
-    return result['sql_lines']
+    rows = [row async for row in iter_adhoc_query(session, pipeline_name, sql)]
+    assert rows
+    return rows[0]['sql_lines']
+
+def testcase_schema(testcase_path):
+    schema_path = testcase_schema_path(testcase_path)
+    if os.path.exists(schema_path):
+        return json5.loads(open(schema_path, 'r').read())
+    return None
 
-async def enqueue_transpilation(testcase_path, pipeline_name, session):
+def testcase_pipeline_id(testcase_path):
     schema_path = testcase_schema_path(testcase_path)
-    schema = None
     if os.path.exists(schema_path):
-        schema = json5.loads(open(schema_path, 'r').read())
-    records0 = parser.parse(open(testcase_path, 'r').read(), testcase_path, schema)
-    pipeline_id = f'{testcase_key(testcase_path)}:{file_hash(testcase_path)}'
-    if schema:
-        pipeline_id = f'{testcase_key(testcase_path)}:{file_hash(testcase_path)}-{file_hash(schema_path)}'
+        return f'{testcase_key(testcase_path)}:{file_hash(testcase_path)}-{file_hash(schema_path)}'
+    return f'{testcase_key(testcase_path)}:{file_hash(testcase_path)}'
+
+def testcase_records(testcase_path, pipeline_id, records0):
     records = {
         'table_name_prefix': [{
             # all tables in every testcase are prefixed with the testcase name.
@@ -37,8 +41,15 @@ async def enqueue_transpilation(testcase_path, pipeline_name, session):
     }
     for table_name, rows in records0.items():
         records[table_name] = [{**r, 'pipeline_id': pipeline_id} for r in rows]
-    tokens = await insert_records(session, pipeline_name, records)
-    return (pipeline_id, tokens)
+    return records
+
+def iter_testcases_records(testcases_paths, pipeline_ids):
+    # testcases are parsed in parallel, and uploaded as soon as they are parsed
+    schemas = dict([(p, testcase_schema(p)) for p in testcases_paths])
+    for (testcase_path, records0) in parser.parse_files_in_parallel(testcases_paths, schemas):
+        pipeline_id = testcase_pipeline_id(testcase_path)
+        pipeline_ids[testcase_path] = pipeline_id
+        yield testcase_records(testcase_path, pipeline_id, records0)
 
 async def report_errors_if_any(session, pipeline_name, pipeline_id, testcase_path):
     sql = f"SELECT error_type FROM \"error\" WHERE pipeline_id = '{pipeline_id}'"
@@ -70,24 +81,21 @@ async def main(testcases_paths):
         os.makedirs(cache_dir)
 
     pipeline_ids = {}
-    queued_tokens = {}
     with_errors = {}
     async with aiohttp.ClientSession(feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        testcases_to_transpile = [
+            p for p in testcases_paths
+            if need_to_transpile_testcase(p, cache_dir, transpiler_hash)]
         try:
             await start_transaction(session, pipeline_name)
-            for testcase_path in testcases_paths:
-                if need_to_transpile_testcase(testcase_path, cache_dir, transpiler_hash):
-                    # insert all inputs at once, so it would transpile in parallel
-                    (pipeline_id, tokens) = await enqueue_transpilation(
-                        testcase_path, pipeline_name, session)
-                    queued_tokens[testcase_path] = tokens
-                    pipeline_ids[testcase_path] = pipeline_id
+            # insert all inputs at once, so it would transpile in parallel
+            all_tokens = await insert_records_from_iter(
+                session, pipeline_name, iter_testcases_records(testcases_to_transpile, pipeline_ids))
         finally:
             await commit_transaction(session, pipeline_name)
 
         # print(f"Queued: {queued}")
 
-        all_tokens = set().union(*queued_tokens.values())
         await wait_till_input_tokens_processed(session, pipeline_name, all_tokens)
 
         paths_without_errors = (set(testcases_paths) - set(with_errors.keys())) & set(pipeline_ids.keys())
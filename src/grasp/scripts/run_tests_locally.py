@@ -0,0 +1,68 @@
+import sys
+import glob
+import json
+import time
+
+import json5
+
+import grasp.parser as parser
+import grasp.local_backend as local_backend
+from grasp.util import root_dir, testcase_key, testcase_expected_records_path, testcase_table_inputs_paths
+from grasp.scripts.ensure_tests_transpiled import testcase_schema, testcase_pipeline_id, testcase_records
+from grasp.scripts.compile_and_run_tests import compare_table_rows
+
+
+
+# Same as `make test`, but testcases are transpiled and run in process,
+# without compiling and running a Feldera pipeline.
+
+def read_jsonl(path):
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def run_testcase(testcase_path):
+    key = testcase_key(testcase_path)
+    pipeline_id = testcase_pipeline_id(testcase_path)
+    try:
+        records0 = parser.parse_file(testcase_path, testcase_schema(testcase_path))
+        sql_lines = local_backend.transpile(testcase_records(testcase_path, pipeline_id, records0), pipeline_id)
+    except Exception as e:
+        print(f"❌ {key}: Failed to transpile: {type(e).__name__}: {e}")
+        return False
+
+    inputs = dict(
+        (f'{key}:{table_name}', read_jsonl(input_path))
+        for (table_name, input_path) in testcase_table_inputs_paths(testcase_path).items())
+    expected_records = json5.loads(open(testcase_expected_records_path(testcase_path), 'r').read())
+    outputs = local_backend.run_sql(
+        '\n'.join(sql_lines), inputs, [f'{key}:{table_name}' for table_name in expected_records])
+
+    at_least_one_failed = False
+    for (table_name, expected_rows) in expected_records.items():
+        (missing, unexpected) = compare_table_rows(expected_rows, outputs[f'{key}:{table_name}'])
+        for r in missing:
+            print(f"❌ {key}: Missing record: {table_name}({r})")
+        for r in unexpected:
+            print(f"❌ {key}: Unexpected record: {table_name}({r})")
+        at_least_one_failed = at_least_one_failed or bool(missing or unexpected)
+    return (not at_least_one_failed)
+
+def main(testcases_paths):
+    if not testcases_paths:
+        testcases_paths = glob.glob(f'{root_dir()}/test/*.test.grasp')
+    # prefer deterministic order
+    testcases_paths.sort()
+
+    t0 = time.perf_counter()
+    results = [run_testcase(p) for p in testcases_paths]
+    print(f"Ran {len(testcases_paths)} testcases in {(time.perf_counter() - t0)*1000:.0f}ms")
+
+    if all(results):
+        print("✅ All tests passed!")
+    else:
+        exit(1)
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,217 @@
+import sys
+import signal
+import time
+import asyncio
+import itertools
+
+import json5
+import aiohttp
+from aiohttp import web
+
+import grasp.parser as parser
+from grasp.scripts.ensure_transpiler_ready import ensure_transpiler_pipeline_is_ready
+from grasp.util import start_transaction, commit_transaction, insert_record_deltas, wait_till_input_tokens_processed, iter_adhoc_query, sql_str
+
+
+
+# Long-running transpile service. start_transaction/commit_transaction are
+# global for the transpiler pipeline, so concurrent CLIs would interfere.
+# Here requests arriving within a short window are sent in one transaction,
+# every request with its own pipeline_id, and results are fanned back out.
+#
+# POST /transpile {"files": {"path.grasp": "source", "path.schema.json5": "schema"}}
+#   -> {"pipeline_id": ..., "sql_lines": [...]}, or {"error": ...}
+# GET /stats -> batch size and latency histograms
+
+# records of a batch are retracted in the transaction of the next batch,
+# or on their own, if no requests come for this long
+RETRACT_IDLE_SECONDS = 1.0
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+LATENCY_MS_BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+def new_histogram(buckets):
+    return {'buckets': buckets, 'counts': [0] * (len(buckets) + 1), 'count': 0, 'sum': 0.0, 'max': 0.0}
+
+def observe(histogram, value):
+    # counts[i] is the number of values <= buckets[i], the last one is for the rest
+    i = next((i for (i, b) in enumerate(histogram['buckets']) if value <= b), len(histogram['buckets']))
+    histogram['counts'][i] += 1
+    histogram['count'] += 1
+    histogram['sum'] += value
+    histogram['max'] = max(histogram['max'], value)
+
+def format_histogram(name, histogram):
+    if not histogram['count']:
+        return f'{name}: none'
+    bars = ' '.join(
+        f'<={b}:{c}' for (b, c) in zip([*histogram['buckets'], 'inf'], histogram['counts']) if c)
+    return f'{name}: count {histogram["count"]}, avg {histogram["sum"]/histogram["count"]:.1f}, max {histogram["max"]:.1f}, {bars}'
+
+def request_records(files, pipeline_id, mode):
+    sink = parser.RecordSink()
+    for (path, content) in files.items():
+        if path.endswith('.grasp'):
+            records0 = parser.parse(content, path, mode=mode)
+        elif path.endswith('.schema.json5'):
+            records0 = parser.records_from_schema(json5.loads(content))
+        else:
+            raise Exception(f"Unexpected input, neither *.grasp nor *.schema.json5: {path}")
+        sink.add_records(dict(
+            (table_name, [{**r, 'pipeline_id': pipeline_id} for r in rows])
+            for (table_name, rows) in records0.items()))
+    return sink.records
+
+class TranspileService:
+    def __init__(self, session, pipeline_name, parser_mode, batch_window, max_batch):
+        self.session = session
+        self.pipeline_name = pipeline_name
+        self.parser_mode = parser_mode
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        # (pipeline_id, records, future, queued_at)
+        self.queue = asyncio.Queue()
+        # records of served requests, not retracted yet
+        self.retired = {}
+        self.ids = itertools.count()
+        self.stats = {
+            'batch_size': new_histogram(BATCH_SIZE_BUCKETS),
+            'batch_latency_ms': new_histogram(LATENCY_MS_BUCKETS),
+            'request_latency_ms': new_histogram(LATENCY_MS_BUCKETS),
+            'queue_wait_ms': new_histogram(LATENCY_MS_BUCKETS),
+            'failed_requests': 0,
+        }
+
+    async def transpile(self, files):
+        received_at = time.perf_counter()
+        pipeline_id = f'serve:{time.time()}:{next(self.ids)}'
+        # parse errors fail only this request, before it joins a batch
+        records = await asyncio.to_thread(request_records, files, pipeline_id, self.parser_mode)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((pipeline_id, records, future, time.perf_counter()))
+        sql_lines = await future
+        observe(self.stats['request_latency_ms'], (time.perf_counter() - received_at) * 1000)
+        return (pipeline_id, sql_lines)
+
+    async def retract_retired(self):
+        # retracted at most once: if it fails, `grasp gc` removes the rest
+        (retired, self.retired) = (self.retired, {})
+        if retired:
+            await insert_record_deltas(self.session, self.pipeline_name, {}, retired)
+
+    async def next_batch(self):
+        while self.retired:
+            try:
+                batch = [await asyncio.wait_for(self.queue.get(), RETRACT_IDLE_SECONDS)]
+                break
+            except asyncio.TimeoutError:
+                await self.retract_retired()
+        else:
+            batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_window
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # the rest of queued requests go in, they have waited already
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run_batch(self, batch):
+        t0 = time.perf_counter()
+        for (_pipeline_id, _records, _future, queued_at) in batch:
+            observe(self.stats['queue_wait_ms'], (t0 - queued_at) * 1000)
+        sink = parser.RecordSink()
+        for (_pipeline_id, records, _future, _queued_at) in batch:
+            sink.add_records(records)
+        (retired, self.retired) = (self.retired, {})
+        try:
+            await start_transaction(self.session, self.pipeline_name)
+            tokens = await insert_record_deltas(self.session, self.pipeline_name, sink.records, retired)
+        finally:
+            await commit_transaction(self.session, self.pipeline_name)
+        await wait_till_input_tokens_processed(self.session, self.pipeline_name, tokens)
+
+        pipeline_ids = ', '.join(sql_str(pipeline_id) for (pipeline_id, _, _, _) in batch)
+        sql = f'SELECT pipeline_id, sql_lines FROM full_pipeline_sql WHERE pipeline_id IN ({pipeline_ids})'
+        results = {}
+        async for row in iter_adhoc_query(self.session, self.pipeline_name, sql):
+            results.setdefault(row['pipeline_id'], []).append(row['sql_lines'])
+        for (pipeline_id, _records, future, _queued_at) in batch:
+            if future.done():
+                # the client has gone
+                continue
+            match results.get(pipeline_id):
+                case [sql_lines]:
+                    future.set_result(sql_lines)
+                case rows:
+                    future.set_exception(Exception(f"Unexpected response {rows}"))
+        self.retired = sink.records
+        observe(self.stats['batch_size'], len(batch))
+        observe(self.stats['batch_latency_ms'], (time.perf_counter() - t0) * 1000)
+
+    async def run_batches(self):
+        while True:
+            batch = await self.next_batch()
+            try:
+                await self.run_batch(batch)
+            except Exception as e:
+                print(f"Batch of {len(batch)} failed: {type(e).__name__}: {e}", file=sys.stderr)
+                for (_pipeline_id, _records, future, _queued_at) in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def handle_transpile(self, request):
+        try:
+            match await request.json():
+                case {'files': dict(files)} if files:
+                    pass
+                case _:
+                    return web.json_response({'error': 'Expected {"files": {path: content}}'}, status=400)
+        except ValueError as e:
+            return web.json_response({'error': f'Invalid JSON: {e}'}, status=400)
+        try:
+            (pipeline_id, sql_lines) = await self.transpile(files)
+        except Exception as e:
+            self.stats['failed_requests'] += 1
+            return web.json_response({'error': f'{type(e).__name__}: {e}'}, status=422)
+        return web.json_response({'pipeline_id': pipeline_id, 'sql_lines': sql_lines})
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats)
+
+    def format_stats(self):
+        return '\n'.join([
+            *(format_histogram(name, h) for (name, h) in self.stats.items() if isinstance(h, dict)),
+            f'failed_requests: {self.stats["failed_requests"]}'])
+
+async def serve(feldera_url, pipeline_name, host, port, parser_mode, batch_window, max_batch):
+    async with aiohttp.ClientSession(feldera_url, timeout=aiohttp.ClientTimeout(sock_read=0,total=0)) as session:
+        await ensure_transpiler_pipeline_is_ready(session, pipeline_name)
+        # build the parser before the first request
+        parser.get_parser('earley' if parser_mode == 'earley' else 'lalr')
+        service = TranspileService(session, pipeline_name, parser_mode, batch_window, max_batch)
+        app = web.Application(client_max_size=64 * 2**20)
+        app.add_routes([
+            web.post('/transpile', service.handle_transpile),
+            web.get('/stats', service.handle_stats),
+        ])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        batches = asyncio.create_task(service.run_batches())
+        # stop the same way on Ctrl-C and on kill, stats are printed either way
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, batches.cancel)
+        try:
+            await web.TCPSite(runner, host, port).start()
+            print(f"Serving on http://{host}:{port}", file=sys.stderr)
+            await batches
+        finally:
+            batches.cancel()
+            await runner.cleanup()
+            await service.retract_retired()
+            print(service.format_stats(), file=sys.stderr)
@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import contextlib
+
+
+
+# Spans and counters in Chrome trace format, open the file in chrome://tracing
+# or ui.perfetto.dev. Nothing is collected until start() is called.
+
+events = None
+t0 = 0.0
+# (thread, asyncio task) -> tid, spans of concurrent tasks must not overlap in one lane
+lanes = {}
+
+def start():
+    global events, t0
+    events = []
+    t0 = time.perf_counter()
+    lanes.clear()
+
+def now_us():
+    return (time.perf_counter() - t0) * 1e6
+
+def lane():
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    key = (threading.get_ident(), id(task) if task else None)
+    return lanes.setdefault(key, len(lanes) + 1)
+
+@contextlib.contextmanager
+def span(name, **args):
+    # yields args, so values known only at the end, like row counts, can be added
+    if events is None:
+        yield args
+        return
+    (ts, tid) = (now_us(), lane())
+    try:
+        yield args
+    except BaseException as e:
+        args['error'] = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        events.append({
+            'name': name, 'ph': 'X', 'ts': ts, 'dur': now_us() - ts,
+            'pid': os.getpid(), 'tid': tid, 'args': args})
+
+def counter(name, **values):
+    if events is not None:
+        events.append({'name': name, 'ph': 'C', 'ts': now_us(), 'pid': os.getpid(), 'args': values})
+
+def write(path):
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events or [], 'displayTimeUnit': 'ms'}, f)
+
+@contextlib.contextmanager
+def recording(path):
+    # the trace is written even if the command fails
+    if not path:
+        yield
+        return
+    start()
+    try:
+        with span('grasp', argv=sys.argv[1:]):
+            yield
+    finally:
+        write(path)
+        print(f"Trace with {len(events)} events written to {path}", file=sys.stderr)
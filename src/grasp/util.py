@@ -1,8 +1,24 @@
+import io
 import os
+import re
+import csv
 import sys
 import glob
+import json
 import hashlib
+import functools
+import time
 import asyncio
+import threading
+
+import grasp.trace as trace
+
+try:
+    # optional, only for columnar query results
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
 
 
 
@@ -10,6 +26,48 @@ def root_dir():
     curr_dir = os.path.abspath(os.path.dirname(__file__))
     return f'{curr_dir}/../..'
 
+
+
+DEFAULT_WAIT_DEADLINE = float(os.environ.get('GRASP_WAIT_DEADLINE', 600))
+# compilation of the transpiler pipeline runs rustc, it takes minutes
+COMPILATION_WAIT_DEADLINE = float(os.environ.get('GRASP_COMPILATION_WAIT_DEADLINE', 3600))
+
+# name -> {'count':, 'total':, 'max':, 'polls':}, latencies in seconds
+wait_metrics = {}
+
+async def wait_until(name, poll, deadline=DEFAULT_WAIT_DEADLINE, min_delay=0.005, max_delay=1.0):
+    # Calls poll() until it returns something other than None. Delay between
+    # polls grows exponentially, so quick operations are noticed in
+    # milliseconds, and slow ones do not flood Feldera with requests.
+    t0 = time.perf_counter()
+    delay = min_delay
+    n_polls = 0
+    with trace.span(f'wait:{name}') as span_args:
+        while True:
+            result = await poll()
+            n_polls += 1
+            span_args['polls'] = n_polls
+            elapsed = time.perf_counter() - t0
+            if result is not None:
+                metrics = wait_metrics.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'polls': 0})
+                metrics['count'] += 1
+                metrics['total'] += elapsed
+                metrics['max'] = max(metrics['max'], elapsed)
+                metrics['polls'] += n_polls
+                return result
+            if elapsed + delay > deadline:
+                raise Exception(f"Timed out waiting for {name} after {elapsed:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+def format_wait_metrics():
+    lines = [f'{"wait":<28} {"count":>6} {"total":>10} {"avg":>10} {"max":>10} {"polls":>6}']
+    for name, m in sorted(wait_metrics.items()):
+        lines.append(
+            f'{name:<28} {m["count"]:>6} {m["total"]*1000:8.1f}ms {m["total"]/m["count"]*1000:8.1f}ms '
+            f'{m["max"]*1000:8.1f}ms {m["polls"]:>6}')
+    return '\n'.join(lines)
+
 async def fetch_pipeline_status(session, pipeline_name):
     url = f'/v0/pipelines/{pipeline_name}'
     async with session.get(url, params={'selector': 'status'}) as resp:
@@ -33,32 +91,34 @@ async def do_need_to_recompile_pipeline(session, pipeline_name, curr_transpiler_
                     return True
     return False
 
-async def recompile_pipeline(session, pipeline_name, pipeline_sql, udf_rs):
+async def stop_and_clear_pipeline(session, pipeline_name):
     status = await fetch_pipeline_status(session, pipeline_name)
-    has_prev_version = not (status.get('error_code', None) == 'UnknownPipelineName')
-    if has_prev_version:
-        if status['deployment_status'] == 'Running':
-            async with session.post(f'/v0/pipelines/{pipeline_name}/stop', params={'force': 'true'}) as resp:
-                if resp.status not in [200, 202]:
-                    body = await resp.text()
-                    raise Exception(f"Unexpected response {resp.status}: {body}")
-
-        while True:
-            status = await fetch_pipeline_status(session, pipeline_name)
-            if status['deployment_status'] == 'Stopped':
-                break
-            await asyncio.sleep(1)
-        
-        async with session.post(f'/v0/pipelines/{pipeline_name}/clear') as resp:
+    if status['deployment_status'] == 'Running':
+        async with session.post(f'/v0/pipelines/{pipeline_name}/stop', params={'force': 'true'}) as resp:
             if resp.status not in [200, 202]:
                 body = await resp.text()
                 raise Exception(f"Unexpected response {resp.status}: {body}")
 
-        while True:
-            status = await fetch_pipeline_status(session, pipeline_name)
-            if status['storage_status'] == 'Cleared':
-                break
-            await asyncio.sleep(1)
+    async def is_stopped():
+        status = await fetch_pipeline_status(session, pipeline_name)
+        return True if status['deployment_status'] == 'Stopped' else None
+    await wait_until('pipeline_stopped', is_stopped)
+
+    async with session.post(f'/v0/pipelines/{pipeline_name}/clear') as resp:
+        if resp.status not in [200, 202]:
+            body = await resp.text()
+            raise Exception(f"Unexpected response {resp.status}: {body}")
+
+    async def is_cleared():
+        status = await fetch_pipeline_status(session, pipeline_name)
+        return True if status['storage_status'] == 'Cleared' else None
+    await wait_until('pipeline_cleared', is_cleared)
+
+async def recompile_pipeline(session, pipeline_name, pipeline_sql, udf_rs):
+    status = await fetch_pipeline_status(session, pipeline_name)
+    has_prev_version = not (status.get('error_code', None) == 'UnknownPipelineName')
+    if has_prev_version:
+        await stop_and_clear_pipeline(session, pipeline_name)
 
     url = f'/v0/pipelines/{pipeline_name}'
     data = {
@@ -72,21 +132,21 @@ async def recompile_pipeline(session, pipeline_name, pipeline_sql, udf_rs):
             raise Exception(f"Unexpected response {resp.status}: {body}")
 
 async def wait_till_pipeline_compiled(session, pipeline_name):
-    while True:
+    async def is_compiled():
         status = await fetch_pipeline_status(session, pipeline_name)
         # print(f"Status: {status}")
         match status['program_status']:
             case 'Success':
-                break
+                return True
             case 'Pending' | 'CompilingSql' | 'SqlCompiled' | 'CompilingRust':
-                pass
+                return None
             case 'SqlError' | 'RustError' | 'SystemError':
                 data = await fetch_pipeline_state(session, pipeline_name)
                 print(data['program_error'])
                 raise Exception("Pipeline failed to compile")
             case program_status:
                 raise Exception(f"Unknown transpiler status: {program_status}")
-        await asyncio.sleep(1)
+    await wait_until('pipeline_compiled', is_compiled, deadline=COMPILATION_WAIT_DEADLINE)
 
 async def ensure_pipeline_started(session, pipeline_name):
     url = f'/v0/pipelines/{pipeline_name}/start'
@@ -94,18 +154,18 @@ async def ensure_pipeline_started(session, pipeline_name):
         if resp.status not in [200, 201, 202]:
             body = await resp.text()
             raise Exception(f"Unexpected response {resp.status}: {body}")
-    while True:
+    async def is_running():
         status = await fetch_pipeline_status(session, pipeline_name)
-        if status['deployment_status'] == 'Running':
-            break
-        await asyncio.sleep(1)
+        return True if status['deployment_status'] == 'Running' else None
+    await wait_until('pipeline_started', is_running)
 
 async def start_transaction(session, pipeline_name):
     url = f'/v0/pipelines/{pipeline_name}/start_transaction'
-    async with session.post(url) as resp:
-        if resp.status not in [200, 201]:
-            body = await resp.text()
-            raise Exception(f"Unexpected response {resp.status}: {body}")
+    with trace.span('start_transaction'):
+        async with session.post(url) as resp:
+            if resp.status not in [200, 201]:
+                body = await resp.text()
+                raise Exception(f"Unexpected response {resp.status}: {body}")
 
 async def fetch_pipeline_stats(session, pipeline_name):
     url = f'/v0/pipelines/{pipeline_name}/stats'
@@ -114,61 +174,252 @@ async def fetch_pipeline_stats(session, pipeline_name):
 
 async def commit_transaction(session, pipeline_name):
     url = f'/v0/pipelines/{pipeline_name}/commit_transaction'
-    async with session.post(url) as resp:
-        if resp.status not in [200, 201]:
-            body = await resp.text()
-            raise Exception(f"Unexpected response {resp.status}: {body}")
-
-    while True:
-        stats = await fetch_pipeline_stats(session, pipeline_name)
-        match stats:
-            case {'global_metrics': {'transaction_status': 'NoTransaction'}}:
-                return
-            case {'global_metrics': {'transaction_status': 'TransactionInProgress'}}:
-                pass
-            case {'global_metrics': {'transaction_status': 'CommitInProgress'}}:
-                pass
-            case _:
-                raise Exception(f"Unexpected stats: {stats}")
-        await asyncio.sleep(1)
-
-async def insert_records(session, pipeline_name, records):
-    insert_tokens = set()
-
-    for table_name, rows in records.items():
-        url = f'/v0/pipelines/{pipeline_name}/ingress/{table_name}'
-        params = {'update_format': 'raw', 'array': 'true', 'format': 'json'}
+    with trace.span('commit_transaction'):
+        async with session.post(url) as resp:
+            if resp.status not in [200, 201]:
+                body = await resp.text()
+                raise Exception(f"Unexpected response {resp.status}: {body}")
 
-        # print(f"Inserting {table_name} records: {rows}")
-        async with session.post(url, params=params, json=rows) as resp:
+        async def is_committed():
+            stats = await fetch_pipeline_stats(session, pipeline_name)
+            match stats:
+                case {'global_metrics': {'transaction_status': 'NoTransaction'}}:
+                    return True
+                case {'global_metrics': {'transaction_status': 'TransactionInProgress'}}:
+                    return None
+                case {'global_metrics': {'transaction_status': 'CommitInProgress'}}:
+                    return None
+                case _:
+                    raise Exception(f"Unexpected stats: {stats}")
+        await wait_until('transaction_committed', is_committed)
+
+INGRESS_CONCURRENCY = int(os.environ.get('GRASP_INGRESS_CONCURRENCY', 8))
+INGRESS_CHUNK_ROWS = int(os.environ.get('GRASP_INGRESS_CHUNK_ROWS', 10000))
+INGRESS_CHUNK_BYTES = int(os.environ.get('GRASP_INGRESS_CHUNK_BYTES', 4 * 2**20))
+
+def json_array_chunks(rows, max_rows, max_bytes):
+    # yields (body, n_rows), every row is serialized only once
+    chunk = []
+    size = 2
+    for row in rows:
+        data = json.dumps(row).encode('utf-8')
+        if chunk and (len(chunk) >= max_rows or size + len(data) + 1 > max_bytes):
+            yield (b'[' + b','.join(chunk) + b']', len(chunk))
+            chunk = []
+            size = 2
+        chunk.append(data)
+        size += len(data) + 1
+    if chunk:
+        yield (b'[' + b','.join(chunk) + b']', len(chunk))
+
+def csv_value(value):
+    match value:
+        case None:
+            return ''
+        case bool():
+            return 'true' if value else 'false'
+        case _:
+            return value
+
+def csv_chunks(rows, columns, max_rows, max_bytes):
+    # like json_array_chunks, but values are in the order of table columns,
+    # without repeating keys in every row
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    chunk = []
+    size = 0
+    for row in rows:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow([csv_value(row.get(name)) for (name, _type, _nullable) in columns])
+        data = buf.getvalue().encode('utf-8')
+        if chunk and (len(chunk) >= max_rows or size + len(data) > max_bytes):
+            yield (b''.join(chunk), len(chunk))
+            chunk = []
+            size = 0
+        chunk.append(data)
+        size += len(data)
+    if chunk:
+        yield (b''.join(chunk), len(chunk))
+
+def csv_compatible(rows, columns):
+    # CSV has no arrays, and an empty field is NULL in a nullable column
+    if columns is None or any(('ARRAY' in t) for (_, t, _) in columns):
+        return False
+    nullable_text = [name for (name, t, nullable) in columns if nullable and t == 'TEXT']
+    return not any(row.get(name) == '' for row in rows for name in nullable_text)
+
+async def post_ingress_chunk(session, pipeline_name, table_name, params, body, n_rows, content_type='application/json'):
+    url = f'/v0/pipelines/{pipeline_name}/ingress/{table_name}'
+    headers = {'Content-Type': content_type}
+    with trace.span('post_ingress_chunk', table=table_name, rows=n_rows, bytes=len(body)):
+        async with session.post(url, params=params, data=body, headers=headers) as resp:
             if resp.status not in [200, 201]:
                 body = await resp.text()
                 raise Exception(f"Unexpected response {resp.status}: {body}")
             json_resp = await resp.json()
-            insert_tokens.add(json_resp['token'])
-            print(f"Inserted {len(rows)} records into {table_name}: {json_resp}", file=sys.stderr)
-
+            print(f"Inserted {n_rows} records into {table_name}: {json_resp}", file=sys.stderr)
+            return json_resp['token']
+
+def table_chunks(table_name, rows, update_format, ingress_format, max_rows, max_bytes):
+    # yields (params, content_type, body, n_rows). CSV is used only for inserts
+    # into tables of the transpiler, other tables and deltas are sent as JSON
+    if ingress_format == 'csv' and update_format == 'raw':
+        columns = transpiler_tables_columns().get(table_name)
+        if csv_compatible(rows, columns):
+            params = {'update_format': 'raw', 'format': 'csv'}
+            for (body, n_rows) in csv_chunks(rows, columns, max_rows, max_bytes):
+                yield (params, 'text/csv', body, n_rows)
+            return
+    params = {'update_format': update_format, 'array': 'true', 'format': 'json'}
+    for (body, n_rows) in json_array_chunks(rows, max_rows, max_bytes):
+        yield (params, 'application/json', body, n_rows)
+
+async def insert_records(
+    session, pipeline_name, records, update_format='raw', ingress_format='json',
+    concurrency=INGRESS_CONCURRENCY, max_rows=INGRESS_CHUNK_ROWS, max_bytes=INGRESS_CHUNK_BYTES,
+):
+    # Big tables are split into chunks, and up to `concurrency` chunks
+    # of all tables are posted at once. Order of chunks is not preserved.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post_chunk(table_name, params, content_type, body, n_rows):
+        try:
+            return await post_ingress_chunk(
+                session, pipeline_name, table_name, params, body, n_rows, content_type)
+        finally:
+            semaphore.release()
+
+    tasks = []
+    try:
+        with trace.span('insert_records', rows={}, bytes=0, chunks=0) as span_args:
+            for table_name, rows in records.items():
+                chunks = table_chunks(table_name, rows, update_format, ingress_format, max_rows, max_bytes)
+                for (params, content_type, body, n_rows) in chunks:
+                    # acquired before the next chunk is serialized,
+                    # so at most `concurrency` chunks are kept in memory
+                    await semaphore.acquire()
+                    tasks.append(asyncio.create_task(
+                        post_chunk(table_name, params, content_type, body, n_rows)))
+                    span_args['rows'][table_name] = span_args['rows'].get(table_name, 0) + n_rows
+                    span_args['bytes'] += len(body)
+                    span_args['chunks'] += 1
+            tokens = set(await asyncio.gather(*tasks))
+        trace.counter('ingress_rows', **span_args['rows'])
+        trace.counter('ingress_bytes', bytes=span_args['bytes'])
+        return tokens
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+def read_line_aligned_chunk(f, chunk_bytes):
+    # rows are never split between chunks
+    chunk = f.read(chunk_bytes)
+    if chunk and not chunk.endswith(b'\n'):
+        chunk += f.readline()
+    return chunk
+
+async def ingest_files(
+    session, pipeline_name, table_paths, csv_header=False,
+    concurrency=INGRESS_CONCURRENCY, chunk_bytes=INGRESS_CHUNK_BYTES,
+):
+    # Streams *.jsonl (one JSON object per line) and *.csv files into tables,
+    # table_paths is a list of (table_name, path). Files are read chunk by chunk,
+    # a chunk is read only when there is a free upload slot, so at most
+    # `concurrency` chunks are kept in memory. CSV rows must not contain newlines.
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {'rows': 0, 'bytes': 0}
+
+    async def post_chunk(table_name, params, chunk, content_type):
+        try:
+            n_rows = chunk.count(b'\n') + (0 if chunk.endswith(b'\n') else 1)
+            token = await post_ingress_chunk(
+                session, pipeline_name, table_name, params, chunk, n_rows, content_type)
+            stats['rows'] += n_rows
+            stats['bytes'] += len(chunk)
+            return token
+        finally:
+            semaphore.release()
+
+    tasks = []
+    try:
+        for (table_name, path) in table_paths:
+            if path.endswith('.csv'):
+                (params, content_type) = ({'update_format': 'raw', 'format': 'csv'}, 'text/csv')
+            else:
+                (params, content_type) = (
+                    {'update_format': 'raw', 'format': 'json', 'array': 'false'}, 'application/json')
+            with open(path, 'rb') as f:
+                if csv_header and path.endswith('.csv'):
+                    f.readline()
+                while True:
+                    await semaphore.acquire()
+                    chunk = await asyncio.to_thread(read_line_aligned_chunk, f, chunk_bytes)
+                    if not chunk.strip():
+                        semaphore.release()
+                        if not chunk:
+                            break
+                        continue
+                    tasks.append(asyncio.create_task(post_chunk(table_name, params, chunk, content_type)))
+        return (set(await asyncio.gather(*tasks)), stats)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+async def insert_record_deltas(session, pipeline_name, inserts, deletes):
+    # deletes go first, so a row that is both deleted and inserted
+    # never has a negative weight
+    changes = {}
+    for table_name, rows in deletes.items():
+        changes.setdefault(table_name, []).extend({'delete': r} for r in rows)
+    for table_name, rows in inserts.items():
+        changes.setdefault(table_name, []).extend({'insert': r} for r in rows)
+    return await insert_records(session, pipeline_name, changes, update_format='insert_delete')
+
+async def insert_records_from_iter(session, pipeline_name, records_iter, max_pending=4, ingress_format='json'):
+    # records_iter is consumed in a separate thread, so parsing of the next
+    # batches overlaps with uploading of the previous ones. At most max_pending
+    # batches are kept in memory.
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for records in records_iter:
+                if stop.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(queue.put(records), loop).result()
+        finally:
+            asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    producer = asyncio.create_task(asyncio.to_thread(produce))
+    insert_tokens = set()
+    try:
+        while (records := await queue.get()) is not done:
+            tokens = await insert_records(session, pipeline_name, records, ingress_format=ingress_format)
+            insert_tokens = insert_tokens.union(tokens)
+    except BaseException:
+        stop.set()
+        while not producer.done() or not queue.empty():
+            if await queue.get() is done:
+                break
+        raise
+    # re-raises parse errors
+    await producer
     return insert_tokens
 
-async def start_transaction(session, pipeline_name):
-    url = f'/v0/pipelines/{pipeline_name}/start_transaction'
-    async with session.post(url) as resp:
-        if resp.status not in [200, 201]:
-            body = await resp.text()
-            raise Exception(f"Unexpected response {resp.status}: {body}")
-
-async def commit_transaction(session, pipeline_name):
-    url = f'/v0/pipelines/{pipeline_name}/commit_transaction'
-    async with session.post(url) as resp:
-        if resp.status not in [200, 201]:
-            body = await resp.text()
-            raise Exception(f"Unexpected response {resp.status}: {body}")
-
 async def wait_till_input_tokens_processed(session, pipeline_name, tokens):
     tokens = set(tokens)
-    while tokens:
-        for token in [*tokens]:
-            status = await fetch_ingest_status(session, pipeline_name, token)
+    async def are_all_processed():
+        # all outstanding tokens are polled at once
+        pending = [*tokens]
+        statuses = await asyncio.gather(*[
+            fetch_ingest_status(session, pipeline_name, token) for token in pending])
+        for (token, status) in zip(pending, statuses):
             match status:
                 case {'status': 'inprogress'}:
                     pass
@@ -176,7 +427,10 @@ async def wait_till_input_tokens_processed(session, pipeline_name, tokens):
                     tokens.remove(token)
                 case _:
                     raise Exception(f"Unknown ingest status: {status}")
-        await asyncio.sleep(1)
+        return True if not tokens else None
+    if tokens:
+        with trace.span('wait_till_input_tokens_processed', tokens=len(tokens)):
+            await wait_until('input_tokens_processed', are_all_processed)
 
 async def fetch_ingest_status(session, pipeline_name, token):
     url = f'/v0/pipelines/{pipeline_name}/completion_status'
@@ -187,10 +441,68 @@ async def fetch_ingest_status(session, pipeline_name, token):
 
 async def adhoc_query(session, pipeline_name, sql):
     url = f'/v0/pipelines/{pipeline_name}/query'
-    async with session.get(url, params={'sql': sql, 'format': 'json', 'array': 'true'}) as resp:
-        if resp.status in [200, 201, 202]:
-            return await resp.json()
-        raise Exception(f"Unexpected response {resp.status}: {await resp.text()}\nSQL: {sql}")
+    with trace.span('adhoc_query', sql=sql):
+        async with session.get(url, params={'sql': sql, 'format': 'json', 'array': 'true'}) as resp:
+            if resp.status in [200, 201, 202]:
+                return await resp.json()
+            raise Exception(f"Unexpected response {resp.status}: {await resp.text()}\nSQL: {sql}")
+
+async def iter_adhoc_query(session, pipeline_name, sql):
+    # Yields rows one by one, as they arrive. Feldera sends a JSON object per line.
+    # Lines are split here, aiohttp readline() fails on lines longer than 64KB.
+    url = f'/v0/pipelines/{pipeline_name}/query'
+    with trace.span('adhoc_query', sql=sql, rows=0, bytes=0) as span_args:
+        async with session.get(url, params={'sql': sql, 'format': 'json'}) as resp:
+            if resp.status not in [200, 201, 202]:
+                raise Exception(f"Unexpected response {resp.status}: {await resp.text()}\nSQL: {sql}")
+            tail = b''
+            async for data in resp.content.iter_any():
+                span_args['bytes'] += len(data)
+                lines = (tail + data).split(b'\n')
+                tail = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        span_args['rows'] += 1
+                        yield json.loads(line)
+            if tail.strip():
+                span_args['rows'] += 1
+                yield json.loads(tail)
+
+async def adhoc_query_columns(session, pipeline_name, sql):
+    # Returns {column_name: [values]}. Uses Arrow IPC when pyarrow is installed,
+    # otherwise builds columns from JSON rows.
+    if pyarrow is None:
+        columns = {}
+        n_rows = 0
+        async for row in iter_adhoc_query(session, pipeline_name, sql):
+            for (k, v) in row.items():
+                # columns of NULL values might be omitted in some rows
+                columns.setdefault(k, [None] * n_rows).append(v)
+            n_rows += 1
+            for values in columns.values():
+                if len(values) < n_rows:
+                    values.append(None)
+        return columns
+
+    url = f'/v0/pipelines/{pipeline_name}/query'
+    async with session.get(url, params={'sql': sql, 'format': 'arrow_ipc'}) as resp:
+        if resp.status not in [200, 201, 202]:
+            raise Exception(f"Unexpected response {resp.status}: {await resp.text()}\nSQL: {sql}")
+        body = await resp.read()
+    if not body:
+        return {}
+    return pyarrow.ipc.open_stream(body).read_all().to_pydict()
+
+def sql_str(s):
+    return "'" + s.replace("'", "''") + "'"
+
+PIPELINE_ID_TIMESTAMP = re.compile(r'^(?:[a-z_]+:)?(\d+\.\d+)(?::\d+)?$')
+
+def pipeline_id_timestamp(pipeline_id):
+    # ids of grasp runs, watch sessions and the service start with time.time(),
+    # ids of testcases are derived from content and have no timestamp
+    m = PIPELINE_ID_TIMESTAMP.match(pipeline_id)
+    return float(m.group(1)) if m else None
 
 def file_hash(path):
     return hashlib.sha256(open(path, 'rb').read()).hexdigest()[:10]
@@ -240,5 +552,31 @@ def read_transpiler_sql():
     sql_files = [open(f'{root_dir()}/transpiler/{f}', 'r').read() for f in sql_files]
     return '\n'.join(sql_files)
 
+def transpiler_table_names():
+    # tables of AST records, every one has pipeline_id column
+    return re.findall(r'^CREATE TABLE (\w+)', read_transpiler_sql(), re.MULTILINE)
+
+TABLE_COLUMN = re.compile(r'^"?(\w+)"?\s+([A-Z]+(?: ARRAY)?)(\s+NOT NULL)?,?$')
+
+@functools.cache
+def transpiler_tables_columns():
+    # {table_name: [(column_name, type, nullable)]}, in the order of declaration.
+    # CSV rows are positional, so a column that is not understood is an error
+    sql = read_transpiler_sql()
+    tables = {}
+    for table_name in transpiler_table_names():
+        body = re.search(rf'^CREATE TABLE {table_name} \((.*?)^\)', sql, re.MULTILINE | re.DOTALL).group(1)
+        columns = []
+        for line in body.split('\n'):
+            line = line.split('--')[0].strip()
+            if not line:
+                continue
+            m = TABLE_COLUMN.match(line)
+            if not m:
+                raise Exception(f"Unexpected column of {table_name}: {line}")
+            columns.append((m.group(1), m.group(2), not m.group(3)))
+        tables[table_name] = columns
+    return tables
+
 def read_transpiler_udf_rs():
     return open(f'{root_dir()}/transpiler/udf.rs', 'r').read()
\ No newline at end of file
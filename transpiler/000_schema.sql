@@ -39,115 +39,99 @@ CREATE TABLE table_name_prefix (
 
 /*
 # AST records:
+
+Ids are BIGINT. The id of a rule is unique in its pipeline, ids of other
+nodes are unique in their rule.
+
+pos packs the position of a node in the source: start line (24 bits),
+start column (13 bits), number of lines to the end (13 bits) and end
+column (13 bits). The start line of a rule is absolute, start lines of
+all other records are relative to the start line of their rule.
 */
 
 CREATE TABLE rule (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
     table_name TEXT NOT NULL,
 
     source_path TEXT NOT NULL,
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE rule_param (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
     "key" TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    expr_id BIGINT NOT NULL,
     expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE fncall_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     fn_name TEXT NOT NULL,
-    fncall_id TEXT NOT NULL,
+    fncall_id BIGINT NOT NULL,
     aggregated BOOLEAN NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE fn_val_arg (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    fncall_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    fncall_id BIGINT NOT NULL,
     arg_index INTEGER NOT NULL,
-    expr_id TEXT NOT NULL,
+    expr_id BIGINT NOT NULL,
     expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE fn_kv_arg (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    fncall_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    fncall_id BIGINT NOT NULL,
     "key" TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    expr_id BIGINT NOT NULL,
     expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE int_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     value BIGINT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE str_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     value TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE str_template_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     template TEXT ARRAY NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE var_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     var_name TEXT NOT NULL,
     -- for example "*", "**" or NULL
     -- used in pattern matching
@@ -155,199 +139,154 @@ CREATE TABLE var_expr (
     assigned_type TEXT,
     maybe_null_prefix BOOLEAN NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE null_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE bool_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     value BOOLEAN NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE binop_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
-    left_expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
+    left_expr_id BIGINT NOT NULL,
     left_expr_type TEXT NOT NULL,
-    right_expr_id TEXT NOT NULL,
+    right_expr_id BIGINT NOT NULL,
     right_expr_type TEXT NOT NULL,
     op TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE sql_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     template TEXT ARRAY NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE dict_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
-    dict_id TEXT NOT NULL,
-
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
+    dict_id BIGINT NOT NULL,
+
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE dict_entry (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    dict_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    dict_id BIGINT NOT NULL,
     key TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    expr_id BIGINT NOT NULL,
     expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE array_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
-    array_id TEXT NOT NULL,
-
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
+    array_id BIGINT NOT NULL,
+
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE array_entry (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    array_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    array_id BIGINT NOT NULL,
     "index" INTEGER NOT NULL,
-    expr_id TEXT NOT NULL,
+    expr_id BIGINT NOT NULL,
     expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE body_fact (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    fact_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    fact_id BIGINT NOT NULL,
     "index" INTEGER NOT NULL,
     table_name TEXT NOT NULL,
     negated BOOLEAN NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE fact_arg (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    fact_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    fact_id BIGINT NOT NULL,
     "key" TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    expr_id BIGINT NOT NULL,
     expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE body_match (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    match_id TEXT NOT NULL,
-    left_expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    match_id BIGINT NOT NULL,
+    left_expr_id BIGINT NOT NULL,
     left_expr_type TEXT NOT NULL,
-    right_expr_id TEXT NOT NULL,
+    right_expr_id BIGINT NOT NULL,
     right_expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE body_unnest (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    unnest_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    unnest_id BIGINT NOT NULL,
 
-    left_expr1_id TEXT NOT NULL,
+    left_expr1_id BIGINT NOT NULL,
     left_expr1_type TEXT NOT NULL,
-    left_expr2_id TEXT, -- second index param is optional for arrays
+    left_expr2_id BIGINT, -- second index param is optional for arrays
     left_expr2_type TEXT,
 
     right_expr_prefix TEXT NOT NULL,
-    right_expr_id TEXT NOT NULL,
+    right_expr_id BIGINT NOT NULL,
     right_expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE body_expr (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    expr_id BIGINT NOT NULL,
     expr_type TEXT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 CREATE TABLE body_sql_cond (
     pipeline_id TEXT NOT NULL,
-    rule_id TEXT NOT NULL,
-    sql_expr_id TEXT NOT NULL,
+    rule_id BIGINT NOT NULL,
+    sql_expr_id BIGINT NOT NULL,
 
-    start_line INTEGER NOT NULL,
-    start_column INTEGER NOT NULL,
-    end_line INTEGER NOT NULL,
-    end_column INTEGER NOT NULL
+    pos BIGINT NOT NULL
 ) WITH ('materialized' = 'true');
 
 /*
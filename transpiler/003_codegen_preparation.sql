@@ -161,130 +161,6 @@ CREATE MATERIALIZED VIEW output_table_name AS
     JOIN table_name_prefix
         ON table_output_order.pipeline_id = table_name_prefix.pipeline_id;
 
-/*
-first_table(pipeline_id:, table_name: min<table_name>, order:) <-
-    table_output_order(pipeline_id:, table_name:, order:)
-    #all_records_inserted(pipeline_id:)
-*/
-CREATE MATERIALIZED VIEW first_table AS
-    SELECT DISTINCT
-        table_output_order.pipeline_id,
-        MIN(table_output_order.table_name) AS table_name,
-        table_output_order."order"
-    FROM table_output_order
-    -- JOIN all_records_inserted
-    --     ON table_output_order.pipeline_id = all_records_inserted.pipeline_id
-    GROUP BY table_output_order.pipeline_id, table_output_order."order";
-
-/*
-only_one_table_in_group(pipeline_id:, order:) <-
-    table_output_order(pipeline_id:, table_name:, order:)
-    count<> = 1
-*/
-CREATE MATERIALIZED VIEW only_one_table_in_group AS
-    SELECT DISTINCT
-        table_output_order.pipeline_id,
-        table_output_order."order"
-    FROM table_output_order
-    GROUP BY table_output_order.pipeline_id, table_output_order."order"
-    HAVING COUNT(DISTINCT table_output_order.table_name) = 1;
-
-/*
-next_table_within_same_order(pipeline_id:, prev_table_name:, next_table_name:) <-
-    table_output_order(pipeline_id:, table_name: prev_table_name, order:)
-    table_output_order(pipeline_id:, table_name:, order:)
-    next_table_name := min<table_name>
-    prev_table_name < table_name
-*/
-CREATE MATERIALIZED VIEW next_table_within_same_order AS
-    SELECT DISTINCT
-        prev.pipeline_id,
-        prev.table_name AS prev_table_name,
-        MIN("next".table_name) AS next_table_name
-    FROM table_output_order AS prev
-    JOIN table_output_order AS "next"
-        ON prev.pipeline_id = "next".pipeline_id
-        AND prev."order" = "next"."order"
-    WHERE prev.table_name < "next".table_name
-    GROUP BY prev.pipeline_id, prev.table_name;
-
-/*
-next_table(pipeline_id:, prev_table_name:, next_table_name:) <-
-    first_table(pipeline_id:, table_name: prev_table_name, order: 0)
-    next_table_within_same_order(pipeline_id:, prev_table_name:, next_table_name:)
-next_table(pipeline_id:, prev_table_name:, next_table_name:) <-
-    first_table(pipeline_id:, table_name: prev_table_name, order: 0)
-    first_table(pipeline_id:, table_name: next_table_name, order: 1)
-    not next_table_within_same_order(pipeline_id:, prev_table_name:)
-next_table(pipeline_id:, prev_table_name:, next_table_name:) <-
-    next_table(pipeline_id:, next_table_name: prev_table_name)
-    next_table_within_same_order(pipeline_id:, prev_table_name:, next_table_name:)
-next_table(pipeline_id:, prev_table_name:, next_table_name:) <-
-    next_table(pipeline_id:, next_table_name: prev_table_name)
-    table_output_order(pipeline_id:, table_name: prev_table_name, order:)
-    first_table(pipeline_id:, table_name: next_table_name, order: order+1)
-    not next_table_within_same_order(pipeline_id:, prev_table_name:)
-*/
-DECLARE RECURSIVE VIEW next_table (pipeline_id TEXT, prev_table_name TEXT, next_table_name TEXT);
-CREATE MATERIALIZED VIEW next_table AS
-    SELECT DISTINCT
-        first_table.pipeline_id,
-        next_table_within_same_order.prev_table_name,
-        next_table_within_same_order.next_table_name
-    FROM first_table
-    JOIN next_table_within_same_order
-        ON first_table.pipeline_id = next_table_within_same_order.pipeline_id
-        AND first_table.table_name = next_table_within_same_order.prev_table_name
-    WHERE first_table."order" = 0
-    
-    UNION
-
-    SELECT DISTINCT
-        prev.pipeline_id,
-        prev.table_name AS prev_table_name,
-        "next".table_name AS next_table_name
-    FROM first_table AS prev
-    JOIN first_table AS "next"
-        ON prev.pipeline_id = "next".pipeline_id
-    WHERE prev."order" = 0 AND "next"."order" = 1
-    AND NOT EXISTS (
-        SELECT 1
-        FROM next_table_within_same_order
-        WHERE prev.pipeline_id = next_table_within_same_order.pipeline_id
-        AND prev.table_name = next_table_within_same_order.prev_table_name
-    )
-
-    UNION
-
-    SELECT DISTINCT
-        next_table.pipeline_id,
-        next_table_within_same_order.prev_table_name,
-        next_table_within_same_order.next_table_name
-    FROM next_table
-    JOIN next_table_within_same_order
-        ON next_table.pipeline_id = next_table_within_same_order.pipeline_id
-        AND next_table.next_table_name = next_table_within_same_order.prev_table_name
-    
-    UNION
-
-    SELECT DISTINCT
-        next_table.pipeline_id,
-        next_table.next_table_name AS prev_table_name,
-        first_table.table_name AS next_table_name
-    FROM next_table
-    JOIN table_output_order
-        ON next_table.pipeline_id = table_output_order.pipeline_id
-        AND next_table.next_table_name = table_output_order.table_name
-    JOIN first_table
-        ON next_table.pipeline_id = first_table.pipeline_id
-        AND table_output_order."order"+1 = first_table."order"
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM next_table_within_same_order
-        WHERE next_table.pipeline_id = next_table_within_same_order.pipeline_id
-        AND next_table.next_table_name = next_table_within_same_order.prev_table_name
-    );
-
 /*
 fact_alias(pipeline_id:, rule_id:, table_name:, alias:, negated:, fact_index:) <-
     body_fact(pipeline_id:, rule_id:, fact_id:, table_name:, negated:, index: fact_index)
@@ -298,7 +174,7 @@ CREATE MATERIALIZED VIEW fact_alias AS
         body_fact."index" AS fact_index,
         body_fact.table_name,
         body_fact.negated,
-        (body_fact.fact_id || ':' || body_fact.table_name) AS alias
+        (CAST(body_fact.fact_id AS TEXT) || ':' || body_fact.table_name) AS alias
     FROM body_fact;
 
 /*
@@ -327,103 +203,6 @@ CREATE MATERIALIZED VIEW first_fact_alias AS
     --     ON fact_alias.pipeline_id = all_records_inserted.pipeline_id
     GROUP BY fact_alias.pipeline_id, fact_alias.rule_id, fact_alias.negated;
 
-/*
-adjacent_facts(
-    pipeline_id:, rule_id:, negated:, prev_fact_id:, next_fact_id: argmin<next_fact_id, next_fact_index>
-) <-
-    fact_alias(pipeline_id:, rule_id:, fact_id: prev_fact_id, negated:, fact_index: prev_fact_index)
-    fact_alias(pipeline_id:, rule_id:, fact_id: next_fact_id, negated:, fact_index: next_fact_index)
-    prev_fact_index < next_fact_index
-*/
-CREATE MATERIALIZED VIEW adjacent_facts AS
-    SELECT DISTINCT
-        prev_fact.pipeline_id,
-        prev_fact.rule_id,
-        prev_fact.negated,
-        prev_fact.fact_id AS prev_fact_id,
-        ARG_MIN(next_fact.fact_id, next_fact.fact_index) AS next_fact_id
-    FROM fact_alias AS prev_fact
-    JOIN fact_alias AS next_fact
-        ON prev_fact.pipeline_id = next_fact.pipeline_id
-        AND prev_fact.rule_id = next_fact.rule_id
-        AND prev_fact.negated = next_fact.negated
-    WHERE prev_fact.fact_index < next_fact.fact_index
-    GROUP BY prev_fact.pipeline_id, prev_fact.rule_id, prev_fact.negated, prev_fact.fact_id;
-
-/*
-first_unnest(pipeline_id:, rule_id:, unnest_id: min<unnest_id>) <-
-    body_unnest(pipeline_id:, rule_id:, unnest_id:)
-*/
-CREATE MATERIALIZED VIEW first_unnest AS
-    SELECT DISTINCT
-        body_unnest.pipeline_id,
-        body_unnest.rule_id,
-        MIN(body_unnest.unnest_id) AS unnest_id
-    FROM body_unnest
-    GROUP BY body_unnest.pipeline_id, body_unnest.rule_id;
-
-/*
-adjacent_unnests(
-    pipeline_id:, rule_id:,
-    prev_unnest_id:, next_unnest_id: min<next_unnest_id>
-) <-
-    body_unnest(pipeline_id:, rule_id:, unnest_id: prev_unnest_id)
-    body_unnest(pipeline_id:, rule_id:, unnest_id: next_unnest_id)
-    prev_unnest_id < next_unnest_id
-*/
-CREATE MATERIALIZED VIEW adjacent_unnests AS
-    SELECT DISTINCT
-        prev_unnest.pipeline_id,
-        prev_unnest.rule_id,
-        prev_unnest.unnest_id AS prev_unnest_id,
-        MIN(next_unnest.unnest_id) AS next_unnest_id
-    FROM body_unnest AS prev_unnest
-    JOIN body_unnest AS next_unnest
-        ON prev_unnest.pipeline_id = next_unnest.pipeline_id
-        AND prev_unnest.rule_id = next_unnest.rule_id
-    WHERE prev_unnest.unnest_id < next_unnest.unnest_id
-    GROUP BY prev_unnest.pipeline_id, prev_unnest.rule_id, prev_unnest.unnest_id;
-
-/*
-last_fact_alias(pipeline_id:, rule_id:, fact_id:, negated:) <-
-    adjacent_facts(pipeline_id:, rule_id:, negated:, next_fact_id: fact_id)
-    not adjacent_facts(pipeline_id:, rule_id:, negated:, prev_fact_id: fact_id)
-last_fact_alias(pipeline_id:, rule_id:, fact_id:, negated:) <-
-    first_fact_alias(pipeline_id:, rule_id:, fact_id:, negated:)
-    not adjacent_facts(pipeline_id:, rule_id:, negated:)
-*/
-CREATE MATERIALIZED VIEW last_fact_alias AS
-    SELECT DISTINCT
-        adjacent_facts.pipeline_id,
-        adjacent_facts.rule_id,
-        adjacent_facts.next_fact_id AS fact_id,
-        adjacent_facts.negated
-    FROM adjacent_facts
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM adjacent_facts AS prev_adjacent_facts
-        WHERE adjacent_facts.pipeline_id = prev_adjacent_facts.pipeline_id
-        AND adjacent_facts.rule_id = prev_adjacent_facts.rule_id
-        AND adjacent_facts.negated = prev_adjacent_facts.negated
-        AND prev_adjacent_facts.prev_fact_id = adjacent_facts.next_fact_id
-    )
-    
-    UNION
-    
-    SELECT DISTINCT
-        first_fact_alias.pipeline_id,
-        first_fact_alias.rule_id,
-        first_fact_alias.fact_id,
-        first_fact_alias.negated
-    FROM first_fact_alias
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM adjacent_facts
-        WHERE first_fact_alias.pipeline_id = adjacent_facts.pipeline_id
-        AND first_fact_alias.rule_id = adjacent_facts.rule_id
-        AND first_fact_alias.negated = adjacent_facts.negated
-    );
-
 /*
 constant_rule(pipeline_id:, rule_id:) <-
     rule_param(pipeline_id:, rule_id:)
@@ -456,94 +235,6 @@ CREATE MATERIALIZED VIEW table_first_rule AS
     --     ON rule.pipeline_id = all_records_inserted.pipeline_id
     GROUP BY rule.pipeline_id, rule.table_name;
 
-/*
-table_next_rule1(pipeline_id:, table_name:, prev_rule_id:, next_rule_id:) <-
-    table_first_rule(pipeline_id:, table_name:, rule_id: prev_rule_id)
-    rule(pipeline_id:, table_name:, rule_id:)
-    next_rule_id := min<rule_id>
-    prev_rule_id < rule_id
-*/
-CREATE MATERIALIZED VIEW table_next_rule1 AS
-    SELECT DISTINCT
-        table_first_rule.pipeline_id,
-        table_first_rule.table_name,
-        table_first_rule.rule_id AS prev_rule_id,
-        MIN(rule.rule_id) AS next_rule_id
-    FROM table_first_rule
-    JOIN rule
-        ON rule.pipeline_id = table_first_rule.pipeline_id
-        AND rule.table_name = table_first_rule.table_name
-    WHERE table_first_rule.rule_id < rule.rule_id
-    GROUP BY table_first_rule.pipeline_id, table_first_rule.table_name, table_first_rule.rule_id;
-
-/*
-table_next_rule(pipeline_id:, table_name:, prev_rule_id:, next_rule_id:) <-
-    table_next_rule1(pipeline_id:, table_name:, prev_rule_id:, next_rule_id:)
-table_next_rule(pipeline_id:, table_name:, prev_rule_id:, next_rule_id:) <-
-    table_next_rule(pipeline_id:, table_name:, next_rule_id: prev_rule_id)
-    rule(pipeline_id:, table_name:, rule_id:)
-    next_rule_id := min<rule_id>
-    prev_rule_id < rule_id
-*/
-DECLARE RECURSIVE VIEW table_next_rule (pipeline_id TEXT, table_name TEXT, prev_rule_id TEXT, next_rule_id TEXT);
-CREATE MATERIALIZED VIEW table_next_rule AS
-    SELECT DISTINCT
-        table_next_rule1.pipeline_id,
-        table_next_rule1.table_name,
-        table_next_rule1.prev_rule_id,
-        table_next_rule1.next_rule_id
-    FROM table_next_rule1
-
-    UNION
-
-    SELECT DISTINCT
-        table_next_rule.pipeline_id,
-        table_next_rule.table_name,
-        table_next_rule.next_rule_id AS prev_rule_id,
-        MIN(rule.rule_id) AS next_rule_id
-    FROM table_next_rule
-    JOIN rule
-        ON rule.pipeline_id = table_next_rule.pipeline_id
-        AND rule.table_name = table_next_rule.table_name
-    WHERE table_next_rule.next_rule_id < rule.rule_id
-    GROUP BY table_next_rule.pipeline_id, table_next_rule.table_name, table_next_rule.next_rule_id;
-
-/*
-table_last_rule(pipeline_id:, table_name:, rule_id:) <-
-    table_first_rule(pipeline_id:, table_name:, rule_id:)
-    not table_next_rule(pipeline_id:, table_name:)
-table_last_rule(pipeline_id:, table_name:, rule_id:) <-
-    table_next_rule(pipeline_id:, table_name:, next_rule_id: rule_id)
-    not table_next_rule(pipeline_id:, table_name:, prev_rule_id: rule_id)
-*/
-CREATE MATERIALIZED VIEW table_last_rule AS
-    SELECT DISTINCT
-        table_first_rule.pipeline_id,
-        table_first_rule.table_name,
-        table_first_rule.rule_id
-    FROM table_first_rule
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM table_next_rule
-        WHERE table_first_rule.pipeline_id = table_next_rule.pipeline_id
-        AND table_first_rule.table_name = table_next_rule.table_name
-    )
-
-    UNION
-
-    SELECT DISTINCT
-        tn.pipeline_id,
-        tn.table_name,
-        tn.next_rule_id
-    FROM table_next_rule AS tn
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM table_next_rule
-        WHERE tn.pipeline_id = table_next_rule.pipeline_id
-        AND tn.table_name = table_next_rule.table_name
-        AND tn.next_rule_id = table_next_rule.prev_rule_id
-    );
-
 /*
 array_expr_length(pipeline_id:, rule_id:, expr_id:, length: count<>) <-
     array_expr(pipeline_id:, rule_id:, expr_id:, array_id:)
@@ -699,7 +390,7 @@ pattern_expr(pipeline_id:, rule_id:, expr_id:, expr_type:) <-
     dict_expr(pipeline_id:, rule_id:, expr_id: dict_expr_id, dict_id:)
     dict_entry(pipeline_id:, rule_id:, dict_id:, expr_id:, expr_type:)
 */
-DECLARE RECURSIVE VIEW pattern_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, expr_type TEXT);
+DECLARE RECURSIVE VIEW pattern_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, expr_type TEXT);
 CREATE MATERIALIZED VIEW pattern_expr AS
     SELECT DISTINCT
         fact_arg.pipeline_id,
@@ -787,7 +478,7 @@ value_expr(pipeline_id:, rule_id:, expr_id:, expr_type:) <-
     value_expr(pipeline_id:, rule_id:, expr_id: sql_expr_id, expr_type: "binop_expr")
     binop_expr(pipeline_id:, rule_id:, right_expr_id: expr_id, right_expr_type: expr_type)
 */
-DECLARE RECURSIVE VIEW value_expr(pipeline_id TEXT, rule_id TEXT, expr_id TEXT, expr_type TEXT);
+DECLARE RECURSIVE VIEW value_expr(pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, expr_type TEXT);
 CREATE MATERIALIZED VIEW value_expr AS
     SELECT DISTINCT
         rule_param.pipeline_id,
@@ -976,7 +667,7 @@ fact_oexpr(
     dict_entry(pipeline_id:, rule_id:, dict_id:, key:, expr_id: pattern_expr_id, expr_type: pattern_expr_type)
     sql := `{{parent_sql}}['{{key}}']`
 */
-DECLARE RECURSIVE VIEW fact_oexpr (pipeline_id TEXT, rule_id TEXT, pattern_expr_id TEXT, pattern_expr_type TEXT, sql TEXT, negated BOOLEAN, fact_index INTEGER, fact_id TEXT);
+DECLARE RECURSIVE VIEW fact_oexpr (pipeline_id TEXT, rule_id BIGINT, pattern_expr_id BIGINT, pattern_expr_type TEXT, sql TEXT, negated BOOLEAN, fact_index INTEGER, fact_id BIGINT);
 CREATE MATERIALIZED VIEW fact_oexpr AS
     SELECT DISTINCT
         fact_alias.pipeline_id,
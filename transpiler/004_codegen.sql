@@ -13,8 +13,8 @@ canonical_var_bound_sql(
     var_bound_via_match(pipeline_id:, rule_id:, var_name:, sql:, aggregated:)
     not canonical_fact_var_sql(pipeline_id:, rule_id:, var_name:)
 */
-DECLARE RECURSIVE VIEW var_bound_via_match (pipeline_id TEXT, rule_id TEXT, match_id TEXT, var_name TEXT, sql TEXT, aggregated BOOLEAN);
-DECLARE RECURSIVE VIEW canonical_var_bound_sql (pipeline_id TEXT, rule_id TEXT, var_name TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW var_bound_via_match (pipeline_id TEXT, rule_id BIGINT, match_id BIGINT, var_name TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW canonical_var_bound_sql (pipeline_id TEXT, rule_id BIGINT, var_name TEXT, sql TEXT, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW canonical_var_bound_sql AS
     SELECT DISTINCT
         canonical_fact_var_sql.pipeline_id,
@@ -53,7 +53,7 @@ sql_expr_template_part_with_substitution(pipeline_id:, rule_id:, expr_id:, part:
     sql_expr_template_part(pipeline_id:, rule_id:, expr_id:, part:, index:)
     not (part ~ "{{[a-z_][a-zA-Z0-9_]*}}")
 */
-DECLARE RECURSIVE VIEW sql_expr_template_part_with_substitution (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, part TEXT, "index" INTEGER);
+DECLARE RECURSIVE VIEW sql_expr_template_part_with_substitution (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, part TEXT, "index" INTEGER);
 CREATE MATERIALIZED VIEW sql_expr_template_part_with_substitution AS
     SELECT DISTINCT
         sql_expr_template_part.pipeline_id,
@@ -83,7 +83,7 @@ CREATE MATERIALIZED VIEW sql_expr_template_part_with_substitution AS
 sql_expr_substitution_status(pipeline_id:, rule_id:, expr_id:, count: count<>) <-
     sql_expr_template_part_with_substitution(pipeline_id:, rule_id:, expr_id:, index:)
 */
--- DECLARE RECURSIVE VIEW sql_expr_substitution_status (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, count BIGINT);
+-- DECLARE RECURSIVE VIEW sql_expr_substitution_status (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, count BIGINT);
 -- CREATE MATERIALIZED VIEW sql_expr_substitution_status AS
 --     SELECT DISTINCT
 --         t.pipeline_id,
@@ -99,7 +99,7 @@ sql_expr_all_vars_are_bound(pipeline_id:, rule_id:, expr_id:) <-
     sql_expr_template_part_with_substitution(pipeline_id:, rule_id:, expr_id:)
     count<> = array_length(template)
 */
-DECLARE RECURSIVE VIEW sql_expr_all_vars_are_bound (pipeline_id TEXT, rule_id TEXT, expr_id TEXT);
+DECLARE RECURSIVE VIEW sql_expr_all_vars_are_bound (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT);
 CREATE MATERIALIZED VIEW sql_expr_all_vars_are_bound AS
     SELECT DISTINCT
         sql_expr.pipeline_id,
@@ -119,7 +119,7 @@ substituted_sql_expr(pipeline_id:, rule_id:, expr_id:, sql:) <-
     sql_expr_template_part_with_substitution(pipeline_id:, rule_id:, expr_id:, part:, index:)
     sql := join(array<part, order_by: [index]>, "")
 */
-DECLARE RECURSIVE VIEW substituted_sql_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, sql TEXT);
+DECLARE RECURSIVE VIEW substituted_sql_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, sql TEXT);
 CREATE MATERIALIZED VIEW substituted_sql_expr AS
     SELECT DISTINCT
         a.pipeline_id,
@@ -133,7 +133,7 @@ CREATE MATERIALIZED VIEW substituted_sql_expr AS
         AND a.expr_id = b.expr_id
     GROUP BY a.pipeline_id, a.rule_id, a.expr_id;
 
-DECLARE RECURSIVE VIEW substituted_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, expr_type TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW substituted_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, expr_type TEXT, sql TEXT, aggregated BOOLEAN);
 
 /*
 str_template_part(pipeline_id:, rule_id:, expr_id:, part:, index:) <-
@@ -164,7 +164,7 @@ str_template_part_with_substitution(
     str_template_part(pipeline_id:, rule_id:, expr_id:, part:, index:)
     not (part ~ "{{[a-z_][a-zA-Z0-9_]*}}")
 */
-DECLARE RECURSIVE VIEW str_template_part_with_substitution (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, part TEXT, "index" INTEGER, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW str_template_part_with_substitution (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, part TEXT, "index" INTEGER, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW str_template_part_with_substitution AS
     SELECT DISTINCT
         str_template_part.pipeline_id,
@@ -198,7 +198,7 @@ str_template_expr_all_vars_are_bound(pipeline_id:, rule_id:, expr_id:) <-
     str_template_part_with_substitution(pipeline_id:, rule_id:, expr_id:)
     count<> = array_length(template)
 */
-DECLARE RECURSIVE VIEW str_template_expr_all_vars_are_bound (pipeline_id TEXT, rule_id TEXT, expr_id TEXT);
+DECLARE RECURSIVE VIEW str_template_expr_all_vars_are_bound (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT);
 CREATE MATERIALIZED VIEW str_template_expr_all_vars_are_bound AS
     SELECT DISTINCT
         str_template_expr.pipeline_id,
@@ -218,7 +218,7 @@ sustituted_str_template_expr(pipeline_id:, rule_id:, expr_id:, sql:, aggregated:
     str_template_part_with_substitution(pipeline_id:, rule_id:, expr_id:, part:, index:)
     sql := "(" ++ join(array<part, order_by: [index]>, " || ") ++ ")"
 */
-DECLARE RECURSIVE VIEW substituted_str_template_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW substituted_str_template_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, sql TEXT, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW substituted_str_template_expr AS
     SELECT DISTINCT
         a.pipeline_id,
@@ -244,7 +244,7 @@ substituted_val_arg(pipeline_id:, rule_id:, fncall_id:, arg_index:, sql:) <-
     substituted_expr(
         pipeline_id:, rule_id:, expr_id:, expr_type:, sql:)
 */
-DECLARE RECURSIVE VIEW substituted_val_arg (pipeline_id TEXT, rule_id TEXT, fncall_id TEXT, arg_index INTEGER, sql TEXT);
+DECLARE RECURSIVE VIEW substituted_val_arg (pipeline_id TEXT, rule_id BIGINT, fncall_id BIGINT, arg_index INTEGER, sql TEXT);
 CREATE MATERIALIZED VIEW substituted_val_arg AS
     SELECT DISTINCT
         a.pipeline_id,
@@ -267,7 +267,7 @@ substituted_kv_arg(pipeline_id:, rule_id:, fncall_id:, key:, sql:) <-
     substituted_expr(
         pipeline_id:, rule_id:, expr_id:, expr_type:, sql:)
 */
-DECLARE RECURSIVE VIEW substituted_kv_arg (pipeline_id TEXT, rule_id TEXT, fncall_id TEXT, key TEXT, sql TEXT);
+DECLARE RECURSIVE VIEW substituted_kv_arg (pipeline_id TEXT, rule_id BIGINT, fncall_id BIGINT, key TEXT, sql TEXT);
 CREATE MATERIALIZED VIEW substituted_kv_arg AS
     SELECT DISTINCT
         a.pipeline_id,
@@ -319,7 +319,7 @@ substituted_fncall_expr(pipeline_id:, rule_id:, expr_id:, sql:, aggregated: true
         key: "by", sql: by_sql)
     sql := `{{sql_name}}({{arg_sql}}, {{by_sql}})`
 */
-DECLARE RECURSIVE VIEW substituted_fncall_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW substituted_fncall_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, sql TEXT, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW substituted_fncall_expr AS
     SELECT DISTINCT
         a.pipeline_id,
@@ -405,7 +405,7 @@ substituted_array_expr(pipeline_id:, rule_id:, expr_id:, sql:, aggregated: some<
         sql: element_sql, aggregated:)
     sql := "ARRAY[" ++ join(array<"CAST(" ++ element_sql ++ " AS VARIANT)", order_by: [index]>, ", ") ++ "]"
 */
-DECLARE RECURSIVE VIEW substituted_array_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW substituted_array_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, sql TEXT, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW substituted_array_expr AS
     SELECT DISTINCT
         a.pipeline_id,
@@ -430,15 +430,15 @@ substituted_dict_expr(pipeline_id:, rule_id:, expr_id:, sql:, aggregated: some<a
     dict_expr(pipeline_id:, rule_id:, expr_id:, dict_id:)
     dict_entry(pipeline_id:, rule_id:, dict_id:, key:, expr_id: value_expr_id, expr_type: value_expr_type)
     substituted_expr(pipeline_id:, rule_id:, expr_id: value_expr_id, expr_type: value_expr_type, sql: value_sql, aggregated:)
-    sql := "MAP[" ++ join(array<`'{{key}}', CAST({{value_sql}} AS VARIANT)`>, ", ") ++ "]"
+    sql := "MAP[" ++ join(array<`'{{key}}', CAST({{value_sql}} AS VARIANT)`, order_by: [key, value_sql]>, ", ") ++ "]"
 */
-DECLARE RECURSIVE VIEW substituted_dict_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW substituted_dict_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, sql TEXT, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW substituted_dict_expr AS
     SELECT DISTINCT
         a.pipeline_id,
         a.rule_id,
         a.expr_id,
-        ('MAP[' || ARRAY_TO_STRING(ARRAY_AGG('''' || b.key || '''' || ', CAST(' || c.sql || ' AS VARIANT)'), ', ') || ']') AS sql,
+        ('MAP[' || ARRAY_TO_STRING(ARRAY_AGG('''' || b.key || '''' || ', CAST(' || c.sql || ' AS VARIANT)' ORDER BY b.key, c.sql), ', ') || ']') AS sql,
         SOME(c.aggregated) AS aggregated
     FROM dict_expr AS a
     JOIN dict_entry AS b
@@ -495,7 +495,7 @@ substituted_binop_expr(pipeline_id:, rule_id:, expr_id:, sql:, aggregated:) <-
     sql := `({{left_sql}} {{op_sql}} {{right_sql}})`
     aggregated := left_aggregated or right_aggregated
 */
-DECLARE RECURSIVE VIEW substituted_binop_expr (pipeline_id TEXT, rule_id TEXT, expr_id TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW substituted_binop_expr (pipeline_id TEXT, rule_id BIGINT, expr_id BIGINT, sql TEXT, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW substituted_binop_expr AS
     SELECT DISTINCT
         b.pipeline_id,
@@ -614,7 +614,7 @@ match_right_expr_sql(pipeline_id:, rule_id:, match_id:, sql:, aggregated:) <-
     body_match(pipeline_id:, rule_id:, match_id:, right_expr_id:, right_expr_type:)
     substituted_expr(pipeline_id:, rule_id:, expr_id: right_expr_id, expr_type: right_expr_type, sql:, aggregated:)
 */
-DECLARE RECURSIVE VIEW match_right_expr_sql (pipeline_id TEXT, rule_id TEXT, match_id TEXT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW match_right_expr_sql (pipeline_id TEXT, rule_id BIGINT, match_id BIGINT, sql TEXT, aggregated BOOLEAN);
 CREATE MATERIALIZED VIEW match_right_expr_sql AS
     SELECT DISTINCT a.pipeline_id, a.rule_id, a.match_id, b.sql, b.aggregated
     FROM body_match AS a
@@ -662,14 +662,13 @@ array_unnest_join_sql_lines(
         `  CROSS JOIN UNNEST(CAST({{right_expr_sql}} AS VARIANT ARRAY)) AS "{{alias}}" (arr_element)`
     ]
 */
-DECLARE RECURSIVE VIEW array_unnest_join_sql_lines (pipeline_id TEXT, rule_id TEXT, unnest_id TEXT, sql_lines TEXT ARRAY, element_alias TEXT, index_alias TEXT);
 CREATE MATERIALIZED VIEW array_unnest_join_sql_lines AS
     SELECT DISTINCT
         a.pipeline_id, a.rule_id, a.unnest_id,
         ARRAY[
-            ('  CROSS JOIN UNNEST(CAST(' || b.sql || ' AS VARIANT ARRAY)) AS "' || a.unnest_id || '" (arr_element)')
+            ('  CROSS JOIN UNNEST(CAST(' || b.sql || ' AS VARIANT ARRAY)) AS "' || CAST(a.unnest_id AS TEXT) || '" (arr_element)')
         ] AS sql_lines,
-        ('"' || a.unnest_id || '".arr_element') AS element_alias,
+        ('"' || CAST(a.unnest_id AS TEXT) || '".arr_element') AS element_alias,
         NULL AS index_alias
     FROM body_unnest AS a
     JOIN substituted_expr AS b
@@ -699,8 +698,8 @@ match_oexpr(
         pipeline_id:, rule_id:, sql:, aggregated:,
         expr_id: right_expr_id, expr_type: "var_expr")
 */
-DECLARE RECURSIVE VIEW match_oexpr (pipeline_id TEXT, rule_id TEXT, pattern_expr_id TEXT, pattern_expr_type TEXT, match_id TEXT, sql TEXT, aggregated BOOLEAN);
-DECLARE RECURSIVE VIEW match_oexpr_array_drop_sides (pipeline_id TEXT, rule_id TEXT, pattern_expr_id TEXT, pattern_expr_type TEXT, match_id TEXT, aggregated BOOLEAN, array_sql TEXT, left_offset INTEGER, right_offset INTEGER);
+DECLARE RECURSIVE VIEW match_oexpr (pipeline_id TEXT, rule_id BIGINT, pattern_expr_id BIGINT, pattern_expr_type TEXT, match_id BIGINT, sql TEXT, aggregated BOOLEAN);
+DECLARE RECURSIVE VIEW match_oexpr_array_drop_sides (pipeline_id TEXT, rule_id BIGINT, pattern_expr_id BIGINT, pattern_expr_type TEXT, match_id BIGINT, aggregated BOOLEAN, array_sql TEXT, left_offset INTEGER, right_offset INTEGER);
 CREATE MATERIALIZED VIEW match_oexpr AS
     SELECT DISTINCT
         body_match.pipeline_id,
@@ -1224,61 +1223,28 @@ CREATE MATERIALIZED VIEW var_bound AS
     WHERE NOT var_bound_via_match.aggregated;
 
 /*
-first_var_bound(pipeline_id:, rule_id:, var_name:, sql: min<sql>) <-
-    var_bound(pipeline_id:, rule_id:, var_name:, sql:)
-*/
-CREATE MATERIALIZED VIEW first_var_bound AS
-    SELECT DISTINCT
-        var_bound.pipeline_id,
-        var_bound.rule_id,
-        var_bound.var_name,
-        MIN(var_bound.sql) AS sql
-    FROM var_bound
-    GROUP BY var_bound.pipeline_id, var_bound.rule_id, var_bound.var_name;
-
-/*
-adjacent_var_bound(pipeline_id:, rule_id:, var_name:, prev_sql:, next_sql:) <-
-    first_var_bound(pipeline_id:, rule_id:, var_name:, sql: prev_sql)
-    var_bound(pipeline_id:, rule_id:, var_name:, sql:)
-    prev_sql < sql
-    next_sql := min<sql>
+# every bound sql of a variable is paired with the next one in order,
+# all pairs at once, not one per iteration of a recursive chain
 adjacent_var_bound(pipeline_id:, rule_id:, var_name:, prev_sql:, next_sql:) <-
-    adjacent_var_bound(pipeline_id:, rule_id:, var_name:, next_sql: prev_sql)
+    var_bound(pipeline_id:, rule_id:, var_name:, sql: prev_sql)
     var_bound(pipeline_id:, rule_id:, var_name:, sql:)
     prev_sql < sql
     next_sql := min<sql>
 */
-DECLARE RECURSIVE VIEW adjacent_var_bound (pipeline_id TEXT, rule_id TEXT, var_name TEXT, prev_sql TEXT, next_sql TEXT);
 CREATE MATERIALIZED VIEW adjacent_var_bound AS
     SELECT DISTINCT
-        var_bound.pipeline_id,
-        var_bound.rule_id,
-        var_bound.var_name,
-        first_var_bound.sql AS prev_sql,
-        MIN(var_bound.sql) AS next_sql
-    FROM first_var_bound
-    JOIN var_bound
-        ON first_var_bound.pipeline_id = var_bound.pipeline_id
-        AND first_var_bound.rule_id = var_bound.rule_id
-        AND first_var_bound.var_name = var_bound.var_name
-    WHERE first_var_bound.sql < var_bound.sql
-    GROUP BY var_bound.pipeline_id, var_bound.rule_id, var_bound.var_name, first_var_bound.sql
-
-    UNION
-
-    SELECT DISTINCT
-        var_bound.pipeline_id,
-        var_bound.rule_id,
-        var_bound.var_name,
-        adjacent_var_bound.next_sql AS prev_sql,
-        MIN(var_bound.sql) AS next_sql
-    FROM adjacent_var_bound
-    JOIN var_bound
-        ON adjacent_var_bound.pipeline_id = var_bound.pipeline_id
-        AND adjacent_var_bound.rule_id = var_bound.rule_id
-        AND adjacent_var_bound.var_name = var_bound.var_name
-    WHERE adjacent_var_bound.next_sql < var_bound.sql
-    GROUP BY var_bound.pipeline_id, var_bound.rule_id, var_bound.var_name, adjacent_var_bound.next_sql;
+        prev_var_bound.pipeline_id,
+        prev_var_bound.rule_id,
+        prev_var_bound.var_name,
+        prev_var_bound.sql AS prev_sql,
+        MIN(next_var_bound.sql) AS next_sql
+    FROM var_bound AS prev_var_bound
+    JOIN var_bound AS next_var_bound
+        ON prev_var_bound.pipeline_id = next_var_bound.pipeline_id
+        AND prev_var_bound.rule_id = next_var_bound.rule_id
+        AND prev_var_bound.var_name = next_var_bound.var_name
+    WHERE prev_var_bound.sql < next_var_bound.sql
+    GROUP BY prev_var_bound.pipeline_id, prev_var_bound.rule_id, prev_var_bound.var_name, prev_var_bound.sql;
 
 /*
 multibind_where_cond(pipeline_id:, rule_id:, sql:) <-
@@ -1479,7 +1445,7 @@ neg_fact_where_cond(pipeline_id:, rule_id:, fact_id:, sql_lines:) <-
     output_table_name(pipeline_id:, table_name:, output_table_name:)
     fact_arg(pipeline_id:, rule_id:, fact_id:, key:, expr_id:, expr_type:)
     substituted_expr(pipeline_id:, rule_id:, expr_id:, expr_type:, sql: expr_sql)
-    [first_cond, *rest_cond] := array<`"{{alias}}"."{{key}}" = {{expr_sql}}`>
+    [first_cond, *rest_cond] := array<`"{{alias}}"."{{key}}" = {{expr_sql}}`, order_by: [key, expr_sql]>
     sql_lines := [
         "NOT EXISTS (SELECT 1",
         `    FROM "{{output_table_name}}" AS "{{alias}}"`,
@@ -1506,11 +1472,11 @@ CREATE MATERIALIZED VIEW neg_fact_where_cond AS
             ARRAY[
                 'NOT EXISTS (SELECT 1',
                 ('    FROM "' || output_table_name.output_table_name || '" AS "' || fact_alias.alias || '"'),
-                ('    WHERE ' || ARRAY_AGG('"' || fact_alias.alias || '"."' || fact_arg.key || '" = ' || substituted_expr.sql)[1])
+                ('    WHERE ' || ARRAY_AGG('"' || fact_alias.alias || '"."' || fact_arg.key || '" = ' || substituted_expr.sql ORDER BY fact_arg.key, substituted_expr.sql)[1])
             ],
             TRANSFORM(
                 GRASP_TEXT_ARRAY_DROP_SIDES(
-                    ARRAY_AGG('"' || fact_alias.alias || '"."' || fact_arg.key || '" = ' || substituted_expr.sql),
+                    ARRAY_AGG('"' || fact_alias.alias || '"."' || fact_arg.key || '" = ' || substituted_expr.sql ORDER BY fact_arg.key, substituted_expr.sql),
                     CAST(1 AS INTEGER UNSIGNED),
                     CAST(0 AS INTEGER UNSIGNED)),
                 x -> '        AND ' || x),
@@ -1557,70 +1523,100 @@ CREATE MATERIALIZED VIEW neg_fact_where_cond AS
     );
 
 /*
-neg_fact_where_cond_concatenated(pipeline_id:, rule_id:, fact_id:, sql_lines:) <-
-    first_fact_alias(pipeline_id:, rule_id:, fact_id:, negated: true)
+neg_fact_where_cond_line(pipeline_id:, rule_id:, fact_index:, line:, index:) <-
+    fact_alias(pipeline_id:, rule_id:, fact_id:, fact_index:, negated: true)
+    first_fact_alias(pipeline_id:, rule_id:, fact_id: first_fact_id, negated: true)
     neg_fact_where_cond(pipeline_id:, rule_id:, fact_id:, sql_lines:)
-neg_fact_where_cond_concatenated(pipeline_id:, rule_id:, fact_id:, sql_lines:) <-
-    neg_fact_where_cond_concatenated(
-        pipeline_id:, rule_id:, fact_id: prev_fact_id, sql_lines: prev_sql_lines)
-    adjacent_facts(pipeline_id:, rule_id:, prev_fact_id:, next_fact_id: fact_id)
-    neg_fact_where_cond(pipeline_id:, rule_id:, fact_id:, sql_lines: next_sql_lines)
-    [first_line, *rest_lines] := next_sql_lines
-    sql_lines := [*prev_sql_lines, `    AND {{first_line}}`, *rest_lines]
-*/
-DECLARE RECURSIVE VIEW neg_fact_where_cond_concatenated (pipeline_id TEXT, rule_id TEXT, fact_id TEXT, sql_lines TEXT ARRAY);
-CREATE MATERIALIZED VIEW neg_fact_where_cond_concatenated AS
-    SELECT DISTINCT
-        neg_fact_where_cond.pipeline_id,
-        neg_fact_where_cond.rule_id,
-        neg_fact_where_cond.fact_id,
-        neg_fact_where_cond.sql_lines
-    FROM first_fact_alias
+    (line, index) := *sql_lines
+    index > 1 or fact_id = first_fact_id
+neg_fact_where_cond_line(pipeline_id:, rule_id:, fact_index:, line:, index: 1) <-
+    fact_alias(pipeline_id:, rule_id:, fact_id:, fact_index:, negated: true)
+    first_fact_alias(pipeline_id:, rule_id:, fact_id: first_fact_id, negated: true)
+    neg_fact_where_cond(pipeline_id:, rule_id:, fact_id:, sql_lines: [first_line, *_])
+    fact_id != first_fact_id
+    line := `    AND {{first_line}}`
+*/
+CREATE MATERIALIZED VIEW neg_fact_where_cond_line AS
+    SELECT DISTINCT
+        fact_alias.pipeline_id,
+        fact_alias.rule_id,
+        fact_alias.fact_index,
+        t.line,
+        t."index"
+    FROM fact_alias
+    JOIN first_fact_alias
+        ON fact_alias.pipeline_id = first_fact_alias.pipeline_id
+        AND fact_alias.rule_id = first_fact_alias.rule_id
+        AND fact_alias.negated = first_fact_alias.negated
     JOIN neg_fact_where_cond
-        ON first_fact_alias.pipeline_id = neg_fact_where_cond.pipeline_id
-        AND first_fact_alias.rule_id = neg_fact_where_cond.rule_id
-        AND first_fact_alias.fact_id = neg_fact_where_cond.fact_id
-    WHERE first_fact_alias.negated
+        ON fact_alias.pipeline_id = neg_fact_where_cond.pipeline_id
+        AND fact_alias.rule_id = neg_fact_where_cond.rule_id
+        AND fact_alias.fact_id = neg_fact_where_cond.fact_id
+    CROSS JOIN UNNEST(neg_fact_where_cond.sql_lines) WITH ORDINALITY AS t (line, "index")
+    WHERE fact_alias.negated
+    AND (t."index" > 1 OR fact_alias.fact_id = first_fact_alias.fact_id)
 
     UNION
 
     SELECT DISTINCT
-        neg_fact_where_cond_concatenated.pipeline_id,
-        neg_fact_where_cond_concatenated.rule_id,
-        neg_fact_where_cond.fact_id,
-        ARRAY_CONCAT(
-            neg_fact_where_cond_concatenated.sql_lines,
-            ARRAY['    AND ' || neg_fact_where_cond.sql_lines[1]],
-            GRASP_TEXT_ARRAY_DROP_SIDES(
-                neg_fact_where_cond.sql_lines,
-                CAST(1 AS INTEGER UNSIGNED),
-                CAST(0 AS INTEGER UNSIGNED))
-        ) AS sql_lines
-    FROM neg_fact_where_cond_concatenated
-    JOIN adjacent_facts
-        ON neg_fact_where_cond_concatenated.pipeline_id = adjacent_facts.pipeline_id
-        AND neg_fact_where_cond_concatenated.rule_id = adjacent_facts.rule_id
-        AND neg_fact_where_cond_concatenated.fact_id = adjacent_facts.prev_fact_id
+        fact_alias.pipeline_id,
+        fact_alias.rule_id,
+        fact_alias.fact_index,
+        ('    AND ' || neg_fact_where_cond.sql_lines[1]) AS line,
+        1 AS "index"
+    FROM fact_alias
+    JOIN first_fact_alias
+        ON fact_alias.pipeline_id = first_fact_alias.pipeline_id
+        AND fact_alias.rule_id = first_fact_alias.rule_id
+        AND fact_alias.negated = first_fact_alias.negated
     JOIN neg_fact_where_cond
-        ON neg_fact_where_cond_concatenated.pipeline_id = neg_fact_where_cond.pipeline_id
-        AND neg_fact_where_cond_concatenated.rule_id = neg_fact_where_cond.rule_id
-        AND adjacent_facts.next_fact_id = neg_fact_where_cond.fact_id;
+        ON fact_alias.pipeline_id = neg_fact_where_cond.pipeline_id
+        AND fact_alias.rule_id = neg_fact_where_cond.rule_id
+        AND fact_alias.fact_id = neg_fact_where_cond.fact_id
+    WHERE fact_alias.negated
+    AND fact_alias.fact_id != first_fact_alias.fact_id;
+
+/*
+neg_fact_without_where_cond(pipeline_id:, rule_id:) <-
+    fact_alias(pipeline_id:, rule_id:, fact_id:, negated: true)
+    not neg_fact_where_cond(pipeline_id:, rule_id:, fact_id:)
+*/
+CREATE MATERIALIZED VIEW neg_fact_without_where_cond AS
+    SELECT DISTINCT
+        fact_alias.pipeline_id,
+        fact_alias.rule_id
+    FROM fact_alias
+    WHERE fact_alias.negated
+    AND NOT EXISTS (
+        SELECT 1
+        FROM neg_fact_where_cond
+        WHERE fact_alias.pipeline_id = neg_fact_where_cond.pipeline_id
+        AND fact_alias.rule_id = neg_fact_where_cond.rule_id
+        AND fact_alias.fact_id = neg_fact_where_cond.fact_id
+    );
 
 /*
 neg_facts_where_conds_full(pipeline_id:, rule_id:, sql_lines:) <-
-    last_fact_alias(pipeline_id:, rule_id:, fact_id:, negated: true)
-    neg_fact_where_cond_concatenated(pipeline_id:, rule_id:, fact_id:, sql_lines:)
+    # conditions of all negated facts must be ready
+    neg_fact_where_cond_line(pipeline_id:, rule_id:, fact_index:, line:, index:)
+    not neg_fact_without_where_cond(pipeline_id:, rule_id:)
+    sql_lines := array<line, order_by: [fact_index, index]>
 */
 CREATE MATERIALIZED VIEW neg_facts_where_conds_full AS
-    SELECT DISTINCT
-        neg_fact_where_cond_concatenated.pipeline_id,
-        neg_fact_where_cond_concatenated.rule_id,
-        neg_fact_where_cond_concatenated.sql_lines
-    FROM neg_fact_where_cond_concatenated
-    JOIN last_fact_alias
-        ON neg_fact_where_cond_concatenated.pipeline_id = last_fact_alias.pipeline_id
-        AND neg_fact_where_cond_concatenated.rule_id = last_fact_alias.rule_id
-        AND neg_fact_where_cond_concatenated.fact_id = last_fact_alias.fact_id;
+    SELECT
+        neg_fact_where_cond_line.pipeline_id,
+        neg_fact_where_cond_line.rule_id,
+        ARRAY_AGG(neg_fact_where_cond_line.line ORDER BY
+            neg_fact_where_cond_line.fact_index,
+            neg_fact_where_cond_line."index") AS sql_lines
+    FROM neg_fact_where_cond_line
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM neg_fact_without_where_cond
+        WHERE neg_fact_where_cond_line.pipeline_id = neg_fact_without_where_cond.pipeline_id
+        AND neg_fact_where_cond_line.rule_id = neg_fact_without_where_cond.rule_id
+    )
+    GROUP BY neg_fact_where_cond_line.pipeline_id, neg_fact_where_cond_line.rule_id;
 
 /*
 full_where_cond_sql(pipeline_id:, rule_id:, sql_lines:) <-
@@ -1630,7 +1626,7 @@ full_where_cond_sql(pipeline_id:, rule_id:, sql_lines:) <-
 full_where_cond_sql(pipeline_id:, rule_id:, sql_lines:) <-
     where_cond(pipeline_id:, rule_id:, sql:)
     not neg_facts_where_conds_full(pipeline_id:, rule_id:)
-    [first_line, *rest_lines] := array<sql>
+    [first_line, *rest_lines] := array<sql, order_by: [sql]>
     sql_lines := [
         `  WHERE {{first_line}}`,
         *map((sql_line) -> `    AND {{sql_line}}`, rest_lines),
@@ -1638,7 +1634,7 @@ full_where_cond_sql(pipeline_id:, rule_id:, sql_lines:) <-
 full_where_cond_sql(pipeline_id:, rule_id:, sql_lines:) <-
     neg_facts_where_conds_full(pipeline_id:, rule_id:, sql_lines: [first_line, *rest_lines])
     where_cond(pipeline_id:, rule_id:, sql:)
-    cond_lines := array<sql>
+    cond_lines := array<sql, order_by: [sql]>
     sql_lines := [
         `  WHERE {{first_line}}`,
         *rest_lines,
@@ -1675,10 +1671,10 @@ CREATE MATERIALIZED VIEW full_where_cond_sql AS
         where_cond.pipeline_id,
         where_cond.rule_id,
         ARRAY_CONCAT(
-            ARRAY['  WHERE ' || ARRAY_AGG(where_cond.sql)[1]],
+            ARRAY['  WHERE ' || ARRAY_AGG(where_cond.sql ORDER BY where_cond.sql)[1]],
             TRANSFORM(
                 GRASP_TEXT_ARRAY_DROP_SIDES(
-                    ARRAY_AGG(where_cond.sql),
+                    ARRAY_AGG(where_cond.sql ORDER BY where_cond.sql),
                     CAST(1 AS INTEGER UNSIGNED),
                     CAST(0 AS INTEGER UNSIGNED)),
                 (sql_line) -> '    AND ' || sql_line)
@@ -1704,7 +1700,7 @@ CREATE MATERIALIZED VIEW full_where_cond_sql AS
                 CAST(1 AS INTEGER UNSIGNED),
                 CAST(0 AS INTEGER UNSIGNED)),
             TRANSFORM(
-                ARRAY_AGG(where_cond.sql),
+                ARRAY_AGG(where_cond.sql ORDER BY where_cond.sql),
                 (sql_line) -> '    AND ' || sql_line)
         ) AS sql_lines
     FROM neg_facts_where_conds_full
@@ -1757,7 +1753,7 @@ having_cond_sql(pipeline_id:, rule_id:, sql_lines: []) <-
     not having_cond(pipeline_id:, rule_id:)
 having_cond_sql(pipeline_id:, rule_id:, sql_lines:) <-
     having_cond(pipeline_id:, rule_id:, sql:)
-    [first_sql, *rest_sql] := array<sql>
+    [first_sql, *rest_sql] := array<sql, order_by: [sql]>
     sql_lines := [
         `  HAVING {{first_sql}}`,
         *map(rest_sql, (sql) -> `    AND {{sql}}`),
@@ -1782,10 +1778,10 @@ CREATE MATERIALIZED VIEW having_cond_sql AS
         having_cond.pipeline_id,
         having_cond.rule_id,
         ARRAY_CONCAT(
-            ARRAY['  HAVING ' || ARRAY_AGG(having_cond.sql)[1]],
+            ARRAY['  HAVING ' || ARRAY_AGG(having_cond.sql ORDER BY having_cond.sql)[1]],
             TRANSFORM(
                 GRASP_TEXT_ARRAY_DROP_SIDES(
-                    ARRAY_AGG(having_cond.sql),
+                    ARRAY_AGG(having_cond.sql ORDER BY having_cond.sql),
                     CAST(1 AS INTEGER UNSIGNED),
                     CAST(0 AS INTEGER UNSIGNED)),
                 (sql_line) -> '    AND ' || sql_line)
@@ -1794,37 +1790,36 @@ CREATE MATERIALIZED VIEW having_cond_sql AS
     GROUP BY having_cond.pipeline_id, having_cond.rule_id;
 
 /*
-rule_join_sql(pipeline_id:, rule_id:, fact_id:, sql_lines:) <-
-    first_fact_alias(pipeline_id:, rule_id:, fact_id:, table_name:, alias:, negated: false)
+rule_join_sql(pipeline_id:, rule_id:, fact_id:, fact_index:, sql_lines:) <-
+    first_fact_alias(pipeline_id:, rule_id:, fact_id:, fact_index:, table_name:, alias:, negated: false)
     output_table_name(pipeline_id:, table_name:, output_table_name:)
     sql_lines := [`  FROM "{{output_table_name}}" AS "{{alias}}"`]
-rule_join_sql(pipeline_id:, rule_id:, fact_id:, sql_lines:) <-
-    rule_join_sql(pipeline_id:, rule_id:, fact_id: prev_fact_id, sql_lines: prev_sql_lines)
-    adjacent_facts(pipeline_id:, rule_id:, prev_fact_id:, next_fact_id:)
-    fact_alias(pipeline_id:, rule_id:, table_name:, fact_id: next_fact_id, alias: next_alias)
+rule_join_sql(pipeline_id:, rule_id:, fact_id:, fact_index:, sql_lines:) <-
+    first_fact_alias(pipeline_id:, rule_id:, fact_index: first_fact_index, negated: false)
+    fact_alias(pipeline_id:, rule_id:, table_name:, fact_id:, fact_index:, alias:, negated: false)
+    fact_index > first_fact_index
     output_table_name(pipeline_id:, table_name:, output_table_name:)
-    not var_join(pipeline_id:, rule_id:, fact_id: next_fact_id)
-    sql_lines := [*prev_sql_lines, `  CROSS JOIN "{{output_table_name}}" AS "{{next_alias}}"`]
-rule_join_sql(pipeline_id:, rule_id:, fact_id: next_fact_id, sql_lines:) <-
-    rule_join_sql(pipeline_id:, rule_id:, fact_id: prev_fact_id, sql_lines: prev_sql_lines)
-    adjacent_facts(pipeline_id:, rule_id:, prev_fact_id:, next_fact_id:)
-    fact_alias(pipeline_id:, rule_id:, table_name:, fact_id: next_fact_id, alias: next_alias)
-    var_join(pipeline_id:, rule_id:, fact_id: next_fact_id, sql:)
+    not var_join(pipeline_id:, rule_id:, fact_id:)
+    sql_lines := [`  CROSS JOIN "{{output_table_name}}" AS "{{alias}}"`]
+rule_join_sql(pipeline_id:, rule_id:, fact_id:, fact_index:, sql_lines:) <-
+    first_fact_alias(pipeline_id:, rule_id:, fact_index: first_fact_index, negated: false)
+    fact_alias(pipeline_id:, rule_id:, table_name:, fact_id:, fact_index:, alias:, negated: false)
+    fact_index > first_fact_index
+    var_join(pipeline_id:, rule_id:, fact_id:, sql:)
     output_table_name(pipeline_id:, table_name:, output_table_name:)
-    [first_cond, *rest_conds] := array<sql>
+    [first_cond, *rest_conds] := array<sql, order_by: [sql]>
     sql_lines := [
-        *prev_sql_lines,
-        `  JOIN "{{output_table_name}}" AS "{{next_alias}}"`,
+        `  JOIN "{{output_table_name}}" AS "{{alias}}"`,
         `    ON {{first_cond}}`,
-        *map(rest_conds, x -> `AND {{x}}`),
+        *map(rest_conds, x -> `    AND {{x}}`),
     ]
 */
-DECLARE RECURSIVE VIEW rule_join_sql (pipeline_id TEXT, rule_id TEXT, fact_id TEXT, sql_lines TEXT ARRAY);
 CREATE MATERIALIZED VIEW rule_join_sql AS
     SELECT DISTINCT
         first_fact_alias.pipeline_id,
         first_fact_alias.rule_id,
         first_fact_alias.fact_id,
+        first_fact_alias.fact_index,
         ARRAY['  FROM "' || output_table_name.output_table_name || '" AS "' || first_fact_alias.alias || '"'] AS sql_lines
     FROM first_fact_alias
     JOIN output_table_name
@@ -1835,111 +1830,128 @@ CREATE MATERIALIZED VIEW rule_join_sql AS
     UNION
 
     SELECT DISTINCT
-        next_fact_alias.pipeline_id,
-        next_fact_alias.rule_id,
-        next_fact_alias.fact_id,
-        ARRAY_CONCAT(
-            prev_rule_join_sql.sql_lines,
-            ARRAY['  CROSS JOIN "' || output_table_name.output_table_name || '" AS "' || next_fact_alias.alias || '"']) AS sql_lines
-    FROM rule_join_sql AS prev_rule_join_sql
-    JOIN adjacent_facts
-        ON prev_rule_join_sql.pipeline_id = adjacent_facts.pipeline_id
-        AND prev_rule_join_sql.rule_id = adjacent_facts.rule_id
-        AND prev_rule_join_sql.fact_id = adjacent_facts.prev_fact_id
-    JOIN fact_alias AS next_fact_alias
-        ON adjacent_facts.pipeline_id = next_fact_alias.pipeline_id
-        AND adjacent_facts.rule_id = next_fact_alias.rule_id
-        AND adjacent_facts.next_fact_id = next_fact_alias.fact_id
+        fact_alias.pipeline_id,
+        fact_alias.rule_id,
+        fact_alias.fact_id,
+        fact_alias.fact_index,
+        ARRAY['  CROSS JOIN "' || output_table_name.output_table_name || '" AS "' || fact_alias.alias || '"'] AS sql_lines
+    FROM fact_alias
+    JOIN first_fact_alias
+        ON fact_alias.pipeline_id = first_fact_alias.pipeline_id
+        AND fact_alias.rule_id = first_fact_alias.rule_id
+        AND fact_alias.negated = first_fact_alias.negated
     JOIN output_table_name
-        ON next_fact_alias.pipeline_id = output_table_name.pipeline_id
-        AND next_fact_alias.table_name = output_table_name.table_name
-    WHERE NOT EXISTS (
+        ON fact_alias.pipeline_id = output_table_name.pipeline_id
+        AND fact_alias.table_name = output_table_name.table_name
+    WHERE NOT fact_alias.negated
+    AND fact_alias.fact_index > first_fact_alias.fact_index
+    AND NOT EXISTS (
         SELECT 1
         FROM var_join
-        WHERE adjacent_facts.pipeline_id = var_join.pipeline_id
-        AND adjacent_facts.rule_id = var_join.rule_id
-        AND adjacent_facts.next_fact_id = var_join.fact_id
+        WHERE fact_alias.pipeline_id = var_join.pipeline_id
+        AND fact_alias.rule_id = var_join.rule_id
+        AND fact_alias.fact_id = var_join.fact_id
     )
 
     UNION
 
     SELECT DISTINCT
-        next_fact_alias.pipeline_id,
-        next_fact_alias.rule_id,
-        next_fact_alias.fact_id,
+        fact_alias.pipeline_id,
+        fact_alias.rule_id,
+        fact_alias.fact_id,
+        fact_alias.fact_index,
         ARRAY_CONCAT(
-            prev_rule_join_sql.sql_lines,
-            ARRAY['  JOIN "' || output_table_name.output_table_name || '" AS "' || next_fact_alias.alias || '"'],
-            ARRAY['    ON ' || ARRAY_AGG(var_join.sql)[1]],
+            ARRAY['  JOIN "' || output_table_name.output_table_name || '" AS "' || fact_alias.alias || '"'],
+            ARRAY['    ON ' || ARRAY_AGG(var_join.sql ORDER BY var_join.sql)[1]],
             TRANSFORM(
                 GRASP_TEXT_ARRAY_DROP_SIDES(
-                    ARRAY_AGG(var_join.sql),
+                    ARRAY_AGG(var_join.sql ORDER BY var_join.sql),
                     CAST(1 AS INTEGER UNSIGNED),
                     CAST(0 AS INTEGER UNSIGNED)),
                 x -> '    AND ' || x)
         ) AS sql_lines
-    FROM rule_join_sql AS prev_rule_join_sql
-    JOIN adjacent_facts
-        ON prev_rule_join_sql.pipeline_id = adjacent_facts.pipeline_id
-        AND prev_rule_join_sql.rule_id = adjacent_facts.rule_id
-        AND prev_rule_join_sql.fact_id = adjacent_facts.prev_fact_id
-    JOIN fact_alias AS next_fact_alias
-        ON adjacent_facts.pipeline_id = next_fact_alias.pipeline_id
-        AND adjacent_facts.rule_id = next_fact_alias.rule_id
-        AND adjacent_facts.next_fact_id = next_fact_alias.fact_id
+    FROM fact_alias
+    JOIN first_fact_alias
+        ON fact_alias.pipeline_id = first_fact_alias.pipeline_id
+        AND fact_alias.rule_id = first_fact_alias.rule_id
+        AND fact_alias.negated = first_fact_alias.negated
     JOIN var_join
-        ON adjacent_facts.pipeline_id = var_join.pipeline_id
-        AND adjacent_facts.rule_id = var_join.rule_id
-        AND adjacent_facts.next_fact_id = var_join.fact_id
+        ON fact_alias.pipeline_id = var_join.pipeline_id
+        AND fact_alias.rule_id = var_join.rule_id
+        AND fact_alias.fact_id = var_join.fact_id
     JOIN output_table_name
-        ON next_fact_alias.pipeline_id = output_table_name.pipeline_id
-        AND next_fact_alias.table_name = output_table_name.table_name
-    GROUP BY next_fact_alias.pipeline_id, next_fact_alias.rule_id, next_fact_alias.fact_id, prev_rule_join_sql.sql_lines, output_table_name.output_table_name, next_fact_alias.alias;
+        ON fact_alias.pipeline_id = output_table_name.pipeline_id
+        AND fact_alias.table_name = output_table_name.table_name
+    WHERE NOT fact_alias.negated
+    AND fact_alias.fact_index > first_fact_alias.fact_index
+    GROUP BY fact_alias.pipeline_id, fact_alias.rule_id, fact_alias.fact_id, fact_alias.fact_index, output_table_name.output_table_name, fact_alias.alias;
+
+/*
+rule_join_sql_line(pipeline_id:, rule_id:, fact_index:, line:, index:) <-
+    rule_join_sql(pipeline_id:, rule_id:, fact_index:, sql_lines:)
+    (line, index) := *sql_lines
+*/
+CREATE MATERIALIZED VIEW rule_join_sql_line AS
+    SELECT DISTINCT
+        rule_join_sql.pipeline_id,
+        rule_join_sql.rule_id,
+        rule_join_sql.fact_index,
+        t.line,
+        t."index"
+    FROM rule_join_sql
+    CROSS JOIN UNNEST(rule_join_sql.sql_lines) WITH ORDINALITY AS t (line, "index");
 
 /*
-unnest_join_sql_lines(pipeline_id:, rule_id:, unnest_id:, sql_lines:) <-
-    first_unnest(pipeline_id:, rule_id:, unnest_id:)
+fact_without_join_sql(pipeline_id:, rule_id:) <-
+    fact_alias(pipeline_id:, rule_id:, fact_id:, negated: false)
+    not rule_join_sql(pipeline_id:, rule_id:, fact_id:)
+*/
+CREATE MATERIALIZED VIEW fact_without_join_sql AS
+    SELECT DISTINCT
+        fact_alias.pipeline_id,
+        fact_alias.rule_id
+    FROM fact_alias
+    WHERE NOT fact_alias.negated
+    AND NOT EXISTS (
+        SELECT 1
+        FROM rule_join_sql
+        WHERE fact_alias.pipeline_id = rule_join_sql.pipeline_id
+        AND fact_alias.rule_id = rule_join_sql.rule_id
+        AND fact_alias.fact_id = rule_join_sql.fact_id
+    );
+
+/*
+unnest_join_sql_line(pipeline_id:, rule_id:, unnest_id:, line:, index:) <-
     array_unnest_join_sql_lines(pipeline_id:, rule_id:, unnest_id:, sql_lines:)
-unnest_join_sql_lines(pipeline_id:, rule_id:, unnest_id:, sql_lines:) <-
-    unnest_join_sql_lines(
-        pipeline_id:, rule_id:, unnest_id: prev_unnest_id, sql_lines: prev_sql_lines)
-    adjacent_unnests(pipeline_id:, rule_id:, prev_unnest_id:, next_unnest_id: unnest_id)
-    array_unnest_join_sql_lines(pipeline_id:, rule_id:, unnest_id:, sql_lines: next_sql_lines)
-    sql_lines := [
-        *prev_sql_lines,
-        *next_sql_lines,
-    ]
+    (line, index) := *sql_lines
 */
-DECLARE RECURSIVE VIEW unnest_join_sql_lines (pipeline_id TEXT, rule_id TEXT, unnest_id TEXT, sql_lines TEXT ARRAY);
-CREATE MATERIALIZED VIEW unnest_join_sql_lines AS
-    SELECT DISTINCT
-        first_unnest.pipeline_id,
-        first_unnest.rule_id,
-        first_unnest.unnest_id,
-        array_unnest_join_sql_lines.sql_lines
-    FROM first_unnest
-    JOIN array_unnest_join_sql_lines
-        ON first_unnest.pipeline_id = array_unnest_join_sql_lines.pipeline_id
-        AND first_unnest.rule_id = array_unnest_join_sql_lines.rule_id
-        AND first_unnest.unnest_id = array_unnest_join_sql_lines.unnest_id
-    UNION
+CREATE MATERIALIZED VIEW unnest_join_sql_line AS
     SELECT DISTINCT
-        unnest_join_sql_lines.pipeline_id,
-        unnest_join_sql_lines.rule_id,
+        array_unnest_join_sql_lines.pipeline_id,
+        array_unnest_join_sql_lines.rule_id,
         array_unnest_join_sql_lines.unnest_id,
-        ARRAY_CONCAT(
-            array_unnest_join_sql_lines.sql_lines,
-            unnest_join_sql_lines.sql_lines
-        ) AS sql_lines
-    FROM unnest_join_sql_lines
-    JOIN adjacent_unnests
-        ON unnest_join_sql_lines.pipeline_id = adjacent_unnests.pipeline_id
-        AND unnest_join_sql_lines.rule_id = adjacent_unnests.rule_id
-        AND unnest_join_sql_lines.unnest_id = adjacent_unnests.prev_unnest_id
-    JOIN array_unnest_join_sql_lines
-        ON adjacent_unnests.pipeline_id = array_unnest_join_sql_lines.pipeline_id
-        AND adjacent_unnests.rule_id = array_unnest_join_sql_lines.rule_id
-        AND adjacent_unnests.next_unnest_id = array_unnest_join_sql_lines.unnest_id;
+        t.line,
+        t."index"
+    FROM array_unnest_join_sql_lines
+    CROSS JOIN UNNEST(array_unnest_join_sql_lines.sql_lines) WITH ORDINALITY AS t (line, "index");
+
+/*
+unnest_without_join_sql(pipeline_id:, rule_id:) <-
+    body_unnest(pipeline_id:, rule_id:, unnest_id:)
+    not array_unnest_join_sql_lines(pipeline_id:, rule_id:, unnest_id:)
+*/
+CREATE MATERIALIZED VIEW unnest_without_join_sql AS
+    SELECT DISTINCT
+        body_unnest.pipeline_id,
+        body_unnest.rule_id
+    FROM body_unnest
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM array_unnest_join_sql_lines
+        WHERE body_unnest.pipeline_id = array_unnest_join_sql_lines.pipeline_id
+        AND body_unnest.rule_id = array_unnest_join_sql_lines.rule_id
+        AND body_unnest.unnest_id = array_unnest_join_sql_lines.unnest_id
+    );
 
 /*
 unaggregated_param_expr(pipeline_id:, rule_id:, key:, expr_id:, expr_type:, sql:) <-
@@ -1977,7 +1989,7 @@ CREATE MATERIALIZED VIEW has_aggregation AS
 grouped_by_sql(pipeline_id:, rule_id:, sql_lines:) <-
     unaggregated_param_expr(pipeline_id:, rule_id:, sql: param_sql)
     has_aggregation(pipeline_id:, rule_id:)
-    exprs_sql := join(array<param_sql>, ", ")
+    exprs_sql := join(array<param_sql, order_by: [param_sql]>, ", ")
     sql_lines := [`  GROUP BY {{exprs_sql}}`]
 grouped_by_sql(pipeline_id:, rule_id:, sql_lines:) <-
     unaggregated_param_expr(pipeline_id:, rule_id:)
@@ -1992,7 +2004,7 @@ CREATE MATERIALIZED VIEW grouped_by_sql AS
     SELECT DISTINCT
         unaggregated_param_expr.pipeline_id,
         unaggregated_param_expr.rule_id,
-        ARRAY[('  GROUP BY ' || ARRAY_TO_STRING(ARRAY_AGG(unaggregated_param_expr.sql), ', '))] AS sql_lines
+        ARRAY[('  GROUP BY ' || ARRAY_TO_STRING(ARRAY_AGG(unaggregated_param_expr.sql ORDER BY unaggregated_param_expr.sql), ', '))] AS sql_lines
     FROM unaggregated_param_expr
     JOIN has_aggregation
         ON unaggregated_param_expr.pipeline_id = has_aggregation.pipeline_id
@@ -2029,68 +2041,36 @@ CREATE MATERIALIZED VIEW grouped_by_sql AS
 
 /*
 join_sql(pipeline_id:, rule_id:, sql_lines:) <-
-    # if there is only one fact, then there is no adjacent fact
-    rule_join_sql(pipeline_id:, rule_id:, fact_id:, sql_lines:)
-    not adjacent_facts(pipeline_id:, rule_id:, next_fact_id: fact_id)
-    not adjacent_facts(pipeline_id:, rule_id:, prev_fact_id: fact_id)
-join_sql(pipeline_id:, rule_id:, sql_lines:) <-
-    # pick the last fact_id, for which there is no next one
-    adjacent_facts(pipeline_id:, rule_id:, next_fact_id: last_fact_id)
-    not adjacent_facts(pipeline_id:, rule_id:, prev_fact_id: last_fact_id)
-    rule_join_sql(pipeline_id:, rule_id:, fact_id: last_fact_id, sql_lines:)
+    # every fact must be joined, otherwise the rule is not ready
+    rule_join_sql_line(pipeline_id:, rule_id:, fact_index:, line:, index:)
+    not fact_without_join_sql(pipeline_id:, rule_id:)
+    sql_lines := array<line, order_by: [fact_index, index]>
 */
 CREATE MATERIALIZED VIEW join_sql AS
-    SELECT DISTINCT
-        rule_join_sql.pipeline_id,
-        rule_join_sql.rule_id,
-        rule_join_sql.sql_lines
-    FROM rule_join_sql
+    SELECT
+        rule_join_sql_line.pipeline_id,
+        rule_join_sql_line.rule_id,
+        ARRAY_AGG(rule_join_sql_line.line ORDER BY
+            rule_join_sql_line.fact_index,
+            rule_join_sql_line."index") AS sql_lines
+    FROM rule_join_sql_line
     WHERE NOT EXISTS (
         SELECT 1
-        FROM adjacent_facts
-        WHERE rule_join_sql.pipeline_id = adjacent_facts.pipeline_id
-        AND rule_join_sql.rule_id = adjacent_facts.rule_id
-        AND adjacent_facts.next_fact_id = rule_join_sql.fact_id
-    )
-    AND NOT EXISTS (
-        SELECT 1
-        FROM adjacent_facts
-        WHERE rule_join_sql.pipeline_id = adjacent_facts.pipeline_id
-        AND rule_join_sql.rule_id = adjacent_facts.rule_id
-        AND adjacent_facts.prev_fact_id = rule_join_sql.fact_id
+        FROM fact_without_join_sql
+        WHERE rule_join_sql_line.pipeline_id = fact_without_join_sql.pipeline_id
+        AND rule_join_sql_line.rule_id = fact_without_join_sql.rule_id
     )
- 
-    UNION
-
-    SELECT DISTINCT
-        rule_join_sql.pipeline_id,
-        rule_join_sql.rule_id,
-        rule_join_sql.sql_lines
-    FROM rule_join_sql
-    JOIN adjacent_facts AS a
-        ON rule_join_sql.pipeline_id = a.pipeline_id
-        AND rule_join_sql.rule_id = a.rule_id
-        AND rule_join_sql.fact_id = a.next_fact_id
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM adjacent_facts
-        WHERE rule_join_sql.pipeline_id = adjacent_facts.pipeline_id
-        AND rule_join_sql.rule_id = adjacent_facts.rule_id
-        AND adjacent_facts.prev_fact_id = a.next_fact_id
-    );
+    GROUP BY rule_join_sql_line.pipeline_id, rule_join_sql_line.rule_id;
 
 /*
 unnest_join_sql(pipeline_id:, rule_id:, sql_lines: []) <-
     rule(pipeline_id:, rule_id:)
     not body_unnest(pipeline_id:, rule_id:)
 unnest_join_sql(pipeline_id:, rule_id:, sql_lines:) <-
-    unnest_join_sql_lines(pipeline_id:, rule_id:, unnest_id:, sql_lines:)
-    not adjacent_unnests(pipeline_id:, rule_id:, prev_unnest_id: unnest_id)
-    not adjacent_unnests(pipeline_id:, rule_id:, next_unnest_id: unnest_id)
-unnest_join_sql(pipeline_id:, rule_id:, sql_lines:) <-
-    adjacent_unnests(pipeline_id:, rule_id:, next_unnest_id: last_unnest_id)
-    not adjacent_unnests(pipeline_id:, rule_id:, prev_unnest_id: last_unnest_id)
-    unnest_join_sql_lines(pipeline_id:, rule_id:, unnest_id: last_unnest_id, sql_lines:)
+    unnest_join_sql_line(pipeline_id:, rule_id:, unnest_id:, line:, index:)
+    not unnest_without_join_sql(pipeline_id:, rule_id:)
+    # unnests are joined in reverse order of unnest_id
+    sql_lines := array<line, order_by: [desc(unnest_id), index]>
 */
 CREATE MATERIALIZED VIEW unnest_join_sql AS
     SELECT DISTINCT
@@ -2107,44 +2087,20 @@ CREATE MATERIALIZED VIEW unnest_join_sql AS
 
     UNION
 
-    SELECT DISTINCT
-        unnest_join_sql_lines.pipeline_id,
-        unnest_join_sql_lines.rule_id,
-        unnest_join_sql_lines.sql_lines
-    FROM unnest_join_sql_lines
+    SELECT
+        unnest_join_sql_line.pipeline_id,
+        unnest_join_sql_line.rule_id,
+        ARRAY_AGG(unnest_join_sql_line.line ORDER BY
+            unnest_join_sql_line.unnest_id DESC,
+            unnest_join_sql_line."index") AS sql_lines
+    FROM unnest_join_sql_line
     WHERE NOT EXISTS (
         SELECT 1
-        FROM adjacent_unnests
-        WHERE unnest_join_sql_lines.pipeline_id = adjacent_unnests.pipeline_id
-        AND unnest_join_sql_lines.rule_id = adjacent_unnests.rule_id
-        AND adjacent_unnests.prev_unnest_id = unnest_join_sql_lines.unnest_id
+        FROM unnest_without_join_sql
+        WHERE unnest_join_sql_line.pipeline_id = unnest_without_join_sql.pipeline_id
+        AND unnest_join_sql_line.rule_id = unnest_without_join_sql.rule_id
     )
-    AND NOT EXISTS (
-        SELECT 1
-        FROM adjacent_unnests
-        WHERE unnest_join_sql_lines.pipeline_id = adjacent_unnests.pipeline_id
-        AND unnest_join_sql_lines.rule_id = adjacent_unnests.rule_id
-        AND adjacent_unnests.next_unnest_id = unnest_join_sql_lines.unnest_id
-    )
-
-    UNION
-
-    SELECT DISTINCT
-        unnest_join_sql_lines.pipeline_id,
-        unnest_join_sql_lines.rule_id,
-        unnest_join_sql_lines.sql_lines
-    FROM unnest_join_sql_lines
-    JOIN adjacent_unnests AS a
-        ON unnest_join_sql_lines.pipeline_id = a.pipeline_id
-        AND unnest_join_sql_lines.rule_id = a.rule_id
-        AND unnest_join_sql_lines.unnest_id = a.next_unnest_id
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM adjacent_unnests
-        WHERE unnest_join_sql_lines.pipeline_id = adjacent_unnests.pipeline_id
-        AND unnest_join_sql_lines.rule_id = adjacent_unnests.rule_id
-        AND adjacent_unnests.prev_unnest_id = a.next_unnest_id
-    );
+    GROUP BY unnest_join_sql_line.pipeline_id, unnest_join_sql_line.rule_id;
 
 /*
 substituted_param_expr(pipeline_id:, rule_id:, expr_id:, expr_type:, sql:) <-
@@ -2291,7 +2247,7 @@ CREATE MATERIALIZED VIEW select_sql AS
     GROUP BY rule_param.pipeline_id, rule_param.rule_id, join_sql.sql_lines, unnest_join_sql.sql_lines, full_where_cond_sql.sql_lines, grouped_by_sql.sql_lines, having_cond_sql.sql_lines;
 
 /*
-table_view_sql(pipeline_id:, table_name:, rule_id:, sql_lines:) <-
+table_rule_view_sql(pipeline_id:, table_name:, rule_id:, sql_lines:) <-
     table_first_rule(pipeline_id:, table_name:, rule_id:)
     select_sql(pipeline_id:, rule_id:, sql_lines: rule_sql_lines)
     output_table_name(pipeline_id:, table_name:, output_table_name:)
@@ -2299,15 +2255,14 @@ table_view_sql(pipeline_id:, table_name:, rule_id:, sql_lines:) <-
         `CREATE MATERIALIZED VIEW "{{output_table_name}}" AS`,
         *rule_sql_lines,
     ]
-table_view_sql(pipeline_id:, table_name:, rule_id:, sql_lines:) <-
-    table_view_sql(pipeline_id:, table_name:, rule_id: prev_rule_id, sql_lines: prev_sql_lines)
-    table_next_rule(pipeline_id:, table_name:, prev_rule_id:, next_rule_id:)
-    select_sql(pipeline_id:, rule_id: next_rule_id, sql_lines: next_sql_lines)
-    # table_next_rule(pipeline_id:, table_name:, prev_rule_id: next_rule_id)
-    sql_lines := [*prev_sql_lines, "  UNION", *next_sql_lines]
-*/
-DECLARE RECURSIVE VIEW table_view_sql (pipeline_id TEXT, table_name TEXT, rule_id TEXT, sql_lines TEXT ARRAY);
-CREATE MATERIALIZED VIEW table_view_sql AS
+table_rule_view_sql(pipeline_id:, table_name:, rule_id:, sql_lines:) <-
+    table_first_rule(pipeline_id:, table_name:, rule_id: first_rule_id)
+    rule(pipeline_id:, table_name:, rule_id:)
+    rule_id > first_rule_id
+    select_sql(pipeline_id:, rule_id:, sql_lines: rule_sql_lines)
+    sql_lines := ["  UNION", *rule_sql_lines]
+*/
+CREATE MATERIALIZED VIEW table_rule_view_sql AS
     SELECT DISTINCT
         table_first_rule.pipeline_id,
         table_first_rule.table_name,
@@ -2327,27 +2282,77 @@ CREATE MATERIALIZED VIEW table_view_sql AS
     UNION
 
     SELECT DISTINCT
-        tn.pipeline_id,
-        tn.table_name,
-        tn.next_rule_id,
+        rule.pipeline_id,
+        rule.table_name,
+        rule.rule_id,
         ARRAY_CONCAT(
-            table_view_sql.sql_lines,
             ARRAY['  UNION'],
             select_sql.sql_lines
         ) AS sql_lines
-    FROM table_view_sql
-    JOIN table_next_rule AS tn
-        ON tn.pipeline_id = table_view_sql.pipeline_id
-        AND tn.table_name = table_view_sql.table_name
-        AND tn.prev_rule_id = table_view_sql.rule_id
+    FROM rule
+    JOIN table_first_rule
+        ON rule.pipeline_id = table_first_rule.pipeline_id
+        AND rule.table_name = table_first_rule.table_name
     JOIN select_sql
-        ON tn.pipeline_id = select_sql.pipeline_id
-        AND tn.next_rule_id = select_sql.rule_id
-    -- JOIN table_next_rule AS tnn
-    --     ON tn.pipeline_id = tnn.pipeline_id
-    --     AND tn.table_name = tnn.table_name
-    --     AND tn.next_rule_id = tnn.prev_rule_id
-    ;
+        ON rule.pipeline_id = select_sql.pipeline_id
+        AND rule.rule_id = select_sql.rule_id
+    WHERE rule.rule_id > table_first_rule.rule_id;
+
+/*
+table_rule_view_sql_line(pipeline_id:, table_name:, rule_id:, line:, index:) <-
+    table_rule_view_sql(pipeline_id:, table_name:, rule_id:, sql_lines:)
+    (line, index) := *sql_lines
+*/
+CREATE MATERIALIZED VIEW table_rule_view_sql_line AS
+    SELECT DISTINCT
+        table_rule_view_sql.pipeline_id,
+        table_rule_view_sql.table_name,
+        table_rule_view_sql.rule_id,
+        t.line,
+        t."index"
+    FROM table_rule_view_sql
+    CROSS JOIN UNNEST(table_rule_view_sql.sql_lines) WITH ORDINALITY AS t (line, "index");
+
+/*
+table_rule_without_view_sql(pipeline_id:, table_name:) <-
+    rule(pipeline_id:, table_name:, rule_id:)
+    not table_rule_view_sql(pipeline_id:, table_name:, rule_id:)
+*/
+CREATE MATERIALIZED VIEW table_rule_without_view_sql AS
+    SELECT DISTINCT
+        rule.pipeline_id,
+        rule.table_name
+    FROM rule
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM table_rule_view_sql
+        WHERE rule.pipeline_id = table_rule_view_sql.pipeline_id
+        AND rule.table_name = table_rule_view_sql.table_name
+        AND rule.rule_id = table_rule_view_sql.rule_id
+    );
+
+/*
+table_view_sql(pipeline_id:, table_name:, sql_lines:) <-
+    # every rule of the table must be ready
+    table_rule_view_sql_line(pipeline_id:, table_name:, rule_id:, line:, index:)
+    not table_rule_without_view_sql(pipeline_id:, table_name:)
+    sql_lines := array<line, order_by: [rule_id, index]>
+*/
+CREATE MATERIALIZED VIEW table_view_sql AS
+    SELECT
+        table_rule_view_sql_line.pipeline_id,
+        table_rule_view_sql_line.table_name,
+        ARRAY_AGG(table_rule_view_sql_line.line ORDER BY
+            table_rule_view_sql_line.rule_id,
+            table_rule_view_sql_line."index") AS sql_lines
+    FROM table_rule_view_sql_line
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM table_rule_without_view_sql
+        WHERE table_rule_view_sql_line.pipeline_id = table_rule_without_view_sql.pipeline_id
+        AND table_rule_view_sql_line.table_name = table_rule_without_view_sql.table_name
+    )
+    GROUP BY table_rule_view_sql_line.pipeline_id, table_rule_view_sql_line.table_name;
 
 /*
 output_column_type(input_type: "JSON", output_type: "VARIANT")
@@ -2439,7 +2444,7 @@ schema_table_sql(pipeline_id:, table_name:, sql_lines:) <-
     schema_table_with_sql(pipeline_id:, table_name:, sql: with_sql)
     schema_table_column_sql(pipeline_id:, table_name:, column_name:, sql:)
     output_table_name(pipeline_id:, table_name:, output_table_name:)
-    [*init_lines, last_line] := array<sql>
+    [*init_lines, last_line] := array<sql, order_by: [sql]>
     sql_lines := [
         `CREATE TABLE "{{output_table_name}}" (`,
         *map(init_lines, x -> `  {{x}},`),
@@ -2455,11 +2460,11 @@ CREATE MATERIALIZED VIEW schema_table_sql AS
             ARRAY['CREATE TABLE "' || output_table_name.output_table_name || '" ('],
             TRANSFORM(
                 GRASP_TEXT_ARRAY_DROP_SIDES(
-                    ARRAY_AGG(schema_table_column_sql.sql),
+                    ARRAY_AGG(schema_table_column_sql.sql ORDER BY schema_table_column_sql.sql),
                     CAST(0 AS INTEGER UNSIGNED),
                     CAST(1 AS INTEGER UNSIGNED)),
                 x -> '  ' || x || ','),
-            ARRAY['  ' || ARRAY_AGG(schema_table_column_sql.sql)[ARRAY_LENGTH(ARRAY_AGG(schema_table_column_sql.sql))]],
+            ARRAY['  ' || ARRAY_AGG(schema_table_column_sql.sql ORDER BY schema_table_column_sql.sql)[ARRAY_LENGTH(ARRAY_AGG(schema_table_column_sql.sql ORDER BY schema_table_column_sql.sql))]],
             ARRAY[') ' || schema_table_with_sql.sql || ' ;']
         ) AS sql_lines
     FROM schema_table_with_sql
@@ -2473,8 +2478,7 @@ CREATE MATERIALIZED VIEW schema_table_sql AS
 
 /*
 table_sql(pipeline_id:, table_name:, sql_lines:) <-
-    table_last_rule(pipeline_id:, table_name:, rule_id:)
-    table_view_sql(pipeline_id:, table_name:, rule_id:, sql_lines: sql_lines0)
+    table_view_sql(pipeline_id:, table_name:, sql_lines: sql_lines0)
     sql_lines := [*sql_lines0, ";", ""]
 table_sql(pipeline_id:, table_name:, sql_lines:) <-
     schema_table(pipeline_id:, table_name:)
@@ -2485,11 +2489,7 @@ CREATE MATERIALIZED VIEW table_sql AS
         table_view_sql.pipeline_id,
         table_view_sql.table_name,
         ARRAY_CONCAT(table_view_sql.sql_lines, ARRAY[';', '']) AS sql_lines
-    FROM table_last_rule
-    JOIN table_view_sql
-        ON table_last_rule.pipeline_id = table_view_sql.pipeline_id
-        AND table_last_rule.table_name = table_view_sql.table_name
-        AND table_last_rule.rule_id = table_view_sql.rule_id
+    FROM table_view_sql
     
     UNION
 
@@ -2504,98 +2504,52 @@ CREATE MATERIALIZED VIEW table_sql AS
     ;
 
 /*
-pipeline_tables_sql(pipeline_id:, table_name:, sql_lines:) <-
-    first_table(pipeline_id:, table_name:, order: 0)
-    table_sql(pipeline_id:, table_name:, sql_lines:)
-pipeline_tables_sql(pipeline_id:, table_name:, sql_lines: []) <-
-    first_table(pipeline_id:, table_name:, order: 0)
-    not table_sql(pipeline_id:, table_name:)
-pipeline_tables_sql(pipeline_id:, table_name:, sql_lines:) <-
-    pipeline_tables_sql(pipeline_id:, table_name: prev_table_name, sql_lines: prev_sql_lines)
-    next_table(pipeline_id:, prev_table_name:, next_table_name: table_name)
-    table_sql(pipeline_id:, table_name:, sql_lines: next_sql_lines)
-    sql_lines := [*prev_sql_lines, *next_sql_lines]
-pipeline_tables_sql(pipeline_id:, table_name:, sql_lines:) <-
-    # if table_sql does not exist for next table, just skip it
+pipeline_table_sql_line(pipeline_id:, table_name:, order:, line:, index:) <-
+    # if table_sql does not exist for a table, it is just skipped,
     # it might be defined somewhere outside, in pure SQL.
-    pipeline_tables_sql(pipeline_id:, table_name: prev_table_name, sql_lines:)
-    next_table(pipeline_id:, prev_table_name:, next_table_name: table_name)
-    not table_sql(pipeline_id:, table_name:)
+    table_output_order(pipeline_id:, table_name:, order:)
+    table_sql(pipeline_id:, table_name:, sql_lines:)
+    (line, index) := *sql_lines
 */
-DECLARE RECURSIVE VIEW pipeline_tables_sql (pipeline_id TEXT, table_name TEXT, sql_lines TEXT ARRAY);
-CREATE MATERIALIZED VIEW pipeline_tables_sql AS
+CREATE MATERIALIZED VIEW pipeline_table_sql_line AS
     SELECT DISTINCT
-        first_table.pipeline_id,
-        first_table.table_name,
-        table_sql.sql_lines
-    FROM first_table
-    JOIN table_sql
-        ON first_table.pipeline_id = table_sql.pipeline_id
-        AND first_table.table_name = table_sql.table_name
-    WHERE first_table."order" = 0
-
-    UNION
-
-    SELECT DISTINCT
-        first_table.pipeline_id,
-        first_table.table_name,
-        ARRAY() AS sql_lines
-    FROM first_table
-    WHERE first_table."order" = 0
-    AND NOT EXISTS (
-        SELECT 1
-        FROM table_sql
-        WHERE table_sql.pipeline_id = first_table.pipeline_id
-        AND table_sql.table_name = first_table.table_name
-    )
-
-    UNION
-
-    SELECT DISTINCT
-        next_table.pipeline_id,
-        next_table.next_table_name,
-        ARRAY_CONCAT(
-            pipeline_tables_sql.sql_lines,
-            table_sql.sql_lines
-        ) AS sql_lines
-    FROM pipeline_tables_sql
-    JOIN next_table
-        ON next_table.pipeline_id = pipeline_tables_sql.pipeline_id
-        AND next_table.prev_table_name = pipeline_tables_sql.table_name
+        table_output_order.pipeline_id,
+        table_output_order.table_name,
+        table_output_order."order",
+        t.line,
+        t."index"
+    FROM table_output_order
     JOIN table_sql
-        ON next_table.pipeline_id = table_sql.pipeline_id
-        AND next_table.next_table_name = table_sql.table_name
-    
-    UNION
-
-    SELECT DISTINCT
-        pipeline_tables_sql.pipeline_id,
-        next_table.next_table_name AS table_name,
-        pipeline_tables_sql.sql_lines
-    FROM pipeline_tables_sql
-    JOIN next_table
-        ON next_table.pipeline_id = pipeline_tables_sql.pipeline_id
-        AND next_table.prev_table_name = pipeline_tables_sql.table_name
-    WHERE NOT EXISTS (
-        SELECT 1
-        FROM table_sql
-        WHERE table_sql.pipeline_id = next_table.pipeline_id
-        AND table_sql.table_name = next_table.next_table_name
-    );
+        ON table_output_order.pipeline_id = table_sql.pipeline_id
+        AND table_output_order.table_name = table_sql.table_name
+    CROSS JOIN UNNEST(table_sql.sql_lines) WITH ORDINALITY AS t (line, "index");
 
 /*
 full_pipeline_sql(pipeline_id:, sql_lines:) <-
-    pipeline_tables_sql(pipeline_id:, table_name:, sql_lines:)
-    not next_table(pipeline_id:, prev_table_name: table_name)
+    pipeline_table_sql_line(pipeline_id:, table_name:, order:, line:, index:)
+    sql_lines := array<line, order_by: [order, table_name, index]>
+full_pipeline_sql(pipeline_id:, sql_lines: []) <-
+    table_output_order(pipeline_id:)
+    not pipeline_table_sql_line(pipeline_id:)
 */
 CREATE MATERIALIZED VIEW full_pipeline_sql AS
+    SELECT
+        pipeline_table_sql_line.pipeline_id,
+        ARRAY_AGG(pipeline_table_sql_line.line ORDER BY
+            pipeline_table_sql_line."order",
+            pipeline_table_sql_line.table_name,
+            pipeline_table_sql_line."index") AS sql_lines
+    FROM pipeline_table_sql_line
+    GROUP BY pipeline_table_sql_line.pipeline_id
+
+    UNION
+
     SELECT DISTINCT
-        pipeline_tables_sql.pipeline_id,
-        pipeline_tables_sql.sql_lines
-    FROM pipeline_tables_sql
+        table_output_order.pipeline_id,
+        CAST(ARRAY() AS TEXT ARRAY) AS sql_lines
+    FROM table_output_order
     WHERE NOT EXISTS (
         SELECT 1
-        FROM next_table
-        WHERE next_table.pipeline_id = pipeline_tables_sql.pipeline_id
-        AND next_table.prev_table_name = pipeline_tables_sql.table_name
+        FROM pipeline_table_sql_line
+        WHERE pipeline_table_sql_line.pipeline_id = table_output_order.pipeline_id
     );